@@ -9,35 +9,29 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
 
-from database.db import SESSIONLOCAL
+from database.db import DbDependency
 from database.models import (
-    Notifications,
     Projects,
     Skill,
     User,
     Skill_Category,
-    WorkHours,
+    UserWorkload,
 )
 from database.models import User_Skills
 
 from auth import authentication
+from auth.base_models import Principal
 from account.base_models import SkillsRequestModel, DeleteSkillModel
+from notifications.outbox import enqueue_notification
+from project.matching import invalidate_skill_matrix
+from departments.skill_matrix import invalidate_department_matrix
+from skills.skill_index import index_user_skill, unindex_user_skill
 
 router = APIRouter(tags={"User profile"}, prefix="/user")
 
 
-def get_db():
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.get("/get/{user_id}")
@@ -67,19 +61,13 @@ def get_user_info(db: DbDependency, auth: UserDependency, user_id: UUID):
             content="This account does not exist.",
         )
 
-    if (
-        db.query(User).filter_by(id=auth["id"]).first().organization_id
-        != user.organization_id
-    ):
+    if auth.organization_id != user.organization_id:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You are not allowed to view users from another organization other than yours.",
         )
 
-    work_hours = db.query(WorkHours).filter_by(user_id=user_id).all()
-    total_work_hours = 0
-    for work in work_hours:
-        total_work_hours += work.work_hours
+    workload = db.get(UserWorkload, user.id)
 
     user_data = {
         "id": str(user.id),
@@ -90,7 +78,7 @@ def get_user_info(db: DbDependency, auth: UserDependency, user_id: UUID):
         "roles": [i.role_name for i in user.primary_roles],
         "department_id": (str(user.department_id) if user.department_id else None),
         "projects": [str(i.id) for i in user.projects],
-        "work_hours": total_work_hours,
+        "work_hours": workload.work_hours if workload else 0,
     }
     return JSONResponse(content=user_data, status_code=status.HTTP_200_OK)
 
@@ -102,7 +90,7 @@ def assign_skill_to_user(
     """
     Users can assign themselves skills including their level and experience.
     """
-    action_user = db.query(User).filter_by(id=auth["id"]).first()
+    action_user = db.query(User).filter_by(id=auth.id).first()
     # 1 – Learns, 2 – Knows, 3 – Does, 4 – Helps, 5 – Teaches
     if not 0 < _body.level < 6:
         return JSONResponse(
@@ -144,19 +132,28 @@ def assign_skill_to_user(
 
     if action_user.department:
         if action_user.department.department_manager:
-            notification = Notifications(
-                type="VALIDATION",
-                to_manager=action_user.department.department_manager,
-                for_user=action_user.id,
+            enqueue_notification(
+                db,
+                "VALIDATION",
+                action_user.department.department_manager,
+                action_user.id,
             )
-            db.add(notification)
     db.add(create_user_skills_model)
     db.commit()
+    authentication.invalidate_principal(action_user.id)
+    invalidate_skill_matrix(action_user.organization_id)
+    invalidate_department_matrix(action_user.department_id)
+    index_user_skill(
+        action_user.organization_id,
+        action_user.id,
+        _body.skill_id,
+        _body.level,
+        _body.experience,
+    )
 
 
 @router.get("/skills/project-link/{_id}")
-def get_project_link_info(db: DbDependency, user: UserDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def get_project_link_info(db: DbDependency, action_user: UserDependency, _id: UUID):
     user_skill = (
         db.query(User_Skills).filter_by(user_id=action_user.id, skill_id=_id).first()
     )
@@ -203,7 +200,7 @@ def edit_skill_from_user(
     """
     Users can assign themselves skills including their level and experience.
     """
-    action_user = db.query(User).filter_by(id=auth["id"]).first()
+    action_user = db.query(User).filter_by(id=auth.id).first()
     # 1 – Learns, 2 – Knows, 3 – Does, 4 – Helps, 5 – Teaches
     if not 0 < _body.level < 6:
         return JSONResponse(
@@ -237,14 +234,23 @@ def edit_skill_from_user(
     # ! TODO: new column verified true / false (false by default)
     if action_user.department:
         if action_user.department.department_manager:
-            notification = Notifications(
-                type="VALIDATION",
-                to_manager=action_user.department.department_manager,
-                for_user=action_user.id,
+            enqueue_notification(
+                db,
+                "VALIDATION",
+                action_user.department.department_manager,
+                action_user.id,
             )
-            db.add(notification)
 
     db.commit()
+    invalidate_skill_matrix(action_user.organization_id)
+    invalidate_department_matrix(action_user.department_id)
+    index_user_skill(
+        action_user.organization_id,
+        action_user.id,
+        _body.skill_id,
+        _body.level,
+        _body.experience,
+    )
 
 
 @router.get("/skills")
@@ -252,7 +258,7 @@ def get_skills_from_user(db: DbDependency, auth: UserDependency):
     """
     Get all skills assigned to the logged-in user.
     """
-    action_user = db.query(User).filter_by(id=auth["id"]).first()
+    action_user = db.query(User).filter_by(id=auth.id).first()
 
     return_list = []
 
@@ -334,12 +340,11 @@ def get_skills_from_any_user(db: DbDependency, auth: UserDependency, _id: UUID):
 
 @router.delete("/skills")
 def delete_skill_from_user(
-    db: DbDependency, auth: UserDependency, _body: DeleteSkillModel
+    db: DbDependency, action_user: UserDependency, _body: DeleteSkillModel
 ):
     """
     Delete a skill from an id.
     """
-    action_user = db.query(User).filter_by(id=auth["id"]).first()
     skill = db.query(Skill).filter_by(id=_body.skill_id).first()
 
     if not skill:
@@ -363,11 +368,14 @@ def delete_skill_from_user(
     db.delete(user_skill)
 
     db.commit()
+    authentication.invalidate_principal(action_user.id)
+    invalidate_skill_matrix(action_user.organization_id)
+    invalidate_department_matrix(action_user.department_id)
+    unindex_user_skill(action_user.organization_id, action_user.id, _body.skill_id)
 
 
 @router.get("/projects/{_id}")
 def get_past_projects_info(db: DbDependency, user: UserDependency, _id: UUID):
-
     try:
         UUID(str(_id), version=4)
     except:
@@ -376,12 +384,9 @@ def get_past_projects_info(db: DbDependency, user: UserDependency, _id: UUID):
             content="The UUID introduced is not valid.",
         )
 
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+    action_user = db.query(User).filter_by(id=user.id).first()
 
-    if not (
-        "Project Manager" in [i.role_name for i in action_user.primary_roles]
-        or "Employee" in [i.role_name for i in action_user.primary_roles]
-    ):
+    if not ("Project Manager" in user.roles or "Employee" in user.roles):
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Project Managers and Employees are able to view past projects.",
@@ -0,0 +1,103 @@
+"""
+Login endpoints of authentication.py served from the async database stack.
+Included instead of their sync counterparts when DATABASE_ASYNC is enabled.
+"""
+
+from datetime import timedelta
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+
+from auth.authentication import (
+    PROFILE_OPTIONS,
+    TOKEN_EXPIRATION_MINUTES,
+    cache_profile,
+    create_access_token,
+    get_current_user,
+    profile_cache,
+    token_info,
+)
+from auth.passwords import verify_password_async
+from database import models
+from database.db import AsyncDbDependency
+
+router = APIRouter(tags={"Authentication"}, prefix="/auth")
+
+
+def user_profile_statement():
+    """
+    Selects an user with everything token_info renders.
+    """
+    return select(models.User).options(*PROFILE_OPTIONS)
+
+
+@router.post("/token")
+async def login_for_access_token_async(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncDbDependency
+):
+    """
+    Login as an user. Returns a time-limited token that can be used to
+    get access to restricted endpoints.
+    """
+    user = (
+        (
+            await db.scalars(
+                user_profile_statement().filter(models.User.email == form_data.username)
+            )
+        )
+        .unique()
+        .first()
+    )
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Name or Password is incorrect.",
+        )
+
+    verified, new_hash = await verify_password_async(
+        form_data.password, user.hashed_password
+    )
+    if not verified:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Name or Password is incorrect.",
+        )
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
+    token = create_access_token(
+        user.username, user.id, timedelta(minutes=TOKEN_EXPIRATION_MINUTES)
+    )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK, content=token_info(token, cache_profile(user))
+    )
+
+
+@router.get("/token-info/{_token}")
+async def get_info_from_token_async(db: AsyncDbDependency, _token: str):
+    _id = get_current_user(_token)["id"]
+    profile = profile_cache.get(_id)
+
+    if not profile:
+        user = (
+            (await db.scalars(user_profile_statement().filter_by(id=_id)))
+            .unique()
+            .first()
+        )
+
+        if not user:
+            return JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content="Internal server error, an user should exist but it does not.",
+            )
+
+        profile = cache_profile(user)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK, content=token_info(_token, profile)
+    )
@@ -3,12 +3,13 @@ Auth module includes fancy registration and login for users and organization cre
 Home for token encryption and decryptions and user dependencies.
 """
 
+import time
 import uuid
 
 from datetime import timedelta, datetime
 from typing import Annotated
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
 from dotenv import dotenv_values
 import os
 
@@ -19,15 +20,16 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 
-from database.db import SESSIONLOCAL
+from database.db import AsyncDbDependency, DbDependency
 from database import models
 
-from auth.base_models import RegisterOwner, RegisterEmployee
+from auth.base_models import Principal, RegisterOwner, RegisterEmployee
+from auth.passwords import hash_password, verify_password
 
 
+from utils.cache import TTLCache
 from utils.utility import validate_email, validate_password, create_link_ref
 
-
 router = APIRouter(tags={"Authentication"}, prefix="/auth")
 
 env = dotenv_values(".env")
@@ -35,23 +37,23 @@ env = dotenv_values(".env")
 SECRET_KEY = os.environ.get("SECRET_KEY")
 ALGORITHM = os.environ.get("ALGORITHM")
 TOKEN_EXPIRATION_MINUTES = int(os.environ.get("TOKEN_EXPIRATION_MINUTES"))
+PRINCIPAL_CACHE_SECONDS = int(os.environ.get("PRINCIPAL_CACHE_SECONDS", 60))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 4096))
+PROFILE_CACHE_SECONDS = int(os.environ.get("PROFILE_CACHE_SECONDS", 300))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 4096))
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_SECONDS)
+profile_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PROFILE_CACHE_SECONDS)
+# Entries expire with their token, see get_current_user.
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_EXPIRATION_MINUTES * 60)
 
-
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
+# Everything the login and token-info bodies render, loaded in one query.
+PROFILE_OPTIONS = (
+    joinedload(models.User.organization),
+    joinedload(models.User.primary_roles),
+    joinedload(models.User.skill_level),
+)
 
 
 @router.post("/employee/{linkref}")
@@ -92,7 +94,7 @@ def create_user_employee(
         id=uuid.uuid4(),
         username=create_user_request.username,
         email=create_user_request.email,
-        hashed_password=bcrypt_context.hash(create_user_request.password),
+        hashed_password=hash_password(create_user_request.password),
     )
 
     create_user_model.primary_roles.append(
@@ -139,7 +141,7 @@ def create_user(db: DbDependency, create_user_request: RegisterOwner):
         id=user_id,
         username=create_user_request.username,
         email=create_user_request.email,
-        hashed_password=bcrypt_context.hash(create_user_request.password),
+        hashed_password=hash_password(create_user_request.password),
     )
     create_user_model.primary_roles.append(
         db.query(models.Primary_Roles).filter_by(role_name="Organization Admin").first()
@@ -187,66 +189,80 @@ def login_for_access_token(
     )
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content={
-            "access_token": token,
-            "token_type": "Bearer",
-            "user": {
-                "id": str(user.id),
-                "username": user.username,
-                "email": user.email,
-                "organization_id": str(user.organization_id),
-                "organization_name": user.organization.organization_name,
-                "roles": [i.role_name for i in user.primary_roles],
-                "department_id": (
-                    str(user.department_id) if user.department_id else None
-                ),
-                "skills": [{"skill_id": str(i.id)} for i in user.skill_level],
-            },
-        },
+        content=token_info(token, cache_profile(user)),
     )
 
 
 @router.get("/token-info/{_token}")
 def get_info_from_token(db: DbDependency, _token: str):
     _id = get_current_user(_token)["id"]
-    user = db.query(models.User).filter_by(id=_id).first()
+    profile = profile_cache.get(_id)
 
-    if not user:
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content="Internal server error, an user should exist but it does not.",
-        )
+    if not profile:
+        user = db.query(models.User).options(*PROFILE_OPTIONS).filter_by(id=_id).first()
+
+        if not user:
+            return JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content="Internal server error, an user should exist but it does not.",
+            )
+
+        profile = cache_profile(user)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content={
-            "access_token": _token,
-            "token_type": "Bearer",
-            "user": {
-                "id": str(user.id),
-                "username": user.username,
-                "email": user.email,
-                "organization_id": str(user.organization_id),
-                "organization_name": user.organization.organization_name,
-                "roles": [i.role_name for i in user.primary_roles],
-                "department_id": (
-                    str(user.department_id) if user.department_id else None
-                ),
-                "skills": [{"skill_id": str(i.id)} for i in user.skill_level],
-            },
-        },
+        content=token_info(_token, profile),
     )
 
 
+def token_info(token: str, profile: dict):
+    """
+    Body returned by the login and token-info endpoints.
+    """
+    return {
+        "access_token": token,
+        "token_type": "Bearer",
+        "user": profile,
+    }
+
+
+def cache_profile(user: models.User) -> dict:
+    """
+    Builds the profile part of token_info from an user loaded with
+    PROFILE_OPTIONS and caches it.
+    """
+    profile = {
+        "id": str(user.id),
+        "username": user.username,
+        "email": user.email,
+        "organization_id": str(user.organization_id),
+        "organization_name": user.organization.organization_name,
+        "roles": [i.role_name for i in user.primary_roles],
+        "department_id": (str(user.department_id) if user.department_id else None),
+        "skills": [{"skill_id": str(i.id)} for i in user.skill_level],
+    }
+    profile_cache.set(str(user.id), profile)
+    return profile
+
+
 def authenticate_user(email: str, password: str, db):
     """
-    Verifies user password.
+    Verifies user password, upgrading its hash if the hashing settings changed.
     """
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = (
+        db.query(models.User)
+        .options(*PROFILE_OPTIONS)
+        .filter(models.User.email == email)
+        .first()
+    )
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    verified, new_hash = verify_password(password, user.hashed_password)
+    if not verified:
         return False
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
     return user
 
 
@@ -263,19 +279,102 @@ def create_access_token(username: str, user_id: str, expires_delta: timedelta):
 def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
     """
     Dependency for restricting non-logged-in users from accessing endpoints that
-    should not be visible to them.
+    should not be visible to them. Verified tokens are cached until they expire.
     """
+    claims = token_cache.get(token)
+    if claims:
+        return claims
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         user_id: int = payload.get("id")
-        if username is None or user_id is None:
+        # Tokens without an expiration would never expire nor leave the cache.
+        expires = payload.get("exp")
+        if username is None or user_id is None or expires is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate user.",
             )
-        return {"username": username, "id": user_id}
+        claims = {"username": username, "id": user_id}
+        token_cache.set(token, claims, ttl=expires - time.time())
+        return claims
     except JWTError as exc:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user."
         ) from exc
+
+
+def get_current_principal(
+    db: DbDependency, user: Annotated[dict, Depends(get_current_user)]
+) -> Principal:
+    """
+    Dependency resolving the logged-in user together with his primary roles.
+    Principals are cached per process by user id, so most requests do not touch
+    the database before the handler runs.
+    """
+    principal = principal_cache.get(user["id"])
+    if principal:
+        return principal
+
+    action_user = (
+        db.query(models.User)
+        .options(selectinload(models.User.primary_roles))
+        .filter_by(id=user["id"])
+        .first()
+    )
+    if not action_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user."
+        )
+
+    return cache_principal(action_user)
+
+
+async def get_current_principal_async(
+    db: AsyncDbDependency, user: Annotated[dict, Depends(get_current_user)]
+) -> Principal:
+    """
+    get_current_principal for the routers running on the async database stack.
+    """
+    principal = principal_cache.get(user["id"])
+    if principal:
+        return principal
+
+    action_user = (
+        await db.scalars(
+            select(models.User)
+            .options(selectinload(models.User.primary_roles))
+            .filter_by(id=user["id"])
+        )
+    ).first()
+    if not action_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user."
+        )
+
+    return cache_principal(action_user)
+
+
+def cache_principal(action_user: models.User) -> Principal:
+    """
+    Builds the principal of an user with loaded primary_roles and caches it.
+    """
+    principal = Principal(
+        id=action_user.id,
+        username=action_user.username,
+        organization_id=action_user.organization_id,
+        department_id=action_user.department_id,
+        roles=frozenset(i.role_name for i in action_user.primary_roles),
+    )
+    principal_cache.set(str(action_user.id), principal)
+    return principal
+
+
+def invalidate_principal(user_id):
+    """
+    Drops the cached principal and profile of an user whose roles, department
+    or skills changed.
+    """
+    principal_cache.pop(str(user_id))
+    profile_cache.pop(str(user_id))
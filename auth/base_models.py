@@ -2,7 +2,10 @@
 BaseModels for the authentication.py endpoints
 """
 
-from pydantic import BaseModel
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
 
 
 class RegisterOwner(BaseModel):
@@ -40,3 +43,18 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: dict
+
+
+class Principal(BaseModel):
+    """
+    The authenticated user as seen by the routers. Resolved once per request
+    by get_current_principal, roles is a frozenset for O(1) membership checks.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    id: UUID
+    username: str
+    organization_id: Optional[UUID] = None
+    department_id: Optional[UUID] = None
+    roles: frozenset[str]
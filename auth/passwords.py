@@ -0,0 +1,107 @@
+"""
+Password hashing. Hashes are computed in a bounded process pool so a burst of
+logins or registrations cannot starve the request workers of CPU.
+
+PASSWORD_SCHEME picks the scheme for new hashes: "bcrypt" (default) or
+"argon2", which needs the argon2-cffi package. Hashes made with an older
+scheme or cost are replaced the next time their owner logs in.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import asyncio
+import multiprocessing
+import os
+
+from passlib.context import CryptContext
+
+PASSWORD_SCHEME = os.environ.get("PASSWORD_SCHEME", "bcrypt")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# 0 hashes on the calling thread instead.
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+)
+
+if PASSWORD_SCHEME == "argon2":
+    # bcrypt stays verifiable so existing users can still log in and be rehashed.
+    pwd_context = CryptContext(
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=BCRYPT_ROUNDS,
+    )
+    # Fail at startup rather than on the first login.
+    pwd_context.handler("argon2").get_backend()
+else:
+    pwd_context = CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+    )
+
+_executor = None
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    The hashing pool, started on first use. Workers are spawned rather than
+    forked so they do not inherit the server's threads and connections.
+    """
+    global _executor  # pylint: disable=global-statement
+    if _executor is None and PASSWORD_HASH_WORKERS > 0:
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def hash_password(password: str) -> str:
+    executor = get_executor()
+    if executor is None:
+        return _hash(password)
+    return executor.submit(_hash, password).result()
+
+
+def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Returns whether the password matches and, if the stored hash uses an
+    outdated scheme or cost, its replacement.
+    """
+    executor = get_executor()
+    if executor is None:
+        return _verify_and_update(password, hashed_password)
+    return executor.submit(_verify_and_update, password, hashed_password).result()
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hashes many passwords at once, spread over all pool workers.
+    """
+    executor = get_executor()
+    if executor is None:
+        return [_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (PASSWORD_HASH_WORKERS * 4))
+    return list(executor.map(_hash, passwords, chunksize=chunksize))
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), _hash, password
+    )
+
+
+async def verify_password_async(
+    password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    verify_password without blocking the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), _verify_and_update, password, hashed_password
+    )
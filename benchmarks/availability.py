@@ -0,0 +1,128 @@
+"""
+Benchmark of POST /project/find. Seeds an organization of N employees, each
+in one project with work hours and a primary role, and reports the statements
+sent and the latency of a search.
+
+    python -m benchmarks.availability --employees 5000 --repeat 20
+"""
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+import argparse
+import json
+
+from sqlalchemy import insert, text
+
+from auth.base_models import Principal
+from benchmarks.common import count_statements, measure, rolled_back_session
+from database.models import (
+    Organization,
+    Primary_Roles,
+    Projects,
+    User,
+    WorkHours,
+    user_projects,
+    users_primary_roles,
+)
+from project.base_models import GetAvailableEmployeesModel
+from project.projects import get_available_employees
+from project.workload import refresh_workloads
+
+
+def seed(db, employees: int) -> Principal:
+    owner_id = uuid4()
+    organization = Organization(
+        organization_name="Benchmark",
+        hq_address="Address",
+        custom_link=uuid4().hex,
+        owner_id=owner_id,
+    )
+    role = Primary_Roles(role_name="Employee")
+    db.add_all([organization, role])
+    db.flush()
+
+    users = [
+        {
+            "id": uuid4(),
+            "username": f"employee {i}",
+            "email": f"{uuid4().hex}@example.com",
+            "hashed_password": "",
+            "organization_id": organization.id,
+        }
+        for i in range(employees)
+    ]
+    db.execute(insert(User), users)
+    projects = [
+        {
+            "id": uuid4(),
+            "organization_id": organization.id,
+            "project_name": f"Project {i}",
+            "project_period": "Fixed",
+            "start_date": datetime.now(),
+            "deadline_date": datetime.now() + timedelta(weeks=i % 8),
+            "project_status": "In Progress",
+            "description": "Benchmark",
+            "project_manager": users[0]["id"],
+        }
+        for i in range(max(1, employees // 10))
+    ]
+    db.execute(insert(Projects), projects)
+
+    memberships = [
+        (user["id"], projects[i % len(projects)]["id"]) for i, user in enumerate(users)
+    ]
+    db.execute(
+        insert(user_projects),
+        [{"user_id": i, "project_id": j} for i, j in memberships],
+    )
+    db.execute(
+        insert(WorkHours),
+        [
+            {"user_id": i, "project_id": j, "work_hours": n % 9}
+            for n, (i, j) in enumerate(memberships)
+        ],
+    )
+    db.execute(
+        insert(users_primary_roles),
+        [{"user_id": i["id"], "primary_role_id": role.id} for i in users],
+    )
+    refresh_workloads(db, [i["id"] for i in users])
+    db.flush()
+    # The planner needs statistics of the seeded rows.
+    db.execute(text("ANALYZE"))
+
+    return Principal(
+        id=owner_id,
+        username="owner",
+        organization_id=organization.id,
+        roles=frozenset({"Organization Admin"}),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    search = GetAvailableEmployeesModel(
+        partially_available=True, close_to_finish=True, deadline=4, unavailable=True
+    )
+    with rolled_back_session() as db:
+        action_user = seed(db, args.employees)
+
+        def run():
+            return get_available_employees(db, action_user, search)
+
+        with count_statements(db) as statements:
+            response = run()
+        result = {
+            "employees": len(json.loads(response.body)),
+            "statements": len(statements),
+        }
+        result.update(measure(run, args.repeat))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Helpers of the benchmarks. Database benchmarks seed their data in a
+transaction on the database configured for database.db and roll it back, so
+they can run against any migrated development database.
+"""
+
+from contextlib import contextmanager
+from typing import Callable, List
+import statistics
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+@contextmanager
+def rolled_back_session():
+    from database.db import ENGINE
+
+    with ENGINE.connect() as connection:
+        transaction = connection.begin()
+        with Session(
+            bind=connection, join_transaction_mode="create_savepoint"
+        ) as session:
+            yield session
+        transaction.rollback()
+
+
+@contextmanager
+def count_statements(db: Session):
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+
+def measure(run: Callable, repeat: int) -> dict:
+    """
+    Calls run repeat times and returns its latency percentiles in ms.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "runs": repeat,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[max(0, int(len(timings) * 0.95) - 1)], 2),
+    }
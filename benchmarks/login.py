@@ -0,0 +1,57 @@
+"""
+Login throughput benchmark. Verifies passwords against one stored hash from
+--concurrency threads, as the request workers do during a login storm, and
+reports logins per second and their latency. The hashing setup comes from the
+environment, e.g. compare
+
+    PASSWORD_HASH_WORKERS=0 python -m benchmarks.login
+    PASSWORD_HASH_WORKERS=4 python -m benchmarks.login
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import statistics
+import time
+
+from auth import passwords
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=40)
+    args = parser.parse_args()
+
+    hashed_password = passwords.hash_password("Password1!")
+    # Starts the pool workers before timing.
+    passwords.verify_password("Password1!", hashed_password)
+
+    def login(_):
+        start = time.perf_counter()
+        verified, _ = passwords.verify_password("Password1!", hashed_password)
+        assert verified
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as threads:
+        timings = sorted(threads.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "scheme": passwords.PASSWORD_SCHEME,
+                "bcrypt_rounds": passwords.BCRYPT_ROUNDS,
+                "hash_workers": passwords.PASSWORD_HASH_WORKERS,
+                "logins": args.logins,
+                "logins_per_second": round(args.logins / elapsed, 1),
+                "p50_ms": round(statistics.median(timings), 1),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 1),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Idle push connection load test. Opens --managers /notifications/stream
+connections in process through the ASGI interface, leaves them idle for
+--idle seconds and counts the statements sent by every engine meanwhile, then
+publishes one notification per manager and reports the delivery latency.
+
+    python -m benchmarks.notifications --managers 1000 --idle 40
+
+The default --idle spans two SSE keepalives.
+"""
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from auth.authentication import create_access_token
+from notifications import notification
+from notifications.hub import encode_cursor, hub
+
+
+class Connection:
+    """
+    One idle SSE client: it never disconnects and records when every
+    notification reaches it.
+    """
+
+    def __init__(self, app, user_id):
+        self.user_id = str(user_id)
+        self.token = create_access_token("manager", user_id, timedelta(hours=1))
+        self.app = app
+        self.keepalives = 0
+        self.received = {}
+        self.closed = asyncio.Event()
+
+    async def receive(self):
+        await self.closed.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] != "http.response.body":
+            return
+        body = message.get("body", b"").decode()
+        if body.startswith(": keepalive"):
+            self.keepalives += 1
+        elif body.startswith("id: "):
+            data = json.loads(body.split("data: ", 1)[1])
+            self.received[data["id"]] = time.perf_counter()
+
+    async def run(self):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/notifications/stream",
+            "raw_path": b"/notifications/stream",
+            "query_string": f"token={self.token}".encode(),
+            "root_path": "",
+            "headers": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        await self.app(scope, self.receive, self.send)
+
+
+async def load_test(managers: int, idle: float) -> dict:
+    app = FastAPI()
+    app.include_router(notification.router)
+    await hub.start()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    connections = [Connection(app, uuid4()) for _ in range(managers)]
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        tasks = [asyncio.create_task(i.run()) for i in connections]
+        await asyncio.sleep(idle)
+        idle_statements = len(statements)
+
+        published = {}
+        for i in connections:
+            _id = str(uuid4())
+            created_at = datetime.now()
+            published[_id] = time.perf_counter()
+            hub.publish(
+                i.user_id,
+                {
+                    "id": _id,
+                    "type": "benchmark",
+                    "for_user": i.user_id,
+                    "has_been_read": False,
+                    "created_at": str(created_at),
+                    "cursor": encode_cursor(created_at, _id),
+                },
+            )
+        deadline = time.perf_counter() + 10
+        while (
+            sum(len(i.received) for i in connections) < managers
+            and time.perf_counter() < deadline
+        ):
+            await asyncio.sleep(0.01)
+        publish_statements = len(statements) - idle_statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+        for i in connections:
+            i.closed.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await hub.stop()
+
+    timings = sorted(
+        (received - published[_id]) * 1000
+        for i in connections
+        for _id, received in i.received.items()
+    )
+    return {
+        "managers": managers,
+        "idle_seconds": idle,
+        "keepalive_seconds": notification.SSE_KEEPALIVE_SECONDS,
+        "keepalives": sum(i.keepalives for i in connections),
+        "idle_statements": idle_statements,
+        "delivered": len(timings),
+        "publish_statements": publish_statements,
+        "delivery_p50_ms": round(statistics.median(timings), 2) if timings else None,
+        "delivery_p95_ms": (
+            round(timings[max(0, int(len(timings) * 0.95) - 1)], 2) if timings else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--managers", type=int, default=1000)
+    parser.add_argument("--idle", type=float, default=40)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(load_test(args.managers, args.idle))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Micro-benchmarks of the registration validators in utils.utility, in
+microseconds per address or password.
+
+    python -m benchmarks.validators
+"""
+
+import json
+import timeit
+
+from utils.utility import validate_email, validate_emails, validate_password
+
+EMAILS = [f"employee.{i}@example{i % 7}.com" for i in range(1000)] + [
+    "not an email",
+    "missing@tld",
+]
+PASSWORDS = ["Password1!", "password", "PASSWORD1", "Pass!", "Password!1" * 8]
+
+
+def per_call(run, calls: int, number: int) -> float:
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return round(best / (number * calls) * 1e6, 3)
+
+
+def main():
+    print(
+        json.dumps(
+            {
+                "validate_email_us": per_call(
+                    lambda: [validate_email(i) for i in EMAILS], len(EMAILS), 20
+                ),
+                "validate_emails_us": per_call(
+                    lambda: validate_emails(EMAILS), len(EMAILS), 20
+                ),
+                "validate_password_us": per_call(
+                    lambda: [validate_password(i) for i in PASSWORDS],
+                    len(PASSWORDS),
+                    20000,
+                ),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
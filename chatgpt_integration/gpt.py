@@ -1,65 +1,98 @@
 from typing import Annotated
+import hashlib
+import json
+import os
 
+import numpy as np
 from fastapi import APIRouter, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
+from sqlalchemy.orm import selectinload
 from auth import authentication
-from sqlalchemy.orm import Session
-from database.db import SESSIONLOCAL
+from auth.base_models import Principal
+from database.db import DbDependency
 
 from chatgpt_integration.base_models import GetChatGPTInfo
-from database.models import Organization, Projects, User
+from database.models import Projects
+from project.matching import get_skill_matrix, rank_employees
 
-from utils.chatgpt import chatgpt
+from utils.chatgpt import ChatGPTTimeout, chatgpt
 
 router = APIRouter(tags={"Chat GPT"}, prefix="/gpt")
 
 
-def get_db():
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
+
+# Employees sent to ChatGPT, the best local matches for the project.
+CHATGPT_SHORTLIST_SIZE = int(os.environ.get("CHATGPT_SHORTLIST_SIZE", 25))
+
+
+def shortlist(db, organization_id, project_id):
     """
-    creates a db session
+    The project's requirements and a compact payload of the best local
+    matches: skill ids per employee plus one id to name table. Returns None
+    if the project does not exist in the organization.
     """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-        print("test")
-    finally:
-        db.close()
+    project = (
+        db.query(Projects)
+        .options(
+            selectinload(Projects.project_roles),
+            selectinload(Projects.technologies),
+            selectinload(Projects.users),
+        )
+        .filter_by(id=project_id)
+        .first()
+    )
+    if not project or project.organization_id != organization_id:
+        return None
 
+    matrix = get_skill_matrix(db, organization_id)
+    requirements = [i.custom_role_name for i in project.project_roles] + [
+        i.tech_name for i in project.technologies
+    ]
+    ranking = rank_employees(
+        matrix,
+        requirements,
+        CHATGPT_SHORTLIST_SIZE,
+        exclude=[str(i.id) for i in project.users],
+    )
 
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+    employees = []
+    skills = {}
+    for employee in ranking["employees"]:
+        columns = np.flatnonzero(matrix.scores[matrix.user_index[employee["id"]]])
+        employees.append(
+            {"id": employee["id"], "skills": [matrix.skill_ids[i] for i in columns]}
+        )
+        skills.update({matrix.skill_ids[i]: matrix.skill_names[i] for i in columns})
+    return requirements, {"skills": skills, "employees": employees}
 
 
 @router.post("/additional-context")
-def get_additional_context_from_chatgpt(
-    db: DbDependency, user: UserDependency, _body: GetChatGPTInfo
+async def get_additional_context_from_chatgpt(
+    db: DbDependency, action_user: UserDependency, _body: GetChatGPTInfo
 ):
-
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    project_id = db.query(Projects).filter_by(id=_body.project_id).first()
-    if not project_id:
+    found = await run_in_threadpool(
+        shortlist, db, action_user.organization_id, _body.project_id
+    )
+    if not found:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="This project does not exist.",
         )
-    organization = (
-        db.query(Organization).filter_by(id=action_user.organization_id).first()
-    )
+    requirements, candidates = found
+    # Replies are reused while the same prompt would be sent again.
+    prompt = json.dumps([_body.message, requirements, candidates], sort_keys=True)
 
-    if not organization:
-        return JSONResponse(
-            status_code=404, content="this organization does not exist."
+    try:
+        return await chatgpt(
+            _body.message,
+            candidates,
+            requirements,
+            key=hashlib.sha256(prompt.encode()).hexdigest(),
         )
-
-    employees_list = []
-    for i in organization.employees:
-        employees_list.append(
-            {
-                "id": str(i.id),
-                "user_name": i.username,
-                "skills": [j.skill_name for j in i.skill_level],
-            }
+    except ChatGPTTimeout:
+        return JSONResponse(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            content="ChatGPT did not answer in time.",
         )
-    project_custom_roles = [i for i in project_id.project_roles]
-
-    return chatgpt(_body.message, employees_list, project_custom_roles)
@@ -9,9 +9,8 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
 
-from database.db import SESSIONLOCAL
+from database.db import DbDependency
 from database.models import Custom_Roles, User, Projects, Users_Custom_Roles
 from custom_roles.base_models import (
     AssignCustomRoleModel,
@@ -19,33 +18,22 @@ from custom_roles.base_models import (
     EditCustomRoleModel,
 )
 from auth import authentication
+from auth.base_models import Principal
 
 router = APIRouter(tags={"Custom Roles"}, prefix="/roles/custom")
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def create_role(user: UserDependency, db: DbDependency, _body: CreateCustomRoleModel):
+def create_role(
+    action_user: UserDependency, db: DbDependency, _body: CreateCustomRoleModel
+):
     """
     Create a custom role.
     """
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only an Organization Admin is able to create custom roles.",
@@ -80,9 +68,8 @@ def create_role(user: UserDependency, db: DbDependency, _body: CreateCustomRoleM
 
 @router.post("/user")
 def assign_role_to_user(
-    user: UserDependency, db: DbDependency, _body: AssignCustomRoleModel
+    action_user: UserDependency, db: DbDependency, _body: AssignCustomRoleModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_body.user_id).first()
     project = db.query(Projects).filter_by(id=_body.project_id).first()
     custom_role = db.query(Custom_Roles).filter_by(id=_body.role_id).first()
@@ -124,7 +111,7 @@ def assign_role_to_user(
         user_id=_body.user_id, project_id=_body.project_id, custom_role_id=_body.role_id
     )
 
-    if not "Project Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Project Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only a Project Manager can assign roles to an user.",
@@ -136,9 +123,8 @@ def assign_role_to_user(
 
 @router.delete("/user")
 def delete_role_from_user(
-    user: UserDependency, db: DbDependency, _body: AssignCustomRoleModel
+    action_user: UserDependency, db: DbDependency, _body: AssignCustomRoleModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_body.user_id).first()
     project = db.query(Projects).filter_by(id=_body.project_id).first()
     custom_role = db.query(Custom_Roles).filter_by(id=_body.role_id).first()
@@ -162,7 +148,7 @@ def delete_role_from_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="This user is not from your organization.",
         )
-    if not "Project Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Project Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only a Project Manager can assign roles to an user.",
@@ -194,8 +180,7 @@ def get_all_roles_from_user(user: UserDependency, db: DbDependency, _id: UUID):
 
 
 @router.get("/")
-def get_all_custom_roles(user: UserDependency, db: DbDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def get_all_custom_roles(action_user: UserDependency, db: DbDependency):
     roles = (
         db.query(Custom_Roles)
         .filter_by(organization_id=str(action_user.organization_id))
@@ -210,10 +195,9 @@ def get_all_custom_roles(user: UserDependency, db: DbDependency):
 
 @router.patch("/")
 def edit_custom_role(
-    db: DbDependency, user: UserDependency, _body: EditCustomRoleModel
+    db: DbDependency, action_user: UserDependency, _body: EditCustomRoleModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only an Organization admin can edit team roles.",
@@ -229,9 +213,8 @@ def edit_custom_role(
 
 
 @router.delete("/")
-def delete_custom_role(user: UserDependency, db: DbDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+def delete_custom_role(action_user: UserDependency, db: DbDependency, _id: UUID):
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only an Organization admin can delete team roles.",
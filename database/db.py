@@ -1,14 +1,34 @@
+from typing import Annotated
+
+from fastapi import Depends, Request
 from sqlalchemy import create_engine, URL
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import dotenv_values
 from colorama import Fore
 import os
 
+from database.pool import PoolMetrics, listen_pool_events, metered_pool
+
 env = dotenv_values(".env")
 
 DEBUG_LOCAL_SWITCH = False
 
+# Serve the ported routers through asyncpg and AsyncSession instead of psycopg2.
+DATABASE_ASYNC = os.environ.get("DATABASE_ASYNC", "false").lower() == "true"
+
+# Pool sizing per engine (and so per worker process).
+SQL_POOL_SIZE = int(os.environ.get("SQL_POOL_SIZE", 5))
+SQL_MAX_OVERFLOW = int(os.environ.get("SQL_MAX_OVERFLOW", 10))
+SQL_POOL_TIMEOUT = int(os.environ.get("SQL_POOL_TIMEOUT", 30))
+# Azure drops idle connections, so test them on checkout and replace them
+# well before its idle timeout.
+SQL_POOL_PRE_PING = os.environ.get("SQL_POOL_PRE_PING", "true").lower() == "true"
+SQL_POOL_RECYCLE = int(os.environ.get("SQL_POOL_RECYCLE", 1800))
+# 0 leaves the server default (no timeout).
+SQL_STATEMENT_TIMEOUT_MS = int(os.environ.get("SQL_STATEMENT_TIMEOUT_MS", 0))
+
 if DEBUG_LOCAL_SWITCH:
     SQL_USERNAME = os.environ.get("LOCAL_SQL_USERNAME")
     SQL_PASSWORD = os.environ.get("LOCAL_SQL_PASSWORD")
@@ -20,6 +40,9 @@ else:
     SQL_HOSTNAME = os.environ.get("AZURE_SQL_HOSTNAME")
     SQL_DATABASE_NAME = os.environ.get("AZURE_SQL_DATABASE_NAME")
 
+# Optional read replica sharing the primary's credentials and database name.
+SQL_REPLICA_HOSTNAME = os.environ.get("SQL_REPLICA_HOSTNAME")
+
 # SQLALCHEMY_DATABASE_URL = f"postgresql://{SQL_USERNAME}:{SQL_PASSWORD}@{SQL_HOSTNAME}:5432/{SQL_DATABASE_NAME}"
 
 SQLALCHEMY_DATABASE_URL = URL.create(
@@ -31,8 +54,132 @@ SQLALCHEMY_DATABASE_URL = URL.create(
 )
 
 
-ENGINE = create_engine(SQLALCHEMY_DATABASE_URL)
+POOL_OPTIONS = {
+    "pool_size": SQL_POOL_SIZE,
+    "max_overflow": SQL_MAX_OVERFLOW,
+    "pool_timeout": SQL_POOL_TIMEOUT,
+    "pool_pre_ping": SQL_POOL_PRE_PING,
+    "pool_recycle": SQL_POOL_RECYCLE,
+}
+
 
+def build_engine(url: URL, metrics: PoolMetrics):
+    """
+    psycopg2 engine with the configured, metered pool.
+    """
+    engine = create_engine(
+        url,
+        poolclass=metered_pool(metrics),
+        connect_args=(
+            {"options": f"-c statement_timeout={SQL_STATEMENT_TIMEOUT_MS}"}
+            if SQL_STATEMENT_TIMEOUT_MS
+            else {}
+        ),
+        **POOL_OPTIONS,
+    )
+    listen_pool_events(engine, metrics)
+    return engine
+
+
+def build_async_engine(url: URL, metrics: PoolMetrics):
+    """
+    asyncpg engine with the configured, metered pool.
+    """
+    engine = create_async_engine(
+        url.set(drivername="postgresql+asyncpg"),
+        poolclass=metered_pool(metrics, is_async=True),
+        connect_args=(
+            {"server_settings": {"statement_timeout": str(SQL_STATEMENT_TIMEOUT_MS)}}
+            if SQL_STATEMENT_TIMEOUT_MS
+            else {}
+        ),
+        **POOL_OPTIONS,
+    )
+    listen_pool_events(engine, metrics)
+    return engine
+
+
+POOL_METRICS = PoolMetrics()
+ENGINE = build_engine(SQLALCHEMY_DATABASE_URL, POOL_METRICS)
 SESSIONLOCAL = sessionmaker(autocommit=False, autoflush=False, bind=ENGINE)
 
+# GET requests are served from the replica when one is configured.
+REPLICA_POOL_METRICS = PoolMetrics()
+if SQL_REPLICA_HOSTNAME:
+    SQLALCHEMY_REPLICA_URL = SQLALCHEMY_DATABASE_URL.set(host=SQL_REPLICA_HOSTNAME)
+    REPLICA_ENGINE = build_engine(SQLALCHEMY_REPLICA_URL, REPLICA_POOL_METRICS)
+    REPLICA_SESSIONLOCAL = sessionmaker(
+        autocommit=False, autoflush=False, bind=REPLICA_ENGINE
+    )
+else:
+    SQLALCHEMY_REPLICA_URL = None
+    REPLICA_ENGINE = None
+    REPLICA_SESSIONLOCAL = SESSIONLOCAL
+
+ASYNC_POOL_METRICS = PoolMetrics()
+ASYNC_REPLICA_POOL_METRICS = PoolMetrics()
+ASYNC_ENGINE = None
+ASYNC_SESSIONLOCAL = None
+ASYNC_REPLICA_ENGINE = None
+ASYNC_REPLICA_SESSIONLOCAL = None
+
+if DATABASE_ASYNC:
+    ASYNC_ENGINE = build_async_engine(SQLALCHEMY_DATABASE_URL, ASYNC_POOL_METRICS)
+    ASYNC_SESSIONLOCAL = async_sessionmaker(
+        bind=ASYNC_ENGINE, autoflush=False, expire_on_commit=False
+    )
+    ASYNC_REPLICA_SESSIONLOCAL = ASYNC_SESSIONLOCAL
+    if SQL_REPLICA_HOSTNAME:
+        ASYNC_REPLICA_ENGINE = build_async_engine(
+            SQLALCHEMY_REPLICA_URL, ASYNC_REPLICA_POOL_METRICS
+        )
+        ASYNC_REPLICA_SESSIONLOCAL = async_sessionmaker(
+            bind=ASYNC_REPLICA_ENGINE, autoflush=False, expire_on_commit=False
+        )
+
+
+def uses_primary(endpoint):
+    """
+    Marks a GET endpoint that writes, so it is never routed to the replica.
+    """
+    endpoint.uses_primary = True
+    return endpoint
+
+
+def reads_from_replica(request: Request) -> bool:
+    return request.method == "GET" and not getattr(
+        request.scope.get("endpoint"), "uses_primary", False
+    )
+
+
+def get_db(request: Request):
+    """
+    creates the db session of the request. FastAPI caches dependencies per
+    request, so the principal, the role checks and the handler all share it.
+    """
+    if reads_from_replica(request):
+        db = REPLICA_SESSIONLOCAL()
+    else:
+        db = SESSIONLOCAL()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db(request: Request):
+    """
+    creates the async db session of the request
+    """
+    if reads_from_replica(request):
+        sessionlocal = ASYNC_REPLICA_SESSIONLOCAL
+    else:
+        sessionlocal = ASYNC_SESSIONLOCAL
+    async with sessionlocal() as db:
+        yield db
+
+
+DbDependency = Annotated[Session, Depends(get_db)]
+AsyncDbDependency = Annotated[AsyncSession, Depends(get_async_db)]
+
 Base = declarative_base()
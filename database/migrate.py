@@ -0,0 +1,38 @@
+"""
+Brings the database schema up to date. Run before starting the server:
+    python -m database.migrate
+"""
+
+import os
+
+from alembic import command
+from alembic.config import Config
+from colorama import Fore
+from sqlalchemy import inspect
+
+from database.db import ENGINE
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic.ini")
+BASELINE_REVISION = "0001"
+
+
+def upgrade_database():
+    """
+    Upgrades to the latest revision. Databases created with create_all before
+    migrations existed are stamped with the baseline first so their tables are
+    not created twice.
+    """
+    config = Config(ALEMBIC_INI)
+
+    tables = inspect(ENGINE).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        print(
+            f"{Fore.GREEN}DATABASE: {Fore.WHITE}Existing schema found, stamping the baseline revision."
+        )
+        command.stamp(config, BASELINE_REVISION)
+
+    command.upgrade(config, "head")
+
+
+if __name__ == "__main__":
+    upgrade_database()
@@ -18,6 +18,8 @@ from sqlalchemy import (
     UniqueConstraint,
     BOOLEAN,
     Enum,
+    Index,
+    text,
 )
 
 
@@ -31,6 +33,12 @@ users_primary_roles = Table(
     Base.metadata,
     Column("primary_role_id", ForeignKey("primary_roles.id")),
     Column("user_id", ForeignKey("users.id")),
+    UniqueConstraint(
+        "user_id",
+        "primary_role_id",
+        name="users_primary_roles_user_id_primary_role_id_key",
+    ),
+    Index("ix_users_primary_roles_primary_role_id", "primary_role_id"),
 )
 departments_skills = Table(
     "departments_skills",
@@ -57,6 +65,8 @@ user_skills = Table(
     Column(
         "skill_experience", INTEGER
     ),  # 0-6 months 6-12 months 1-2 years 2-4 years 4-7 years > 7 years
+    UniqueConstraint("user_id", "skill_id", name="user_skills_user_id_skill_id_key"),
+    Index("ix_user_skills_skill_id", "skill_id"),
 )
 
 user_projects = Table(
@@ -64,6 +74,10 @@ user_projects = Table(
     Base.metadata,
     Column("user_id", ForeignKey("users.id")),
     Column("project_id", ForeignKey("projects.id")),
+    UniqueConstraint(
+        "user_id", "project_id", name="user_projects_user_id_project_id_key"
+    ),
+    Index("ix_user_projects_project_id", "project_id"),
 )
 
 dealloc_user_projects = Table(
@@ -91,9 +105,18 @@ allocation_roles = Table(
 # pylint: disable=invalid-name
 class User_Skills(Base):
     __tablename__ = "users_skills"
+    __table_args__ = (
+        # Review queue of the skills waiting for validation.
+        Index(
+            "ix_users_skills_unverified_user_id_id",
+            "user_id",
+            "id",
+            postgresql_where=text("verified IS NOT TRUE"),
+        ),
+    )
     id = Column(UUID, default=uuid4, primary_key=True)
-    user_id = Column(UUID, ForeignKey("users.id"))
-    skill_id = Column(UUID, ForeignKey("skills.id"))
+    user_id = Column(UUID, ForeignKey("users.id"), index=True)
+    skill_id = Column(UUID, ForeignKey("skills.id"), index=True)
     skill_level = Column(INTEGER)
     skill_experience = Column(INTEGER)
     training_title = Column(String)
@@ -135,15 +158,37 @@ class Department_projects(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Employees of an organization not assigned to any department yet.
+        Index(
+            "ix_users_unassigned_organization_id_id",
+            "organization_id",
+            "id",
+            postgresql_where=text("department_id IS NULL"),
+        ),
+        # Substring search of the employee directory, needs pg_trgm.
+        Index(
+            "ix_users_username_trgm",
+            "username",
+            postgresql_using="gin",
+            postgresql_ops={"username": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_users_email_trgm",
+            "email",
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
     username = Column(String, nullable=False)
-    email = Column(String, nullable=False)
+    email = Column(String, nullable=False, unique=True, index=True)
     hashed_password = Column(String, nullable=False)
     organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"))
     organization = relationship("Organization", back_populates="employees")
     department_id = Column(
-        UUID(as_uuid=True), ForeignKey("departments.id"), nullable=True
+        UUID(as_uuid=True), ForeignKey("departments.id"), nullable=True, index=True
     )
     department = relationship("Department", back_populates="department_users")
     created_at = Column(DateTime, default=datetime.now, nullable=False)
@@ -172,7 +217,7 @@ class Organization(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
     organization_name = Column(String, nullable=False)
     hq_address = Column(String, nullable=False)
-    custom_link = Column(String, nullable=False)
+    custom_link = Column(String, nullable=False, unique=True, index=True)
     owner_id = Column(
         UUID(as_uuid=True), nullable=False
     )  # nu cred ca avem nevoie de relationship
@@ -190,6 +235,11 @@ class Department(Base):
         UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=False
     )
     department_users = relationship("User", back_populates="department")
+    manager = relationship(
+        "User",
+        primaryjoin="foreign(Department.department_manager) == User.id",
+        viewonly=True,
+    )
     skills = relationship(
         "Skill", secondary=departments_skills, back_populates="departments"
     )
@@ -220,7 +270,7 @@ class Skill(Base):
     skill_category = Column(ARRAY(UUID))
     skill_name = Column(String, nullable=False)
     skill_description = Column(String, nullable=False)
-    organization_id = Column(UUID, ForeignKey("organizations.id"))
+    organization_id = Column(UUID, ForeignKey("organizations.id"), index=True)
     author = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     departments = relationship(
         "Department", secondary=departments_skills, back_populates="skills"
@@ -244,23 +294,28 @@ class AllocationProposal(Base):
     __tablename__ = "allocation_proposals"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
     project_id_allocation = Column(
-        UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False
+        UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True
+    )
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
     )
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     comments = Column(String)
     work_hours = Column(INTEGER)
     roles = relationship(
         "Custom_Roles", secondary=allocation_roles, backref="allocations"
     )
+    user = relationship("User", viewonly=True)
 
 
 class DeallocationProposal(Base):
     __tablename__ = "deallocation_proposals"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
     project_id_deallocation = Column(
-        UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False
+        UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True
+    )
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
     )
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     reason = Column(String)
 
 
@@ -287,6 +342,7 @@ class Projects(Base):
     technologies = relationship(
         "TechnologyStack", secondary=project_technology, back_populates="projects"
     )
+    allocation_proposals = relationship("AllocationProposal", viewonly=True)
     project_manager = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     deletable = Column(BOOLEAN, default=True)
 
@@ -306,13 +362,35 @@ class TechnologyStack(Base):
 class WorkHours(Base):
     __tablename__ = "project_work_hours"
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid4)
-    user_id = Column(UUID, ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUID, ForeignKey("users.id"), nullable=False, index=True)
     project_id = Column(UUID, ForeignKey("projects.id"))
     work_hours = Column(INTEGER)
 
 
+class UserWorkload(Base):
+    """
+    Per-user summary of WorkHours and project membership, kept up to date by
+    project.workload.refresh_workloads.
+    """
+
+    __tablename__ = "user_workload"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    work_hours = Column(INTEGER, nullable=False, default=0)
+    project_count = Column(INTEGER, nullable=False, default=0)
+    nearest_deadline = Column(DateTime, nullable=True)
+
+
 class Notifications(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Keyset pagination of a manager's notifications.
+        Index(
+            "ix_notifications_to_manager_created_at_id",
+            "to_manager",
+            "created_at",
+            "id",
+        ),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid4)
     type = Column(
         Enum("ALLOCATION", "DEALLOCATION", "VALIDATION", name="notification_type")
@@ -320,3 +398,29 @@ class Notifications(Base):
     to_manager = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     for_user = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     sent = Column(BOOLEAN, default=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+
+
+class NotificationsArchive(Base):
+    __tablename__ = "notifications_archive"
+    id = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    type = Column(
+        Enum("ALLOCATION", "DEALLOCATION", "VALIDATION", name="notification_type")
+    )
+    to_manager = Column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+    )
+    for_user = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.now, nullable=False)
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid4)
+    type = Column(
+        Enum("ALLOCATION", "DEALLOCATION", "VALIDATION", name="notification_type")
+    )
+    to_manager = Column(UUID(as_uuid=True), nullable=False)
+    for_user = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
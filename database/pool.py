@@ -0,0 +1,121 @@
+"""
+Connection pool instrumentation. The engines in database.db are built with a
+metered pool class so /metrics can report how the pool is actually used.
+"""
+
+from threading import Lock
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Counters collected for one engine's pool.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def record_checkout(self, waited: float, checked_out: int, overflow: int):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def record_timeout(self, waited: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "wait_avg_ms": (self.wait_total / waits * 1000) if waits else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+            }
+
+
+class _MeteredPoolMixin:
+    """
+    Times every checkout, including the time spent waiting for a free
+    connection once pool_size + max_overflow are in use.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        self.metrics.record_checkout(
+            time.perf_counter() - start, self.checkedout(), max(self.overflow(), 0)
+        )
+        return connection
+
+
+def metered_pool(metrics: PoolMetrics, is_async: bool = False):
+    """
+    Returns a pool class bound to metrics. The binding lives on the class so
+    it survives pool.recreate() after ENGINE.dispose().
+    """
+    base = AsyncAdaptedQueuePool if is_async else QueuePool
+    return type(
+        f"Metered{base.__name__}",
+        (_MeteredPoolMixin, base),
+        {"metrics": metrics},
+    )
+
+
+def listen_pool_events(engine, metrics: PoolMetrics):
+    """
+    Counts new connections and invalidated ones (pre-ping failures,
+    disconnects) on engine, which may be a sync or async engine.
+    """
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "connect", lambda *_: metrics.record_connect())
+    event.listen(engine, "invalidate", lambda *_: metrics.record_invalidation())
+
+
+def pool_status(engine, metrics: PoolMetrics) -> dict:
+    """
+    Current pool occupancy plus the collected counters.
+    """
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        **metrics.snapshot(),
+    }
@@ -2,35 +2,23 @@ from typing import Annotated
 
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
 
 
 from auth import authentication
+from auth.base_models import Principal
 
-from database.db import SESSIONLOCAL
+from database.db import DbDependency
 from database.models import Primary_Roles, User
 
 router = APIRouter(prefix="/debug", tags={"Debugging"})
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.post("/DEBUG_ALL_PRIMARY_ROLES")
 def primary(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+    action_user = db.query(User).filter_by(id=user.id).first()
     roles = db.query(Primary_Roles).all()
 
     for i in roles:
@@ -38,3 +26,4 @@ def primary(db: DbDependency, user: UserDependency):
             action_user.primary_roles.append(i)
 
     db.commit()
+    authentication.invalidate_principal(action_user.id)
@@ -27,5 +27,9 @@ class AddUserToDepartmentModel(BaseModel):
     user_id: UUID
 
 
+class DepartmentUsersModel(BaseModel):
+    ids: list[UUID]
+
+
 class AddSkillsToDepartmentModel(BaseModel):
     skill_id: list[UUID]
@@ -1,8 +1,10 @@
-from typing import Annotated
+from typing import Annotated, List, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, exists, func, select, update
+from sqlalchemy.orm import joinedload, selectinload
 
 from departments.base_models import (
     AddSkillsToDepartmentModel,
@@ -11,36 +13,34 @@ from departments.base_models import (
     CreateDepartmentModel,
     DeleteDepartmentModel,
     DeleteManagerModel,
+    DepartmentUsersModel,
     EditDepartmentModel,
 )
 from auth import authentication
-from database.models import Organization, Skill, User, Department
-from database.db import SESSIONLOCAL
+from auth.base_models import Principal
+from database.models import (
+    Department,
+    Skill,
+    User,
+    departments_skills,
+)
+from database.db import DbDependency
+from departments.skill_matrix import (
+    get_department_matrix,
+    invalidate_department_matrix,
+)
 
 router = APIRouter(prefix="/department", tags={"Department"})
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.post("/")
 def create_department(
-    db: DbDependency, user: UserDependency, _body: CreateDepartmentModel
+    db: DbDependency, action_user: UserDependency, _body: CreateDepartmentModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only an Organization Admin can create a Department.",
@@ -69,8 +69,7 @@ def create_department(
 
 
 @router.get("/")
-def get_department_info(db: DbDependency, user: UserDependency, _id: str):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def get_department_info(db: DbDependency, action_user: UserDependency, _id: str):
     department = db.query(Department).filter_by(id=_id).first()
 
     if not department:
@@ -107,8 +106,8 @@ def get_department_info(db: DbDependency, user: UserDependency, _id: str):
 
 @router.patch("/")
 def edit_department(db: DbDependency, user: UserDependency, _body: EditDepartmentModel):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    action_user = db.query(User).filter_by(id=user.id).first()
+    if not "Department Manager" in user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only an Department Manager can edit a Department.",
@@ -136,11 +135,9 @@ def edit_department(db: DbDependency, user: UserDependency, _body: EditDepartmen
 
 @router.delete("/")
 def delete_department(
-    db: DbDependency, user: UserDependency, _body: DeleteDepartmentModel
+    db: DbDependency, action_user: UserDependency, _body: DeleteDepartmentModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only an Organization Admin can delete a Department.",
@@ -175,9 +172,8 @@ def delete_department(
 
 @router.post("/manager/")
 def assign_department_manager(
-    db: DbDependency, user: UserDependency, _body: AssignManagerModel
+    db: DbDependency, action_user: UserDependency, _body: AssignManagerModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_body.manager_id).first()
     department = db.query(Department).filter_by(id=_body.department_id).first()
 
@@ -203,7 +199,7 @@ def assign_department_manager(
             status_code=status.HTTP_404_NOT_FOUND,
             content="The department you provided does not exist.",
         )
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only the Organization Admin can assign a Department Manager.",
@@ -230,13 +226,14 @@ def assign_department_manager(
     department.department_manager = victim_user.id
     victim_user.department_id = department.id
     db.commit()
+    authentication.invalidate_principal(victim_user.id)
+    invalidate_department_matrix(department.id)
 
 
 @router.delete("/manager/")
 def delete_department_manager(
-    db: DbDependency, user: UserDependency, _body: DeleteManagerModel
+    db: DbDependency, action_user: UserDependency, _body: DeleteManagerModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     department = db.query(Department).filter_by(id=_body.department_id).first()
     victim_user = db.query(User).filter_by(id=department.department_manager).first()
 
@@ -245,7 +242,7 @@ def delete_department_manager(
             status_code=status.HTTP_404_NOT_FOUND,
             content="The department you provided does not exist.",
         )
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only the Organization Admin can delete a Department Manager.",
@@ -260,35 +257,54 @@ def delete_department_manager(
     department.department_manager = None
     victim_user.department_id = None
     db.commit()
+    authentication.invalidate_principal(victim_user.id)
+    invalidate_department_matrix(department.id)
 
 
 @router.get("/unassigned/")
-def get_unassigned_department_users(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    employees_db = (
-        db.query(Organization)
-        .filter_by(id=action_user.organization_id)
-        .first()
-        .employees
+def get_unassigned_department_users(
+    db: DbDependency,
+    action_user: UserDependency,
+    after: Optional[UUID] = None,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+):
+    """
+    Employees of the organization without a department, ordered by id. Pass
+    the id of the last employee received as after to get the next page.
+    """
+    query = (
+        select(User)
+        .options(selectinload(User.primary_roles))
+        .filter(
+            User.organization_id == action_user.organization_id,
+            User.department_id.is_(None),
+        )
+        .order_by(User.id)
+        .limit(limit)
     )
+    if after:
+        query = query.filter(User.id > after)
 
-    unassigned_employees = [i for i in employees_db if i.department_id is None]
-    dict_employees = [
-        i.__dict__ for i in unassigned_employees if i.department_id is None
-    ]
-
-    for i, j in zip(dict_employees, unassigned_employees):
-        i.pop("hashed_password")
-        i["primary_roles"] = [x.role_name for x in j.primary_roles]
-
-    return unassigned_employees
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[
+            {
+                "id": str(i.id),
+                "username": i.username,
+                "email": i.email,
+                "organization_id": str(i.organization_id),
+                "department_id": None,
+                "created_at": i.created_at.isoformat(),
+                "primary_roles": [x.role_name for x in i.primary_roles],
+            }
+            for i in db.scalars(query)
+        ],
+    )
 
 
 @router.get("/users/")
-def get_users_from_department(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+def get_users_from_department(db: DbDependency, action_user: UserDependency):
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=401,
             content="You need the Department Manager role to do this action.",
@@ -319,9 +335,8 @@ def get_users_from_department(db: DbDependency, user: UserDependency):
 
 @router.post("/user")
 def add_user_to_department(
-    db: DbDependency, user: UserDependency, _body: AddUserToDepartmentModel
+    db: DbDependency, action_user: UserDependency, _body: AddUserToDepartmentModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_body.user_id).first()
 
     if not victim_user:
@@ -333,7 +348,7 @@ def add_user_to_department(
         db.query(Department).filter_by(department_manager=victim_user.id).first()
     )
 
-    if "Department Manager" not in [i.role_name for i in action_user.primary_roles]:
+    if "Department Manager" not in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You are not a Department Manager",
@@ -373,13 +388,113 @@ def add_user_to_department(
 
     department.department_users.append(victim_user)
     db.commit()
+    authentication.invalidate_principal(victim_user.id)
+    invalidate_department_matrix(department.id)
+
+
+def membership_outcomes(ids: List[UUID], moved: List[UUID], outcome: str) -> List[dict]:
+    moved = set(moved)
+    return [
+        {"user_id": str(i), "outcome": outcome if i in moved else "skipped"}
+        for i in dict.fromkeys(ids)
+    ]
+
+
+def check_department_manager(action_user: Principal):
+    if not "Department Manager" in action_user.roles:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="You are not a Department Manager",
+        )
+    if not action_user.department_id:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="You are not managing any departments yet.",
+        )
+    return None
+
+
+def change_department(db, ids: List[UUID], condition, department_id) -> List[UUID]:
+    """
+    Moves the users in ids matching condition to department_id with one
+    UPDATE. Returns the ids of the users moved.
+    """
+    moved = db.scalars(
+        update(User)
+        .where(User.id.in_(ids), condition)
+        .values(department_id=department_id)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    for i in moved:
+        authentication.invalidate_principal(i)
+    return moved
+
+
+@router.post("/users/batch")
+def add_users_to_department(
+    db: DbDependency, action_user: UserDependency, _body: DepartmentUsersModel
+):
+    """
+    Adds many users to the department of the manager. Users from another
+    organization, already in a department or managing one are skipped.
+    """
+    error = check_department_manager(action_user)
+    if error:
+        return error
+
+    moved = change_department(
+        db,
+        _body.ids,
+        and_(
+            User.organization_id == action_user.organization_id,
+            User.department_id.is_(None),
+            ~exists().where(Department.department_manager == User.id),
+        ),
+        action_user.department_id,
+    )
+    invalidate_department_matrix(action_user.department_id)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=membership_outcomes(_body.ids, moved, "added"),
+    )
+
+
+@router.delete("/users/batch")
+def remove_users_from_department(
+    db: DbDependency, action_user: UserDependency, _body: DepartmentUsersModel
+):
+    """
+    Removes many users from the department of the manager. Users not in the
+    department and the manager are skipped.
+    """
+    error = check_department_manager(action_user)
+    if error:
+        return error
+
+    moved = change_department(
+        db,
+        _body.ids,
+        and_(
+            User.department_id == action_user.department_id,
+            User.id != action_user.id,
+        ),
+        None,
+    )
+    invalidate_department_matrix(action_user.department_id)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=membership_outcomes(_body.ids, moved, "removed"),
+    )
 
 
 @router.delete("/user")
 def remove_user_to_department(
-    db: DbDependency, user: UserDependency, _body: AddUserToDepartmentModel
+    db: DbDependency, action_user: UserDependency, _body: AddUserToDepartmentModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_body.user_id).first()
 
     if not victim_user:
@@ -410,48 +525,115 @@ def remove_user_to_department(
 
     department.department_users.remove(victim_user)
     db.commit()
+    authentication.invalidate_principal(victim_user.id)
+    invalidate_department_matrix(department.id)
+
+
+DEPARTMENT_FIELDS = (
+    "id",
+    "department_name",
+    "department_manager",
+    "manager_email",
+    "department_users",
+    "skills",
+    "user_count",
+    "skill_count",
+)
+DEFAULT_DEPARTMENT_FIELDS = DEPARTMENT_FIELDS[:6]
 
 
-@router.get("s")
-def get_departments(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    departments = (
-        db.query(Department)
-        .filter_by(organization_id=action_user.organization_id)
-        .all()
-    )
-
-    return_departments = []
-    for i in departments:
-        manager = db.query(User).filter_by(id=i.department_manager).first()
-        manager_email = manager.email if manager else None
-        return_departments.append(
+def departments_statement(organization_id, fields):
+    """
+    Departments of an organization with only what fields renders loaded: the
+    manager is joined, collections are batch loaded and counts are computed
+    in the same query. The listing takes at most three queries.
+    """
+    query = select(Department).filter(Department.organization_id == organization_id)
+    if "manager_email" in fields:
+        query = query.options(
+            joinedload(Department.manager).load_only(User.id, User.email)
+        )
+    if "department_users" in fields:
+        query = query.options(
+            selectinload(Department.department_users).load_only(User.id)
+        )
+    if "skills" in fields:
+        query = query.options(selectinload(Department.skills))
+    if "user_count" in fields:
+        query = query.add_columns(
+            select(func.count(User.id))
+            .where(User.department_id == Department.id)
+            .scalar_subquery()
+            .label("user_count")
+        )
+    if "skill_count" in fields:
+        query = query.add_columns(
+            select(func.count())
+            .select_from(departments_skills)
+            .where(departments_skills.c.department_id == Department.id)
+            .scalar_subquery()
+            .label("skill_count")
+        )
+    return query
+
+
+def department_fields(row) -> dict:
+    department = row.Department
+    return {
+        "id": lambda: str(department.id),
+        "department_name": lambda: department.department_name,
+        "department_manager": lambda: (
+            str(department.department_manager)
+            if department.department_manager
+            else None
+        ),
+        "manager_email": lambda: (
+            department.manager.email if department.manager else None
+        ),
+        "department_users": lambda: [str(j.id) for j in department.department_users],
+        "skills": lambda: [
             {
-                "id": str(i.id),
-                "department_name": i.department_name,
-                "department_manager": (
-                    str(i.department_manager) if i.department_manager else None
-                ),
-                "manager_email": manager_email,
-                "department_users": [str(j.id) for j in i.department_users],
-                "skills": [
-                    {
-                        "skill_name": j.skill_name,
-                        "skill_description": j.skill_description,
-                        "skill_category": [str(k) for k in j.skill_category],
-                    }
-                    for j in i.skills
-                ],
+                "skill_name": j.skill_name,
+                "skill_description": j.skill_description,
+                "skill_category": [str(k) for k in j.skill_category],
             }
+            for j in department.skills
+        ],
+        "user_count": lambda: row.user_count,
+        "skill_count": lambda: row.skill_count,
+    }
+
+
+@router.get("s")
+def get_departments(
+    db: DbDependency, action_user: UserDependency, fields: Optional[str] = None
+):
+    """
+    Departments of the organization. fields is a comma separated subset of
+    DEPARTMENT_FIELDS, e.g. fields=id,department_name,user_count for the org
+    chart; by default everything but the counts is returned.
+    """
+    fields = fields.split(",") if fields else DEFAULT_DEPARTMENT_FIELDS
+    unknown = [i for i in fields if i not in DEPARTMENT_FIELDS]
+    if unknown:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content=f"Unknown fields: {', '.join(unknown)}.",
         )
+
+    rows = db.execute(departments_statement(action_user.organization_id, fields))
+    return_departments = []
+    for row in rows.unique():
+        render = department_fields(row)
+        return_departments.append({i: render[i]() for i in fields})
     return JSONResponse(status_code=status.HTTP_200_OK, content=return_departments)
 
 
 @router.get("/skills")
 def get_skills_from_department(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+    action_user = db.query(User).filter_by(id=user.id).first()
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You are not a department manager.",
@@ -490,13 +672,37 @@ def get_skills_from_department(db: DbDependency, user: UserDependency):
     return JSONResponse(status_code=status.HTTP_200_OK, content=skills)
 
 
+@router.get("/skills/matrix")
+def get_department_skill_matrix(db: DbDependency, user: UserDependency):
+    """
+    Per skill of the department, how many employees have it, split per level,
+    per experience and verified vs unverified.
+    """
+    if not "Department Manager" in user.roles:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="You are not a department manager.",
+        )
+
+    if not user.department_id:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="You are not managing any departments yet.",
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=get_department_matrix(db, user.department_id),
+    )
+
+
 @router.post("/skills")
 def add_skills_to_department(
     db: DbDependency, user: UserDependency, _body: AddSkillsToDepartmentModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+    action_user = db.query(User).filter_by(id=user.id).first()
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You are not a department manager.",
@@ -517,15 +723,16 @@ def add_skills_to_department(
         action_user.department.skills.append(skill)
 
     db.commit()
+    invalidate_department_matrix(action_user.department_id)
 
 
 @router.delete("/skills")
 def remove_skills_from_department(
     db: DbDependency, user: UserDependency, _body: AddSkillsToDepartmentModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+    action_user = db.query(User).filter_by(id=user.id).first()
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You are not a department manager.",
@@ -546,3 +753,4 @@ def remove_skills_from_department(
         action_user.department.skills.remove(skill)
 
     db.commit()
+    invalidate_department_matrix(action_user.department_id)
@@ -0,0 +1,108 @@
+"""
+Skill matrix of a department for the heatmap dashboards: for every skill of
+the department, how many of its employees have it, split per level, per
+experience bucket and verified vs unverified. Computed with one GROUP BY over
+users_skills and cached per department for DEPARTMENT_MATRIX_SECONDS.
+
+The endpoints changing the skills of a department, the skills of an user,
+the members of a department or a skill itself invalidate the cached matrix.
+"""
+
+import os
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from database.models import Skill, User, User_Skills, departments_skills
+from utils.cache import TTLCache
+
+DEPARTMENT_MATRIX_SECONDS = int(os.environ.get("DEPARTMENT_MATRIX_SECONDS", 300))
+
+department_matrix_cache = TTLCache(maxsize=256, ttl=DEPARTMENT_MATRIX_SECONDS)
+
+
+def skill_counts_statement(department_id):
+    """
+    One row per (skill, level, experience, verified) of the department. The
+    skills of the department no employee has yet come back once, with a
+    count of 0.
+    """
+    members = select(User.id).where(User.department_id == department_id)
+    return (
+        select(
+            Skill.id,
+            Skill.skill_name,
+            Skill.skill_category,
+            User_Skills.skill_level,
+            User_Skills.skill_experience,
+            User_Skills.verified,
+            func.count(User_Skills.id).label("users"),
+        )
+        .join(departments_skills, departments_skills.c.skill_id == Skill.id)
+        .outerjoin(
+            User_Skills,
+            and_(User_Skills.skill_id == Skill.id, User_Skills.user_id.in_(members)),
+        )
+        .where(departments_skills.c.department_id == department_id)
+        .group_by(
+            Skill.id,
+            Skill.skill_name,
+            Skill.skill_category,
+            User_Skills.skill_level,
+            User_Skills.skill_experience,
+            User_Skills.verified,
+        )
+        .order_by(Skill.skill_name, Skill.id)
+    )
+
+
+def build_department_matrix(db: Session, department_id) -> list:
+    skills = {}
+    for row in db.execute(skill_counts_statement(department_id)):
+        skill = skills.get(row.id)
+        if skill is None:
+            skill = skills[row.id] = {
+                "id": str(row.id),
+                "skill_name": row.skill_name,
+                "skill_category": [str(i) for i in row.skill_category],
+                "users": 0,
+                "verified": 0,
+                "unverified": 0,
+                "levels": {},
+                "experience": {},
+            }
+        if not row.users:
+            continue
+        skill["users"] += row.users
+        skill["verified" if row.verified else "unverified"] += row.users
+        level, experience = str(row.skill_level), str(row.skill_experience)
+        skill["levels"][level] = skill["levels"].get(level, 0) + row.users
+        skill["experience"][experience] = (
+            skill["experience"].get(experience, 0) + row.users
+        )
+    return list(skills.values())
+
+
+def get_department_matrix(db: Session, department_id) -> list:
+    matrix = department_matrix_cache.get(str(department_id))
+    if matrix is None:
+        matrix = build_department_matrix(db, department_id)
+        department_matrix_cache.set(str(department_id), matrix)
+    return matrix
+
+
+def invalidate_department_matrix(*department_ids):
+    for i in department_ids:
+        if i:
+            department_matrix_cache.pop(str(i))
+
+
+def skill_departments(db: Session, skill_id) -> list:
+    """
+    Ids of the departments having skill_id, whose matrix changes with it.
+    """
+    return db.scalars(
+        select(departments_skills.c.department_id).where(
+            departments_skills.c.skill_id == skill_id
+        )
+    ).all()
@@ -1,30 +1,37 @@
 """
-main.py is the head of the project in which all routers are included and 
-all errors are handled. 
+main.py is the head of the project in which all routers are included and
+all errors are handled.
 """
 
+from contextlib import asynccontextmanager
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.schema import MetaData
 import uvicorn
 import colorama
 
-from auth import authentication
+from auth import async_authentication, authentication
 from account import profile
 from database.create_roles import create_roles
-from database.db import ENGINE, SESSIONLOCAL, DEBUG_LOCAL_SWITCH
-from database import models
+from database.migrate import upgrade_database
+from database.db import ENGINE, DEBUG_LOCAL_SWITCH, DATABASE_ASYNC
 from custom_roles import croles
 from organization import organizations
 from roles import role
 from departments import department
 from skills import skill
-from project import projects
-from proposals import proposal
+from project import async_projects, projects
+from proposals import async_proposal, proposal
 from chatgpt_integration import gpt
 from technology_stack import technology
 from debug import debugging
-from notifications import notification
+from notifications import async_notification, notification
+from notifications.hub import hub
+from notifications.outbox import outbox_worker
+from notifications.retention import NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS, run_archiver
+from metrics import metrics
 
 from sqlalchemy.schema import DropTable
 from sqlalchemy.ext.compiler import compiles
@@ -35,7 +42,21 @@ def _compile_drop_table(element, compiler, **kwargs):
     return compiler.visit_drop_table(element) + " CASCADE"
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await hub.start()
+    await outbox_worker.start()
+    archiver = None
+    if NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS:
+        archiver = asyncio.create_task(run_archiver())
+    yield
+    if archiver:
+        archiver.cancel()
+    await outbox_worker.stop()
+    await hub.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 metadata = MetaData()
 metadata.reflect(ENGINE)
 
@@ -51,18 +72,13 @@ app.add_middleware(
 )
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-models.Base.metadata.create_all(bind=ENGINE)
+if DATABASE_ASYNC:
+    # Routes are matched in order, so the async ports shadow the sync endpoints.
+    print(f"{colorama.Fore.GREEN}DATABASE: {colorama.Fore.WHITE}Using the async stack.")
+    app.include_router(async_authentication.router)
+    app.include_router(async_projects.router)
+    app.include_router(async_proposal.router)
+    app.include_router(async_notification.router)
 
 app.include_router(authentication.router)
 app.include_router(profile.router)
@@ -76,6 +92,7 @@ app.include_router(proposal.router)
 app.include_router(gpt.router)
 app.include_router(technology.router)
 app.include_router(notification.router)
+app.include_router(metrics.router)
 
 if DEBUG_HELPFUL_ENDPOINTS:
     print(f"{colorama.Fore.GREEN}DEBUG: {colorama.Fore.WHITE}   Included DEBUG router.")
@@ -123,5 +140,7 @@ if __name__ == "__main__":
         print(
             f"{colorama.Fore.GREEN}DATABASE: {colorama.Fore.WHITE}Database reset, created primary roles."
         )
+    else:
+        upgrade_database()
 
     uvicorn.run(app="main:app", host="0.0.0.0", port=8000, reload=True)
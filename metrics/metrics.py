@@ -0,0 +1,42 @@
+from fastapi import APIRouter
+
+from database.db import (
+    ASYNC_ENGINE,
+    ASYNC_POOL_METRICS,
+    ASYNC_REPLICA_ENGINE,
+    ASYNC_REPLICA_POOL_METRICS,
+    ENGINE,
+    POOL_METRICS,
+    POOL_OPTIONS,
+    REPLICA_ENGINE,
+    REPLICA_POOL_METRICS,
+    SQL_STATEMENT_TIMEOUT_MS,
+)
+from database.pool import pool_status
+
+router = APIRouter(prefix="/metrics", tags={"Metrics"})
+
+
+@router.get("/database")
+def database_pool():
+    """
+    Connection pool occupancy, checkout wait times and overflow usage, used
+    to size SQL_POOL_SIZE and SQL_MAX_OVERFLOW.
+    """
+    engines = {"sync": pool_status(ENGINE, POOL_METRICS)}
+    if REPLICA_ENGINE is not None:
+        engines["sync_replica"] = pool_status(REPLICA_ENGINE, REPLICA_POOL_METRICS)
+    if ASYNC_ENGINE is not None:
+        engines["async"] = pool_status(ASYNC_ENGINE, ASYNC_POOL_METRICS)
+    if ASYNC_REPLICA_ENGINE is not None:
+        engines["async_replica"] = pool_status(
+            ASYNC_REPLICA_ENGINE, ASYNC_REPLICA_POOL_METRICS
+        )
+
+    return {
+        "settings": {
+            **POOL_OPTIONS,
+            "statement_timeout_ms": SQL_STATEMENT_TIMEOUT_MS,
+        },
+        "engines": engines,
+    }
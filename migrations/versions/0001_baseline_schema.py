@@ -0,0 +1,427 @@
+"""
+baseline schema
+
+The tables as Base.metadata.create_all created them before migrations were
+introduced, plus the primary roles every organization relies on. Databases
+created that way are stamped with this revision by database/migrate.py.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 16:13:31.932557
+"""
+
+from uuid import uuid4
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+PRIMARY_ROLES = [
+    "Employee",
+    "Organization Admin",
+    "Department Manager",
+    "Project Manager",
+]
+
+
+def upgrade():
+    op.create_table(
+        "custom_roles",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("custom_role_name", sa.String(), nullable=False),
+        sa.Column("organization_id", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "organizations",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("organization_name", sa.String(), nullable=False),
+        sa.Column("hq_address", sa.String(), nullable=False),
+        sa.Column("custom_link", sa.String(), nullable=False),
+        sa.Column("owner_id", sa.UUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "primary_roles",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("role_name", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "departments",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("department_name", sa.String(), nullable=False),
+        sa.Column("department_manager", sa.UUID(), nullable=True),
+        sa.Column("organization_id", sa.UUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "skill_categories",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("organization_id", sa.UUID(), nullable=True),
+        sa.Column("category_name", sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "technology_stack",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("tech_name", sa.String(), nullable=True),
+        sa.Column("organization_id", sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "users",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("organization_id", sa.UUID(), nullable=True),
+        sa.Column("department_id", sa.UUID(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["department_id"],
+            ["departments.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column(
+            "type",
+            sa.Enum(
+                "ALLOCATION", "DEALLOCATION", "VALIDATION", name="notification_type"
+            ),
+            nullable=True,
+        ),
+        sa.Column("to_manager", sa.UUID(), nullable=False),
+        sa.Column("for_user", sa.UUID(), nullable=False),
+        sa.Column("sent", sa.BOOLEAN(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["for_user"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["to_manager"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "projects",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("organization_id", sa.UUID(), nullable=False),
+        sa.Column("project_name", sa.String(), nullable=False),
+        sa.Column("project_period", sa.String(), nullable=False),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.Column("deadline_date", sa.DateTime(), nullable=True),
+        sa.Column("project_status", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=False),
+        sa.Column("project_manager", sa.UUID(), nullable=False),
+        sa.Column("deletable", sa.BOOLEAN(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["project_manager"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "skills",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("skill_category", sa.ARRAY(sa.UUID()), nullable=True),
+        sa.Column("skill_name", sa.String(), nullable=False),
+        sa.Column("skill_description", sa.String(), nullable=False),
+        sa.Column("organization_id", sa.UUID(), nullable=True),
+        sa.Column("author", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["author"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "users_primary_roles",
+        sa.Column("primary_role_id", sa.UUID(), nullable=True),
+        sa.Column("user_id", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["primary_role_id"],
+            ["primary_roles.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+    )
+    op.create_table(
+        "allocation_proposals",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("project_id_allocation", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("comments", sa.String(), nullable=True),
+        sa.Column("work_hours", sa.INTEGER(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["project_id_allocation"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "dealloc_user_projects",
+        sa.Column("user_id", sa.UUID(), nullable=True),
+        sa.Column("project_id", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["project_id"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+    )
+    op.create_table(
+        "deallocation_proposals",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("project_id_deallocation", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("reason", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["project_id_deallocation"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "department_projects",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("project_id", sa.UUID(), nullable=False),
+        sa.Column("department_id", sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["department_id"],
+            ["departments.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["project_id"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "project_id", "department_id"),
+    )
+    op.create_table(
+        "departments_skills",
+        sa.Column("department_id", sa.UUID(), nullable=True),
+        sa.Column("skill_id", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["department_id"],
+            ["departments.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["skill_id"],
+            ["skills.id"],
+        ),
+    )
+    op.create_table(
+        "project_custom_roles",
+        sa.Column("project_id", sa.UUID(), nullable=True),
+        sa.Column("custom_role_id", sa.UUID(), nullable=True),
+        sa.Column("project_members", sa.INTEGER(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["custom_role_id"],
+            ["custom_roles.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["project_id"],
+            ["projects.id"],
+        ),
+    )
+    op.create_table(
+        "project_work_hours",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("project_id", sa.UUID(), nullable=True),
+        sa.Column("work_hours", sa.INTEGER(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["project_id"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "technology_projects",
+        sa.Column("technology_id", sa.UUID(), nullable=True),
+        sa.Column("project_id", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["project_id"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["technology_id"],
+            ["technology_stack.id"],
+        ),
+    )
+    op.create_table(
+        "user_projects",
+        sa.Column("user_id", sa.UUID(), nullable=True),
+        sa.Column("project_id", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["project_id"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+    )
+    op.create_table(
+        "user_skills",
+        sa.Column("user_id", sa.UUID(), nullable=True),
+        sa.Column("skill_id", sa.UUID(), nullable=True),
+        sa.Column("skill_level", sa.INTEGER(), nullable=True),
+        sa.Column("skill_experience", sa.INTEGER(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["skill_id"],
+            ["skills.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+    )
+    op.create_table(
+        "users_custom_roles",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("project_id", sa.UUID(), nullable=False),
+        sa.Column("custom_role_id", sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["custom_role_id"],
+            ["custom_roles.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["project_id"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "project_id", "custom_role_id"),
+    )
+    op.create_table(
+        "users_skills",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=True),
+        sa.Column("skill_id", sa.UUID(), nullable=True),
+        sa.Column("skill_level", sa.INTEGER(), nullable=True),
+        sa.Column("skill_experience", sa.INTEGER(), nullable=True),
+        sa.Column("training_title", sa.String(), nullable=True),
+        sa.Column("training_description", sa.String(), nullable=True),
+        sa.Column("project_link", sa.UUID(), nullable=True),
+        sa.Column("verified", sa.BOOLEAN(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["project_link"],
+            ["projects.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["skill_id"],
+            ["skills.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "allocation_roles",
+        sa.Column("role_id", sa.UUID(), nullable=True),
+        sa.Column("allocation_id", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["allocation_id"],
+            ["allocation_proposals.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["role_id"],
+            ["custom_roles.id"],
+        ),
+    )
+
+    primary_roles = sa.table(
+        "primary_roles", sa.column("id", sa.UUID()), sa.column("role_name", sa.String())
+    )
+    op.bulk_insert(
+        primary_roles,
+        [{"id": uuid4(), "role_name": role_name} for role_name in PRIMARY_ROLES],
+    )
+
+
+def downgrade():
+    op.drop_table("allocation_roles")
+    op.drop_table("users_skills")
+    op.drop_table("users_custom_roles")
+    op.drop_table("user_skills")
+    op.drop_table("user_projects")
+    op.drop_table("technology_projects")
+    op.drop_table("project_work_hours")
+    op.drop_table("project_custom_roles")
+    op.drop_table("departments_skills")
+    op.drop_table("department_projects")
+    op.drop_table("deallocation_proposals")
+    op.drop_table("dealloc_user_projects")
+    op.drop_table("allocation_proposals")
+    op.drop_table("users_primary_roles")
+    op.drop_table("skills")
+    op.drop_table("projects")
+    op.drop_table("notifications")
+    op.drop_table("users")
+    op.drop_table("technology_stack")
+    op.drop_table("skill_categories")
+    op.drop_table("departments")
+    op.drop_table("primary_roles")
+    op.drop_table("organizations")
+    op.drop_table("custom_roles")
+    sa.Enum(name="notification_type").drop(op.get_bind())
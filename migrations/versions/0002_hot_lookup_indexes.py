@@ -0,0 +1,154 @@
+"""
+hot lookup indexes
+
+Indexes the columns the endpoints filter on and makes the association tables
+and the login / referral lookups unique. Duplicate association rows are
+removed first; duplicate e-mails or referral links make the upgrade fail and
+have to be resolved by hand.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 16:14:06.087886
+"""
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+ASSOCIATION_KEYS = {
+    "user_projects": ("user_id", "project_id"),
+    "user_skills": ("user_id", "skill_id"),
+    "users_primary_roles": ("user_id", "primary_role_id"),
+}
+
+
+def upgrade():
+    for table, columns in ASSOCIATION_KEYS.items():
+        match = " AND ".join(f"a.{column} = b.{column}" for column in columns)
+        op.execute(
+            f"DELETE FROM {table} a USING {table} b WHERE a.ctid < b.ctid AND {match}"
+        )
+
+    op.create_index(
+        op.f("ix_allocation_proposals_project_id_allocation"),
+        "allocation_proposals",
+        ["project_id_allocation"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_allocation_proposals_user_id"),
+        "allocation_proposals",
+        ["user_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_deallocation_proposals_project_id_deallocation"),
+        "deallocation_proposals",
+        ["project_id_deallocation"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_deallocation_proposals_user_id"),
+        "deallocation_proposals",
+        ["user_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_notifications_to_manager"),
+        "notifications",
+        ["to_manager"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_organizations_custom_link"),
+        "organizations",
+        ["custom_link"],
+        unique=True,
+    )
+    op.create_index(
+        op.f("ix_project_work_hours_user_id"),
+        "project_work_hours",
+        ["user_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_skills_organization_id"), "skills", ["organization_id"], unique=False
+    )
+    op.create_index(
+        "ix_user_projects_project_id", "user_projects", ["project_id"], unique=False
+    )
+    op.create_unique_constraint(
+        "user_projects_user_id_project_id_key",
+        "user_projects",
+        ["user_id", "project_id"],
+    )
+    op.create_index(
+        "ix_user_skills_skill_id", "user_skills", ["skill_id"], unique=False
+    )
+    op.create_unique_constraint(
+        "user_skills_user_id_skill_id_key", "user_skills", ["user_id", "skill_id"]
+    )
+    op.create_index(op.f("ix_users_email"), "users", ["email"], unique=True)
+    op.create_index(
+        "ix_users_primary_roles_primary_role_id",
+        "users_primary_roles",
+        ["primary_role_id"],
+        unique=False,
+    )
+    op.create_unique_constraint(
+        "users_primary_roles_user_id_primary_role_id_key",
+        "users_primary_roles",
+        ["user_id", "primary_role_id"],
+    )
+    op.create_index(
+        op.f("ix_users_skills_skill_id"), "users_skills", ["skill_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_users_skills_user_id"), "users_skills", ["user_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_users_skills_user_id"), table_name="users_skills")
+    op.drop_index(op.f("ix_users_skills_skill_id"), table_name="users_skills")
+    op.drop_constraint(
+        "users_primary_roles_user_id_primary_role_id_key",
+        "users_primary_roles",
+        type_="unique",
+    )
+    op.drop_index(
+        "ix_users_primary_roles_primary_role_id", table_name="users_primary_roles"
+    )
+    op.drop_index(op.f("ix_users_email"), table_name="users")
+    op.drop_constraint(
+        "user_skills_user_id_skill_id_key", "user_skills", type_="unique"
+    )
+    op.drop_index("ix_user_skills_skill_id", table_name="user_skills")
+    op.drop_constraint(
+        "user_projects_user_id_project_id_key", "user_projects", type_="unique"
+    )
+    op.drop_index("ix_user_projects_project_id", table_name="user_projects")
+    op.drop_index(op.f("ix_skills_organization_id"), table_name="skills")
+    op.drop_index(
+        op.f("ix_project_work_hours_user_id"), table_name="project_work_hours"
+    )
+    op.drop_index(op.f("ix_organizations_custom_link"), table_name="organizations")
+    op.drop_index(op.f("ix_notifications_to_manager"), table_name="notifications")
+    op.drop_index(
+        op.f("ix_deallocation_proposals_user_id"), table_name="deallocation_proposals"
+    )
+    op.drop_index(
+        op.f("ix_deallocation_proposals_project_id_deallocation"),
+        table_name="deallocation_proposals",
+    )
+    op.drop_index(
+        op.f("ix_allocation_proposals_user_id"), table_name="allocation_proposals"
+    )
+    op.drop_index(
+        op.f("ix_allocation_proposals_project_id_allocation"),
+        table_name="allocation_proposals",
+    )
@@ -0,0 +1,31 @@
+"""
+notification created_at
+
+Orders notifications for the push channel's reconnect cursor. Existing rows
+get the time of the upgrade.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 16:52:10.418230
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "notifications",
+        sa.Column(
+            "created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("notifications", "created_at")
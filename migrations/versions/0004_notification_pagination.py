@@ -0,0 +1,83 @@
+"""
+notification pagination and archive
+
+Replaces the to_manager index of notifications with (to_manager, created_at,
+id) for keyset pagination and adds notifications_archive, where read
+notifications are moved once they pass the retention age.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 17:05:41.602114
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_notifications_to_manager_created_at_id",
+        "notifications",
+        ["to_manager", "created_at", "id"],
+        unique=False,
+    )
+    op.drop_index(op.f("ix_notifications_to_manager"), table_name="notifications")
+
+    op.create_table(
+        "notifications_archive",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column(
+            "type",
+            postgresql.ENUM(
+                "ALLOCATION",
+                "DEALLOCATION",
+                "VALIDATION",
+                name="notification_type",
+                create_type=False,
+            ),
+            nullable=True,
+        ),
+        sa.Column("to_manager", sa.UUID(), nullable=False),
+        sa.Column("for_user", sa.UUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["for_user"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["to_manager"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_notifications_archive_to_manager"),
+        "notifications_archive",
+        ["to_manager"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_notifications_archive_to_manager"),
+        table_name="notifications_archive",
+    )
+    op.drop_table("notifications_archive")
+
+    op.create_index(
+        op.f("ix_notifications_to_manager"),
+        "notifications",
+        ["to_manager"],
+        unique=False,
+    )
+    op.drop_index(
+        "ix_notifications_to_manager_created_at_id", table_name="notifications"
+    )
@@ -0,0 +1,54 @@
+"""
+notification outbox
+
+Requests queue their notifications in notification_outbox, the outbox
+worker turns them into notifications.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 17:21:09.318457
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notification_outbox",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column(
+            "type",
+            postgresql.ENUM(
+                "ALLOCATION",
+                "DEALLOCATION",
+                "VALIDATION",
+                name="notification_type",
+                create_type=False,
+            ),
+            nullable=True,
+        ),
+        sa.Column("to_manager", sa.UUID(), nullable=False),
+        sa.Column("for_user", sa.UUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_notification_outbox_created_at"),
+        "notification_outbox",
+        ["created_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_notification_outbox_created_at"), table_name="notification_outbox"
+    )
+    op.drop_table("notification_outbox")
@@ -0,0 +1,58 @@
+"""
+user workload
+
+Adds user_workload, the per-user summary of work hours and projects read by
+the availability search, filled from the existing rows.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:48:26.730914
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_workload",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("work_hours", sa.INTEGER(), nullable=False),
+        sa.Column("project_count", sa.INTEGER(), nullable=False),
+        sa.Column("nearest_deadline", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO user_workload (user_id, work_hours, project_count, nearest_deadline)
+        SELECT users.id,
+               COALESCE(hours.work_hours, 0),
+               COALESCE(projects.project_count, 0),
+               projects.nearest_deadline
+        FROM users
+        LEFT JOIN (
+            SELECT user_id, SUM(work_hours) AS work_hours
+            FROM project_work_hours GROUP BY user_id
+        ) hours ON hours.user_id = users.id
+        LEFT JOIN (
+            SELECT user_projects.user_id,
+                   COUNT(*) AS project_count,
+                   MIN(projects.deadline_date) AS nearest_deadline
+            FROM user_projects JOIN projects ON projects.id = user_projects.project_id
+            GROUP BY user_projects.user_id
+        ) projects ON projects.user_id = users.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("user_workload")
@@ -0,0 +1,36 @@
+"""
+skill review queue
+
+Adds a partial index over the unverified users_skills rows, read by the
+department review queue, and indexes users.department_id.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:31:57.240118
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_users_skills_unverified_user_id_id",
+        "users_skills",
+        ["user_id", "id"],
+        unique=False,
+        postgresql_where=sa.text("verified = false"),
+    )
+    op.create_index(
+        op.f("ix_users_department_id"), "users", ["department_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_users_department_id"), table_name="users")
+    op.drop_index("ix_users_skills_unverified_user_id_id", table_name="users_skills")
@@ -0,0 +1,32 @@
+"""
+unassigned users
+
+Adds a partial index over the users without a department, read by the
+paginated unassigned employees listing.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:12:40.517203
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_users_unassigned_organization_id_id",
+        "users",
+        ["organization_id", "id"],
+        unique=False,
+        postgresql_where=sa.text("department_id IS NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_unassigned_organization_id_id", table_name="users")
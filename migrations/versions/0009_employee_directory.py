@@ -0,0 +1,42 @@
+"""
+employee directory
+
+Enables pg_trgm and adds trigram indexes on users.username and users.email,
+used by the substring search of the employee directory.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 19:47:03.118942
+"""
+
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_users_username_trgm",
+        "users",
+        ["username"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"username": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_users_email_trgm",
+        "users",
+        ["email"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"email": "gin_trgm_ops"},
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_email_trgm", table_name="users")
+    op.drop_index("ix_users_username_trgm", table_name="users")
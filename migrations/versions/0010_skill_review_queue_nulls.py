@@ -0,0 +1,40 @@
+"""
+skill review queue nulls
+
+Rebuilds the partial index of the review queue over verified IS NOT TRUE, so
+the skills whose verified is NULL are served from it too.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 21:06:14.602871
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_users_skills_unverified_user_id_id", table_name="users_skills")
+    op.create_index(
+        "ix_users_skills_unverified_user_id_id",
+        "users_skills",
+        ["user_id", "id"],
+        unique=False,
+        postgresql_where=sa.text("verified IS NOT TRUE"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_skills_unverified_user_id_id", table_name="users_skills")
+    op.create_index(
+        "ix_users_skills_unverified_user_id_id",
+        "users_skills",
+        ["user_id", "id"],
+        unique=False,
+        postgresql_where=sa.text("verified = false"),
+    )
@@ -0,0 +1,69 @@
+"""
+notification.py endpoints served from the async database stack.
+Included instead of their sync counterparts when DATABASE_ASYNC is enabled.
+"""
+
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, update
+
+from auth import authentication
+from auth.base_models import Principal
+from database.db import AsyncDbDependency, uses_primary
+from database.models import Notifications
+
+router = APIRouter(prefix="/notifications", tags={"Notifications"})
+
+UserDependency = Annotated[
+    Principal, Depends(authentication.get_current_principal_async)
+]
+
+
+@router.get("/")
+@uses_primary
+async def get_notifications_async(db: AsyncDbDependency, action_user: UserDependency):
+    notifications = await db.scalars(
+        select(Notifications)
+        .filter_by(to_manager=action_user.id)
+        .order_by(Notifications.created_at, Notifications.id)
+    )
+    notifications = notifications.all()
+    notifs = [
+        {
+            "id": str(i.id),
+            "type": i.type,
+            "for_user": str(i.for_user),
+            "has_been_read": i.sent,
+        }
+        for i in notifications
+    ]
+
+    # Only what was returned is read; rows committed since stay unread.
+    unread = [i.id for i in notifications if not i.sent]
+    if unread:
+        await db.execute(
+            update(Notifications)
+            .where(Notifications.id.in_(unread))
+            .values(sent=True)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content=notifs)
+
+
+@router.delete("/")
+async def delete_notifications_async(
+    db: AsyncDbDependency, action_user: UserDependency, _id: UUID
+):
+    deleted = await db.execute(
+        delete(Notifications).filter_by(to_manager=action_user.id, id=_id)
+    )
+
+    if not deleted.rowcount:
+        return JSONResponse("The notification you tried deleting does not exist.")
+
+    await db.commit()
@@ -0,0 +1,193 @@
+"""
+Push delivery of notifications. Every worker keeps the WebSocket / SSE
+subscriptions of its connected managers in a NotificationHub, so waiting for
+notifications costs no database queries.
+
+New Notifications rows reach the hubs through the NOTIFICATIONS_BACKEND:
+    local     published after the commit to this worker's hub only, enough
+              for a single worker.
+    postgres  sent with pg_notify inside the creating transaction and
+              delivered by Postgres to the LISTEN connection of every worker.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+import asyncio
+import base64
+import binascii
+import json
+import os
+
+import asyncpg
+from colorama import Fore
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from database.db import SQLALCHEMY_DATABASE_URL
+from database.models import Notifications
+
+NOTIFICATIONS_BACKEND = os.environ.get("NOTIFICATIONS_BACKEND", "local")
+NOTIFICATIONS_CHANNEL = "notifications"
+# Notifications buffered per connection before it is asked to reconnect.
+SUBSCRIPTION_QUEUE_SIZE = 100
+LISTEN_RETRY_SECONDS = 5
+
+
+def encode_cursor(created_at: datetime, _id) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, UUID]]:
+    """
+    Returns the (created_at, id) position of a cursor, None if it is invalid.
+    """
+    try:
+        created_at, _id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def notification_info(notification: Notifications) -> dict:
+    return {
+        "id": str(notification.id),
+        "type": notification.type,
+        "for_user": str(notification.for_user),
+        "has_been_read": bool(notification.sent),
+        "created_at": str(notification.created_at),
+        "cursor": encode_cursor(notification.created_at, notification.id),
+    }
+
+
+class Subscription:
+    """
+    One open push connection of an user.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        self.lagged = False
+
+    async def get(self) -> Optional[dict]:
+        """
+        Waits for the next notification. Returns None once the connection fell
+        too far behind; it should then reconnect with its last cursor.
+        """
+        if self.lagged and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+
+class NotificationHub:
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._loop = None
+        self._listener = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if NOTIFICATIONS_BACKEND == "postgres":
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+
+    def subscribe(self, user_id) -> Subscription:
+        subscription = Subscription(str(user_id))
+        self._subscriptions[subscription.user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+
+    def publish(self, to_manager, payload: dict):
+        """
+        Delivers payload to the connections of to_manager. Safe to call from
+        any thread.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._dispatch, str(to_manager), payload)
+
+    def _dispatch(self, to_manager: str, payload: dict):
+        for subscription in self._subscriptions.get(to_manager, ()):
+            try:
+                subscription.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                subscription.lagged = True
+
+    def _on_notify(self, _connection, _pid, _channel, payload: str):
+        message = json.loads(payload)
+        self._dispatch(message["to_manager"], message["notification"])
+
+    async def _listen(self):
+        """
+        Keeps a LISTEN connection open, reconnecting when it drops.
+        """
+        url = SQLALCHEMY_DATABASE_URL
+        while True:
+            try:
+                connection = await asyncpg.connect(
+                    user=url.username,
+                    password=url.password,
+                    host=url.host,
+                    port=url.port,
+                    database=url.database,
+                )
+            except (OSError, asyncpg.PostgresError) as exc:
+                print(
+                    f"{Fore.RED}NOTIFICATIONS: {Fore.WHITE}LISTEN connection failed: {exc}"
+                )
+                await asyncio.sleep(LISTEN_RETRY_SECONDS)
+                continue
+
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(NOTIFICATIONS_CHANNEL, self._on_notify)
+                await closed.wait()
+            finally:
+                await connection.close()
+
+
+hub = NotificationHub()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_notifications(session, _flush_context):
+    created = [i for i in session.new if isinstance(i, Notifications)]
+    if not created:
+        return
+
+    messages = [
+        {"to_manager": str(i.to_manager), "notification": notification_info(i)}
+        for i in created
+    ]
+    if NOTIFICATIONS_BACKEND == "postgres":
+        # NOTIFY is transactional, Postgres only delivers it on commit.
+        for message in messages:
+            session.connection().execute(
+                select(func.pg_notify(NOTIFICATIONS_CHANNEL, json.dumps(message)))
+            )
+    else:
+        session.info.setdefault("pending_notifications", []).extend(messages)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_notifications(session):
+    for message in session.info.pop("pending_notifications", ()):
+        hub.publish(message["to_manager"], message["notification"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_notifications(session):
+    session.info.pop("pending_notifications", None)
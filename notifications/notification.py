@@ -1,65 +1,66 @@
-from typing import Annotated
+from typing import Annotated, List, Optional
 from uuid import UUID
+import asyncio
+import json
 
-from fastapi import APIRouter, Depends, status
-
-# from fastapi.websockets import WebSocket
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.websockets import WebSocket, WebSocketDisconnect
+from sqlalchemy import tuple_, update
 
 
 from auth import authentication
-from database.models import (
-    Notifications,
-    User,
-)
-from database.db import SESSIONLOCAL
-
-# import asyncio
+from auth.base_models import Principal
+from database.models import Notifications
+from database.db import SESSIONLOCAL, DbDependency, uses_primary
+from notifications.hub import decode_cursor, hub, notification_info
 
 router = APIRouter(prefix="/notifications", tags={"Notifications"})
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+CATCH_UP_LIMIT = 500
+PAGE_LIMIT = 100
+SSE_KEEPALIVE_SECONDS = 15
 
 
 @router.get("/")
-def get_notifications(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    notifications = db.query(Notifications).filter_by(to_manager=action_user.id).all()
-    notifs = []
-
-    for i in notifications:
-        notifs.append(
-            {
-                "id": str(i.id),
-                "type": i.type,
-                "for_user": str(i.for_user),
-                "has_been_read": i.sent,
-            }
-        )
-        i.sent = True
+@uses_primary
+def get_notifications(db: DbDependency, action_user: UserDependency):
+    notifications = (
+        db.query(Notifications)
+        .filter_by(to_manager=action_user.id)
+        .order_by(Notifications.created_at, Notifications.id)
+        .all()
+    )
+    notifs = [
+        {
+            "id": str(i.id),
+            "type": i.type,
+            "for_user": str(i.for_user),
+            "has_been_read": i.sent,
+        }
+        for i in notifications
+    ]
 
+    # Only what was returned is read; rows committed since stay unread.
+    unread = [i.id for i in notifications if not i.sent]
+    if unread:
+        db.execute(
+            update(Notifications)
+            .where(Notifications.id.in_(unread))
+            .values(sent=True)
+            .execution_options(synchronize_session=False)
+        )
     db.commit()
 
     return JSONResponse(status_code=status.HTTP_200_OK, content=notifs)
 
 
 @router.delete("/")
-def delete_notifications(db: DbDependency, user: UserDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def delete_notifications(db: DbDependency, action_user: UserDependency, _id: UUID):
     notifications = (
         db.query(Notifications).filter_by(to_manager=action_user.id, id=_id).first()
     )
@@ -72,37 +73,234 @@ def delete_notifications(db: DbDependency, user: UserDependency, _id: UUID):
     db.commit()
 
 
-# class SingletonMeta(type):
-#     """
-#     A Singleton metaclass that creates a Singleton instance.
-#     """
+def invalid_cursor() -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST, content="Invalid cursor."
+    )
 
-#     _instances = {}
 
-#     def __call__(cls, *args, **kwargs):
-#         """
-#         If an instance of the class doesn't exist, create one. Otherwise, return the existing instance.
-#         """
-#         if cls not in cls._instances:
-#             cls._instances[cls] = super(SingletonMeta, cls).__call__(*args, **kwargs)
-#         return cls._instances[cls]
+def page(notifications: List[Notifications], limit: int) -> dict:
+    """
+    Response of the keyset paginated endpoints. next_cursor is None on the
+    last page.
+    """
+    notifs = [notification_info(i) for i in notifications[:limit]]
+    return {
+        "notifications": notifs,
+        "next_cursor": notifs[-1]["cursor"] if len(notifications) > limit else None,
+    }
 
 
-# class ConnectionManager(metaclass=SingletonMeta):
-#     def __init__(self):
-#         self.active_connections: {} = {}
+@router.get("/page")
+def get_notifications_page(
+    db: DbDependency,
+    action_user: UserDependency,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=PAGE_LIMIT)] = PAGE_LIMIT,
+):
+    """
+    Notifications of the user, newest first. Pass next_cursor to get the
+    following page. Does not mark them as read.
+    """
+    query = db.query(Notifications).filter(Notifications.to_manager == action_user.id)
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position:
+            return invalid_cursor()
+        query = query.filter(
+            tuple_(Notifications.created_at, Notifications.id) < tuple_(*position)
+        )
 
-#     async def connect(self, websocket: WebSocket, client_id: str):
-#         await websocket.accept()
-#         self.active_connections[client_id] = websocket
-#         print(self.active_connections)
+    notifications = (
+        query.order_by(Notifications.created_at.desc(), Notifications.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK, content=page(notifications, limit)
+    )
 
-#     async def disconnect(self, websocket: WebSocket, client_id):
-#         self.active_connections.pop(client_id)
 
-#     async def broadcast(self, message: str, user):
-#         connection = self.active_connections.get(user)
-#         if connection:
-#             # await connection.send_text(message)
-#             await connection.send_json(message)
-#             await connection.send_json("reset")
+@router.get("/unread")
+def get_unread_notifications(
+    db: DbDependency,
+    action_user: UserDependency,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=PAGE_LIMIT)] = PAGE_LIMIT,
+):
+    """
+    Unread notifications created after cursor, oldest first, for clients
+    syncing incrementally. Without a cursor starts from the oldest one.
+    """
+    query = db.query(Notifications).filter(
+        Notifications.to_manager == action_user.id, Notifications.sent.isnot(True)
+    )
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position:
+            return invalid_cursor()
+        query = query.filter(
+            tuple_(Notifications.created_at, Notifications.id) > tuple_(*position)
+        )
+
+    notifications = (
+        query.order_by(Notifications.created_at, Notifications.id)
+        .limit(limit + 1)
+        .all()
+    )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK, content=page(notifications, limit)
+    )
+
+
+@router.put("/read")
+def mark_notifications_read(
+    db: DbDependency,
+    action_user: UserDependency,
+    until: str,
+    after: Optional[str] = None,
+):
+    """
+    Marks the notifications of the user from after (exclusive, defaults to
+    the oldest) up to until (inclusive) as read, in one statement.
+    """
+    until_position = decode_cursor(until)
+    after_position = decode_cursor(after) if after else None
+    if not until_position or (after and not after_position):
+        return invalid_cursor()
+
+    position = tuple_(Notifications.created_at, Notifications.id)
+    query = (
+        update(Notifications)
+        .where(
+            Notifications.to_manager == action_user.id,
+            Notifications.sent.isnot(True),
+            position <= tuple_(*until_position),
+        )
+        .values(sent=True)
+    )
+    if after_position:
+        query = query.where(position > tuple_(*after_position))
+
+    marked = db.execute(query).rowcount
+    db.commit()
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"marked": marked})
+
+
+def notifications_after(user_id, cursor: str) -> List[dict]:
+    """
+    Notifications of an user created after cursor, oldest first. Runs on its
+    own short-lived session so push connections never hold a pooled
+    connection while they wait.
+    """
+    created_at, _id = decode_cursor(cursor)
+    with SESSIONLOCAL() as db:
+        notifications = (
+            db.query(Notifications)
+            .filter(
+                Notifications.to_manager == user_id,
+                tuple_(Notifications.created_at, Notifications.id)
+                > tuple_(created_at, _id),
+            )
+            .order_by(Notifications.created_at, Notifications.id)
+            .limit(CATCH_UP_LIMIT)
+            .all()
+        )
+        return [notification_info(i) for i in notifications]
+
+
+@router.websocket("/ws")
+async def notifications_websocket(
+    websocket: WebSocket, token: str, cursor: Optional[str] = None
+):
+    """
+    Pushes new notifications as JSON messages. Pass the cursor of the last
+    notification received to get the ones missed while disconnected.
+    Browsers cannot set headers on WebSockets, so the token is a query param.
+    """
+    try:
+        user = authentication.get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=1008, reason="Could not validate user.")
+        return
+    if cursor and not decode_cursor(cursor):
+        await websocket.close(code=1008, reason="Invalid cursor.")
+        return
+
+    await websocket.accept()
+    subscription = hub.subscribe(user["id"])
+    # The client sends nothing, reading only notices the disconnect.
+    disconnected = asyncio.create_task(websocket.receive())
+    try:
+        sent = set()
+        if cursor:
+            for i in await run_in_threadpool(notifications_after, user["id"], cursor):
+                await websocket.send_json(i)
+                sent.add(i["id"])
+
+        while True:
+            notification = asyncio.create_task(subscription.get())
+            await asyncio.wait(
+                {notification, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected.done():
+                notification.cancel()
+                break
+            if notification.result() is None:
+                await websocket.close(code=1013, reason="Reconnect with your cursor.")
+                break
+            if notification.result()["id"] not in sent:
+                await websocket.send_json(notification.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def notifications_stream(
+    request: Request, token: str, cursor: Optional[str] = None
+):
+    """
+    Server-sent events version of /ws. EventSource reconnects by itself and
+    resumes from the Last-Event-ID header.
+    """
+    user = authentication.get_current_user(token)
+    cursor = request.headers.get("last-event-id") or cursor
+    if cursor and not decode_cursor(cursor):
+        return invalid_cursor()
+
+    def server_event(notification: dict) -> str:
+        return f"id: {notification['cursor']}\ndata: {json.dumps(notification)}\n\n"
+
+    async def events():
+        subscription = hub.subscribe(user["id"])
+        try:
+            sent = set()
+            if cursor:
+                for i in await run_in_threadpool(
+                    notifications_after, user["id"], cursor
+                ):
+                    yield server_event(i)
+                    sent.add(i["id"])
+
+            while True:
+                try:
+                    notification = await asyncio.wait_for(
+                        subscription.get(), SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if notification is None:
+                    break
+                if notification["id"] not in sent:
+                    yield server_event(notification)
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
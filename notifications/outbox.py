@@ -0,0 +1,150 @@
+"""
+Notification outbox. Request handlers only queue a NotificationOutbox row in
+their own transaction with enqueue_notification; the OutboxWorker of each
+process turns queued rows into Notifications in batches, off the request
+path. Rows queued several times for the same type, manager and user, or for
+which the manager still has an unread notification, become one notification.
+
+Drains are serialized by an advisory lock and stamp their notifications with
+the database clock once they hold it, so every drain commits notifications
+newer than those of the drains committed before it. They never appear behind
+the (created_at, id) cursors already handed to clients.
+"""
+
+from typing import Dict, Tuple
+import asyncio
+import os
+
+from colorama import Fore
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import DateTime, cast, delete, event, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from database.db import SESSIONLOCAL
+from database.models import NotificationOutbox, Notifications
+
+OUTBOX_BATCH_SIZE = int(os.environ.get("NOTIFICATIONS_OUTBOX_BATCH_SIZE", 500))
+# Rows committed by other workers are picked up on this interval, rows
+# committed by this worker right away.
+OUTBOX_POLL_SECONDS = int(os.environ.get("NOTIFICATIONS_OUTBOX_POLL_SECONDS", 5))
+OUTBOX_DRAIN_LOCK = "notification_outbox_drain"
+
+
+def enqueue_notification(db: Session, _type: str, to_manager, for_user):
+    """
+    Queues a notification, delivered once the session commits.
+    """
+    db.add(NotificationOutbox(type=_type, to_manager=to_manager, for_user=for_user))
+    db.info["notification_outbox"] = True
+
+
+def drain_batch(db: Session) -> int:
+    """
+    Turns up to OUTBOX_BATCH_SIZE queued rows into notifications and returns
+    how many rows were consumed. Workers lock disjoint batches.
+    """
+    queued = db.scalars(
+        select(NotificationOutbox)
+        .order_by(NotificationOutbox.created_at)
+        .limit(OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not queued:
+        return 0
+
+    pending: Dict[Tuple, NotificationOutbox] = {}
+    for i in queued:
+        pending.setdefault((i.type, i.to_manager, i.for_user), i)
+
+    # Drains run one at a time, released on commit: only one of them can find
+    # no unread notification for a key and insert it, and the clock is read
+    # after the previous drain committed.
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtext(OUTBOX_DRAIN_LOCK))))
+    created_at = db.scalar(select(cast(func.clock_timestamp(), DateTime)))
+
+    key = tuple_(Notifications.type, Notifications.to_manager, Notifications.for_user)
+    unread = db.execute(
+        select(Notifications.type, Notifications.to_manager, Notifications.for_user)
+        .filter(key.in_(list(pending)), Notifications.sent.isnot(True))
+        .distinct()
+    ).all()
+    for i in unread:
+        pending.pop(tuple(i), None)
+
+    db.add_all(
+        Notifications(
+            type=i.type,
+            to_manager=i.to_manager,
+            for_user=i.for_user,
+            created_at=created_at,
+        )
+        for i in pending.values()
+    )
+    db.execute(
+        delete(NotificationOutbox).where(
+            NotificationOutbox.id.in_([i.id for i in queued])
+        )
+    )
+    db.commit()
+    return len(queued)
+
+
+def drain_outbox() -> int:
+    total = 0
+    with SESSIONLOCAL() as db:
+        while True:
+            count = drain_batch(db)
+            total += count
+            if count < OUTBOX_BATCH_SIZE:
+                return total
+
+
+class OutboxWorker:
+    def __init__(self):
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def wake(self):
+        """
+        Drains the outbox now instead of on the next poll. Safe to call from
+        any thread.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(drain_outbox)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                print(f"{Fore.RED}NOTIFICATIONS: {Fore.WHITE}Outbox failed: {exc}")
+
+
+outbox_worker = OutboxWorker()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_outbox_worker(session):
+    if session.info.pop("notification_outbox", False):
+        outbox_worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_outbox_wakeup(session):
+    session.info.pop("notification_outbox", None)
@@ -0,0 +1,91 @@
+"""
+Moves read notifications older than NOTIFICATIONS_RETENTION_DAYS to
+notifications_archive, keeping the notifications table small. Every worker
+runs it every NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS (0 disables it), or it
+can be run from cron:
+    python -m notifications.retention
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import os
+
+from colorama import Fore
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from database.db import SESSIONLOCAL
+from database.models import Notifications, NotificationsArchive
+
+NOTIFICATIONS_RETENTION_DAYS = int(os.environ.get("NOTIFICATIONS_RETENTION_DAYS", 30))
+NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS = int(
+    os.environ.get("NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS", 3600)
+)
+# Rows moved per transaction, so the job never holds long locks.
+ARCHIVE_BATCH_SIZE = 1000
+
+ARCHIVED_COLUMNS = ("id", "type", "to_manager", "for_user", "created_at")
+
+
+def archive_batch(db: Session, cutoff: datetime) -> int:
+    """
+    Moves up to ARCHIVE_BATCH_SIZE read notifications created before cutoff
+    in one statement and returns how many were moved.
+    """
+    batch = (
+        select(Notifications.id)
+        .filter(Notifications.sent.is_(True), Notifications.created_at < cutoff)
+        .limit(ARCHIVE_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )
+    moved = (
+        delete(Notifications)
+        .where(Notifications.id.in_(batch))
+        .returning(*(getattr(Notifications, i) for i in ARCHIVED_COLUMNS))
+        .cte("moved")
+    )
+    result = db.execute(
+        insert(NotificationsArchive)
+        .from_select(ARCHIVED_COLUMNS, select(*(moved.c[i] for i in ARCHIVED_COLUMNS)))
+        .returning(NotificationsArchive.id)
+    )
+    count = len(result.all())
+    db.commit()
+    return count
+
+
+def archive_read_notifications(
+    older_than: timedelta = timedelta(days=NOTIFICATIONS_RETENTION_DAYS),
+) -> int:
+    """
+    Archives every read notification older than older_than, batch by batch.
+    """
+    cutoff = datetime.now() - older_than
+    total = 0
+    with SESSIONLOCAL() as db:
+        while True:
+            count = archive_batch(db, cutoff)
+            total += count
+            if count < ARCHIVE_BATCH_SIZE:
+                return total
+
+
+async def run_archiver():
+    """
+    Background task started with the application.
+    """
+    while True:
+        try:
+            archived = await run_in_threadpool(archive_read_notifications)
+            if archived:
+                print(
+                    f"{Fore.GREEN}NOTIFICATIONS: {Fore.WHITE}Archived {archived} read notifications."
+                )
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            print(f"{Fore.RED}NOTIFICATIONS: {Fore.WHITE}Archiving failed: {exc}")
+        await asyncio.sleep(NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    print(f"Archived {archive_read_notifications()} read notifications.")
@@ -0,0 +1,157 @@
+"""
+Bulk employee import for organizations. Uploads are read row by row and
+written in batches, so a large file never has to fit in memory and a bad row
+only rejects itself.
+"""
+
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID, uuid4
+import csv
+import io
+import json
+import os
+
+from fastapi import UploadFile
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from auth.passwords import hash_passwords
+from database.models import Primary_Roles, User, users_primary_roles
+from utils.utility import validate_emails, validate_password
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+
+Row = Tuple[int, Optional[dict]]
+
+
+def read_rows(upload: UploadFile) -> Iterator[Row]:
+    """
+    Yields (row number, row) from a CSV file with a username,email,password
+    header or from a JSONL file (.jsonl / .ndjson) with the same keys.
+    Rows that cannot be parsed are yielded as None.
+    """
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    filename = (upload.filename or "").lower()
+    row_number = 0
+
+    try:
+        if filename.endswith((".jsonl", ".ndjson")):
+            for line in text:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield row_number, row if isinstance(row, dict) else None
+        else:
+            for row in csv.DictReader(text):
+                row_number += 1
+                yield row_number, row
+    except (UnicodeDecodeError, csv.Error):
+        # The rest of the file is unreadable, report it once and stop.
+        yield row_number + 1, None
+
+
+def batched(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def import_employees(db: Session, organization_id: UUID, rows: Iterable[Row]) -> dict:
+    """
+    Creates an Employee of organization_id for every valid row. Each batch is
+    checked against existing e-mails with one query and inserted with one
+    statement per table.
+    """
+    employee_role_id = (
+        db.query(Primary_Roles.id).filter_by(role_name="Employee").scalar()
+    )
+    created = 0
+    errors = []
+    seen_emails = set()
+
+    def reject(row_number, email, error):
+        errors.append({"row": row_number, "email": email, "error": error})
+
+    for batch in batched(rows, IMPORT_BATCH_SIZE):
+        candidates = []
+        for row_number, row in batch:
+            if row is None:
+                reject(row_number, None, "Malformed row")
+                continue
+            username, email, password = (
+                row.get("username"),
+                row.get("email"),
+                row.get("password"),
+            )
+            if not all(isinstance(i, str) and i for i in (username, email, password)):
+                reject(row_number, email, "Missing username, email or password")
+                continue
+            candidates.append((row_number, username, email, password))
+
+        valid = []
+        email_checks = validate_emails([i[2] for i in candidates])
+        for candidate, email_valid in zip(candidates, email_checks):
+            row_number, _, email, password = candidate
+            if not email_valid:
+                reject(row_number, email, "Invalid e-mail")
+            elif not validate_password(password):
+                reject(row_number, email, "Invalid password")
+            elif email in seen_emails:
+                reject(row_number, email, "Duplicate e-mail in file")
+            else:
+                seen_emails.add(email)
+                valid.append(candidate)
+
+        existing = set(
+            db.scalars(select(User.email).where(User.email.in_([i[2] for i in valid])))
+        )
+        new_users = [i for i in valid if i[2] not in existing]
+        for row_number, _, email, _ in valid:
+            if email in existing:
+                reject(row_number, email, "E-mail already exists")
+
+        if not new_users:
+            continue
+
+        hashes = hash_passwords([i[3] for i in new_users])
+        # An e-mail registered since the check above is skipped, not fatal.
+        inserted = db.execute(
+            pg_insert(User)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.id, User.email),
+            [
+                {
+                    "id": uuid4(),
+                    "username": username,
+                    "email": email,
+                    "hashed_password": hashed_password,
+                    "organization_id": organization_id,
+                }
+                for (_, username, email, _), hashed_password in zip(new_users, hashes)
+            ],
+        ).all()
+
+        inserted_emails = {i.email for i in inserted}
+        for row_number, _, email, _ in new_users:
+            if email not in inserted_emails:
+                reject(row_number, email, "E-mail already exists")
+
+        if inserted:
+            db.execute(
+                insert(users_primary_roles),
+                [
+                    {"user_id": i.id, "primary_role_id": employee_role_id}
+                    for i in inserted
+                ],
+            )
+        db.commit()
+        created += len(inserted)
+
+    errors.sort(key=lambda error: error["row"])
+    return {"created": created, "errors": errors}
@@ -3,35 +3,32 @@ organizations.py hosts everything related to organizations, getting, editing inf
 related to itself.
 """
 
-from typing import Annotated
+from typing import Annotated, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Response, UploadFile, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 
 from auth import authentication
+from auth.base_models import Principal
 from database.models import User, Organization
-from database.db import SESSIONLOCAL
+from database.db import DbDependency
+from organization.directory import (
+    DIRECTORY_PAGE_LIMIT,
+    EMPLOYEE_FIELDS,
+    directory_page,
+    page_etag,
+)
+from organization.employee_import import import_employees, read_rows
 from utils.utility import create_link_ref
 
 router = APIRouter(prefix="/organization", tags={"Organization"})
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependecy = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependecy = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.get("/link/{ref}")
@@ -57,7 +54,7 @@ def get_organization_info_from_ref(db: DbDependency, ref: str):
 
 
 @router.get("/")
-def get_organization_info(db: DbDependency, user: UserDependecy, org: UUID):
+def get_organization_info(db: DbDependency, action_user: UserDependecy, org: UUID):
     """
     Gets information for the organization page from the id.
     """
@@ -68,7 +65,6 @@ def get_organization_info(db: DbDependency, user: UserDependecy, org: UUID):
             status_code=status.HTTP_400_BAD_REQUEST, content="invalid uuid"
         )
 
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     db_org = db.query(Organization).filter_by(id=org).first()
 
     if not db_org:
@@ -90,7 +86,10 @@ def get_organization_info(db: DbDependency, user: UserDependecy, org: UUID):
             "organization_name": db_org.organization_name,
             "hq_address": db_org.hq_address,
             "owner_id": str(db_org.owner_id),
-            "employees": [str(i.id) for i in db_org.employees],
+            "employees": [
+                str(i)
+                for i in db.scalars(select(User.id).filter_by(organization_id=org))
+            ],
             "created_at": str(db_org.created_at),
             "link_ref": db_org.custom_link,
         },
@@ -98,10 +97,8 @@ def get_organization_info(db: DbDependency, user: UserDependecy, org: UUID):
 
 
 @router.put("/ref/refresh")
-def refresh_ref_link(db: DbDependency, user: UserDependecy):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+def refresh_ref_link(db: DbDependency, action_user: UserDependecy):
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=200,
             content="Only an Organization Admin can refresh the refferal.",
@@ -114,13 +111,36 @@ def refresh_ref_link(db: DbDependency, user: UserDependecy):
     )
 
 
+@router.post("/employees/import")
+def import_employees_to_organization(
+    db: DbDependency, action_user: UserDependecy, file: UploadFile
+):
+    """
+    Registers employees from a CSV (username,email,password header) or JSONL
+    upload. Invalid rows are reported and skipped, the others are imported.
+    """
+    if not "Organization Admin" in action_user.roles:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="Only an Organization Admin can import employees.",
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=import_employees(db, action_user.organization_id, read_rows(file)),
+    )
+
+
 @router.get("/employees")
-def get_employees_from_organization(db: DbDependency, user: UserDependecy):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    db_org = db.query(Organization).filter_by(id=action_user.organization_id).first()
+def get_employees_from_organization(db: DbDependency, action_user: UserDependecy):
+    employees = db.scalars(
+        select(User)
+        .options(selectinload(User.primary_roles))
+        .filter_by(organization_id=action_user.organization_id)
+    )
     return_list = []
 
-    for j in db_org.employees:
+    for j in employees:
         return_list.append(
             {
                 "id": str(j.id),
@@ -134,3 +154,49 @@ def get_employees_from_organization(db: DbDependency, user: UserDependecy):
         )
 
     return JSONResponse(status_code=status.HTTP_200_OK, content=return_list)
+
+
+@router.get("/employees/directory")
+def get_employee_directory(
+    db: DbDependency,
+    action_user: UserDependecy,
+    search: Optional[str] = None,
+    role: Optional[str] = None,
+    department_id: Optional[UUID] = None,
+    fields: Optional[str] = None,
+    after: Optional[UUID] = None,
+    limit: Annotated[int, Query(ge=1, le=DIRECTORY_PAGE_LIMIT)] = 50,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    """
+    A page of the employees of the organization, ordered by id. search matches
+    a part of the username or email, role a primary role name. fields is a
+    comma separated subset of EMPLOYEE_FIELDS. Pass next as after to get the
+    following page.
+    """
+    fields = fields.split(",") if fields else EMPLOYEE_FIELDS
+    unknown = [i for i in fields if i not in EMPLOYEE_FIELDS]
+    if unknown:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content=f"Unknown fields: {', '.join(unknown)}.",
+        )
+
+    page = directory_page(
+        db,
+        action_user.organization_id,
+        fields,
+        limit,
+        search=search,
+        role=role,
+        department_id=department_id,
+        after=after,
+    )
+    etag = page_etag(page)
+    if if_none_match == etag:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK, content=page, headers={"ETag": etag}
+    )
@@ -0,0 +1,77 @@
+"""
+Read endpoints of projects.py served from the async database stack.
+Included instead of their sync counterparts when DATABASE_ASYNC is enabled.
+"""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+
+from auth import authentication
+from auth.base_models import Principal
+from database.db import AsyncDbDependency
+from project.base_models import GetAvailableEmployeesModel
+from project.projects import (
+    available_employee_info,
+    available_employees_statement,
+    project_info,
+    project_list_info,
+    project_statement,
+    visible_projects_statement,
+)
+
+router = APIRouter(prefix="/project", tags={"Projects"})
+
+UserDependency = Annotated[
+    Principal, Depends(authentication.get_current_principal_async)
+]
+
+
+@router.post("/find")
+async def get_available_employees_async(
+    db: AsyncDbDependency,
+    action_user: UserDependency,
+    _body: GetAvailableEmployeesModel,
+):
+    employees = await db.stream(
+        available_employees_statement(action_user.organization_id, _body)
+    )
+    available_employees = [available_employee_info(i) async for i in employees]
+
+    if not available_employees:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content="This organization does not have any employees.",
+        )
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content=available_employees)
+
+
+@router.get("/{_id}")
+async def get_project_info_async(
+    db: AsyncDbDependency, action_user: UserDependency, _id: str
+):
+    project = (await db.scalars(project_statement(_id))).first()
+    if not project:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content="This project does not exist.",
+        )
+    if project.organization_id != action_user.organization_id:
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content="You are not allowed to view projects from another organization",
+        )
+
+    return JSONResponse(status_code=200, content=project_info(project))
+
+
+@router.get("/all/")
+async def get_all_projects_info_async(
+    db: AsyncDbDependency, action_user: UserDependency
+):
+    projects = await db.scalars(visible_projects_statement(action_user))
+    return JSONResponse(
+        status_code=200, content=[project_list_info(i) for i in projects]
+    )
@@ -41,3 +41,8 @@ class AssignUserModel(BaseModel):
 class AddCustomRoleToProjectModel(BaseModel):
     role_id: UUID
     project_id: UUID
+
+
+class MatchEmployeesModel(BaseModel):
+    project_id: UUID
+    top_k: int = 10
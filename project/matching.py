@@ -0,0 +1,185 @@
+"""
+Ranks the employees of an organization for a project without calling
+ChatGPT. The skills of every employee are kept in a dense user x skill
+matrix of proficiency scores, built once per organization and cached, so a
+ranking is a few vectorized NumPy operations even for 10k employees.
+
+A skill is required by a project when its name matches one of the project's
+roles or technologies. Employees are scored by their proficiency in the
+required skills and by how many hours they have left.
+"""
+
+from typing import List, Optional
+import os
+import re
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.models import Skill, User, User_Skills, UserWorkload
+from utils.cache import TTLCache
+
+MATCHING_CACHE_SECONDS = int(os.environ.get("MATCHING_CACHE_SECONDS", 60))
+MAX_SKILL_LEVEL = 5
+MAX_SKILL_EXPERIENCE = 6
+FULL_TIME_HOURS = 8
+# Skills not validated by a Department Manager count for less.
+UNVERIFIED_WEIGHT = 0.6
+SKILL_WEIGHT = 0.8
+AVAILABILITY_WEIGHT = 0.2
+
+matrix_cache = TTLCache(maxsize=64, ttl=MATCHING_CACHE_SECONDS)
+
+
+def normalize(name: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9+#.]+", name.lower()))
+
+
+class SkillMatrix:
+    """
+    Employees of an organization (rows) and their proficiency in each of
+    the organization's skills (columns), between 0 and 1.
+    """
+
+    def __init__(self, user_ids, usernames, skill_ids, skill_names, scores, hours):
+        self.user_ids = user_ids
+        self.usernames = usernames
+        self.skill_ids = skill_ids
+        self.skill_names = skill_names
+        self.normalized_names = [normalize(i) for i in skill_names]
+        self.scores = scores
+        self.availability = np.clip(
+            (FULL_TIME_HOURS - hours) / FULL_TIME_HOURS, 0.0, 1.0
+        )
+        self.user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+
+    def required_skills(self, names: List[str]) -> np.ndarray:
+        """
+        Columns of the skills matching one of names, as a whole name or as a
+        word of it ("Python" matches "Python Developer").
+        """
+        wanted = [normalize(i) for i in names]
+        wanted_words = {word for i in wanted for word in i.split()}
+        return np.array(
+            [
+                column
+                for column, skill_name in enumerate(self.normalized_names)
+                if skill_name in wanted or skill_name in wanted_words
+            ],
+            dtype=np.intp,
+        )
+
+
+def build_skill_matrix(db: Session, organization_id) -> SkillMatrix:
+    users = db.execute(
+        select(User.id, User.username, UserWorkload.work_hours)
+        .outerjoin(UserWorkload, UserWorkload.user_id == User.id)
+        .filter(User.organization_id == organization_id)
+        .order_by(User.id)
+    ).all()
+    skills = db.execute(
+        select(Skill.id, Skill.skill_name)
+        .filter(Skill.organization_id == str(organization_id))
+        .order_by(Skill.id)
+    ).all()
+    user_skills = db.execute(
+        select(
+            User_Skills.user_id,
+            User_Skills.skill_id,
+            User_Skills.skill_level,
+            User_Skills.skill_experience,
+            User_Skills.verified,
+        )
+        .join(User, User.id == User_Skills.user_id)
+        .filter(User.organization_id == organization_id)
+    ).all()
+
+    user_index = {str(i.id): row for row, i in enumerate(users)}
+    skill_index = {str(i.id): column for column, i in enumerate(skills)}
+    scores = np.zeros((len(users), len(skills)), dtype=np.float32)
+    for i in user_skills:
+        row = user_index.get(str(i.user_id))
+        column = skill_index.get(str(i.skill_id))
+        if row is None or column is None:
+            continue
+        score = (
+            0.7 * (i.skill_level or 0) / MAX_SKILL_LEVEL
+            + 0.3 * (i.skill_experience or 0) / MAX_SKILL_EXPERIENCE
+        )
+        scores[row, column] = score if i.verified else score * UNVERIFIED_WEIGHT
+
+    return SkillMatrix(
+        user_ids=[str(i.id) for i in users],
+        usernames=[i.username for i in users],
+        skill_ids=[str(i.id) for i in skills],
+        skill_names=[i.skill_name for i in skills],
+        scores=scores,
+        hours=np.array([i.work_hours or 0 for i in users], dtype=np.float32),
+    )
+
+
+def get_skill_matrix(db: Session, organization_id) -> SkillMatrix:
+    matrix = matrix_cache.get(str(organization_id))
+    if matrix is None:
+        matrix = build_skill_matrix(db, organization_id)
+        matrix_cache.set(str(organization_id), matrix)
+    return matrix
+
+
+def invalidate_skill_matrix(organization_id):
+    matrix_cache.pop(str(organization_id))
+
+
+def rank_employees(
+    matrix: SkillMatrix,
+    requirement_names: List[str],
+    top_k: int,
+    exclude: Optional[List[str]] = None,
+) -> dict:
+    """
+    The top_k employees for the roles and technologies in requirement_names,
+    best first. Ties are broken by user id, so the ranking is deterministic.
+    """
+    required = matrix.required_skills(requirement_names)
+    if required.size:
+        skill_score = matrix.scores[:, required].mean(axis=1)
+    else:
+        skill_score = np.zeros(len(matrix.user_ids), dtype=np.float32)
+    score = SKILL_WEIGHT * skill_score + AVAILABILITY_WEIGHT * matrix.availability
+
+    candidates = np.ones(len(matrix.user_ids), dtype=bool)
+    for user_id in exclude or ():
+        row = matrix.user_index.get(str(user_id))
+        if row is not None:
+            candidates[row] = False
+    if required.size:
+        candidates &= skill_score > 0
+    rows = np.flatnonzero(candidates)
+
+    if rows.size > top_k:
+        # Rows are sorted by user id, so a stable sort of the partitioned
+        # candidates keeps ties in user id order.
+        threshold = np.partition(score[rows], rows.size - top_k)[rows.size - top_k]
+        rows = rows[score[rows] >= threshold]
+    rows = rows[np.argsort(-score[rows], kind="stable")][:top_k]
+
+    return {
+        "required_skills": [
+            {"id": matrix.skill_ids[i], "skill_name": matrix.skill_names[i]}
+            for i in required
+        ],
+        "employees": [
+            {
+                "id": matrix.user_ids[i],
+                "username": matrix.usernames[i],
+                "score": round(float(score[i]), 4),
+                "skill_score": round(float(skill_score[i]), 4),
+                "availability": round(float(matrix.availability[i]), 4),
+                "matched_skills": [
+                    matrix.skill_names[j] for j in required if matrix.scores[i, j] > 0
+                ],
+            }
+            for i in rows
+        ],
+    }
@@ -3,27 +3,35 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import String, and_, case, cast, func, or_, select
+from sqlalchemy.dialects.postgresql import array, array_agg
+from sqlalchemy.orm import selectinload
 
 
 from auth import authentication
+from auth.base_models import Principal
 from database.models import (
     AllocationProposal,
     Custom_Roles,
     Department,
-    Organization,
+    Primary_Roles,
     TechnologyStack,
     User,
     Projects,
+    UserWorkload,
     Users_Custom_Roles,
-    WorkHours,
+    user_projects,
+    users_primary_roles,
 )
-from database.db import SESSIONLOCAL
+from database.db import DbDependency
+from project.matching import get_skill_matrix, rank_employees
+from project.workload import project_user_ids, refresh_workloads
 from project.base_models import (
     AddCustomRoleToProjectModel,
     AssignUserModel,
     CreateProjectModel,
     GetAvailableEmployeesModel,
+    MatchEmployeesModel,
     UpdateProjectModel,
 )
 from datetime import datetime, timedelta
@@ -31,29 +39,17 @@ from datetime import datetime, timedelta
 router = APIRouter(prefix="/project", tags={"Projects"})
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.post("/")
-def create_project(db: DbDependency, user: UserDependency, _body: CreateProjectModel):
+def create_project(
+    db: DbDependency, action_user: UserDependency, _body: CreateProjectModel
+):
     """
     Functionality for Project Managers to create a new project.
     """
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if "Project Manager" not in [i.role_name for i in action_user.primary_roles]:
+    if "Project Manager" not in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content="Only a Project Manager can create a new project.",
@@ -119,14 +115,15 @@ def create_project(db: DbDependency, user: UserDependency, _body: CreateProjectM
 
 
 @router.patch("/")
-def update_project(db: DbDependency, user: UserDependency, _body: UpdateProjectModel):
+def update_project(
+    db: DbDependency, action_user: UserDependency, _body: UpdateProjectModel
+):
     """
     Update an existing project, all fields are optional except project_id.
     """
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project_id = db.query(Projects).filter_by(id=_body.id).first()
 
-    if "Project Manager" not in [i.role_name for i in action_user.primary_roles]:
+    if "Project Manager" not in action_user.roles:
         return JSONResponse(
             status_code=400, content="Only a Project Manager can update a new project."
         )
@@ -157,6 +154,7 @@ def update_project(db: DbDependency, user: UserDependency, _body: UpdateProjectM
     project_id.project_name = _body.project_name
     project_id.project_period = _body.project_period
     project_id.start_date = _body.start_date
+    deadline_changed = project_id.deadline_date != _body.deadline_date
     project_id.deadline_date = _body.deadline_date
     project_id.project_status = _body.project_status
     project_id.description = _body.description
@@ -164,20 +162,21 @@ def update_project(db: DbDependency, user: UserDependency, _body: UpdateProjectM
     if project_id.project_status in ["In Progress", "Closing", "Closed"]:
         project_id.deletable = False
 
+    if deadline_changed:
+        refresh_workloads(db, project_user_ids(db, project_id.id))
     db.commit()
 
 
 @router.delete("/")
-def delete_project(db: DbDependency, user: UserDependency, _id: UUID):
+def delete_project(db: DbDependency, action_user: UserDependency, _id: UUID):
     """
     Functionality for Project Managers to delete a project.
     """
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(id=_id)
 
     if not project:
         return JSONResponse(status_code=400, content="This project does not exist.")
-    if "Project Manager" not in [i.role_name for i in action_user.primary_roles]:
+    if "Project Manager" not in action_user.roles:
         return JSONResponse(
             status_code=400, content="Only a Project Manager can create a new project."
         )
@@ -201,162 +200,278 @@ def delete_project(db: DbDependency, user: UserDependency, _id: UUID):
     )
 
 
+def available_employees_statement(organization_id, _body: GetAvailableEmployeesModel):
+    """
+    Classifies every employee of the organization by availability. Work hours,
+    project count and nearest deadline come from the user's user_workload row
+    and projects and primary roles are aggregated per user in the database, so
+    the whole search is a single query regardless of the organization size.
+    """
+    user_project_ids = (
+        select(
+            user_projects.c.user_id.label("user_id"),
+            array_agg(cast(user_projects.c.project_id, String)).label("projects"),
+        )
+        .group_by(user_projects.c.user_id)
+        .subquery()
+    )
+    user_roles = (
+        select(
+            users_primary_roles.c.user_id.label("user_id"),
+            array_agg(Primary_Roles.role_name).label("primary_roles"),
+        )
+        .join(Primary_Roles, Primary_Roles.id == users_primary_roles.c.primary_role_id)
+        .group_by(users_primary_roles.c.user_id)
+        .subquery()
+    )
+
+    total_work_hours = func.coalesce(UserWorkload.work_hours, 0)
+    methods = []
+    if _body.partially_available:
+        methods.append(
+            case(
+                (
+                    and_(total_work_hours > 1, total_work_hours < 8),
+                    "partially_available",
+                )
+            )
+        )
+    if _body.close_to_finish and _body.deadline is not None:
+        deadline = datetime.today() + timedelta(weeks=_body.deadline)
+        methods.append(
+            case((UserWorkload.nearest_deadline < deadline, "close_to_finish"))
+        )
+    if _body.unavailable:
+        methods.append(case((total_work_hours >= 8, "unavailable")))
+    methods.append(
+        case((func.coalesce(UserWorkload.project_count, 0) == 0, "available"))
+    )
+
+    return (
+        select(
+            User.id,
+            User.email,
+            User.username,
+            User.organization_id,
+            User.department_id,
+            total_work_hours.label("work_hours"),
+            func.array_remove(array(methods), None).label("method"),
+            user_project_ids.c.projects,
+            user_roles.c.primary_roles,
+        )
+        .outerjoin(UserWorkload, UserWorkload.user_id == User.id)
+        .outerjoin(user_project_ids, user_project_ids.c.user_id == User.id)
+        .outerjoin(user_roles, user_roles.c.user_id == User.id)
+        .filter(User.organization_id == organization_id)
+        .execution_options(yield_per=500)
+    )
+
+
+def available_employee_info(employee):
+    return {
+        "id": str(employee.id),
+        "email": employee.email,
+        "username": employee.username,
+        "organization_id": str(employee.organization_id),
+        "department_id": (
+            str(employee.department_id) if employee.department_id else None
+        ),
+        "method": employee.method,
+        "work_hours": employee.work_hours,
+        "projects": employee.projects or [],
+        "primary_roles": employee.primary_roles or [],
+    }
+
+
 @router.post("/find")
 def get_available_employees(
-    db: DbDependency, user: UserDependency, _body: GetAvailableEmployeesModel
+    db: DbDependency, action_user: UserDependency, _body: GetAvailableEmployeesModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    organization = (
-        db.query(Organization).filter_by(id=action_user.organization_id).first()
+    employees = db.execute(
+        available_employees_statement(action_user.organization_id, _body)
     )
-    employees = organization.employees
+    available_employees = [available_employee_info(i) for i in employees]
 
-    if not employees:
+    if not available_employees:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="This organization does not have any employees.",
         )
 
-    available_employees = []
+    return JSONResponse(status_code=status.HTTP_200_OK, content=available_employees)
 
-    for i in organization.employees:
-        work_hours = db.query(WorkHours).filter_by(user_id=i.id).all()
-        total_work_hours = 0
-        for k in work_hours:
-            total_work_hours += k.work_hours
 
-        i.__dict__["method"] = []
-        i.__dict__["work_hours"] = total_work_hours
-        i.__dict__["primary_roles"] = [j.role_name for j in i.primary_roles]
-
-        if _body.partially_available and 1 < total_work_hours < 8:
-            i.__dict__["method"].append("partially_available")
-
-        if _body.close_to_finish:
-            for j in i.projects:
-                if j.deadline_date:
-                    d1 = j.deadline_date
-                    d2 = datetime.today()
-                    print(d1)
-                    print(d2)
-                    print(((d1 - d2)).total_seconds())
-                    print(_body.deadline * 604800)
-
-                    if (
-                        (d1 - d2)
-                    ).total_seconds() < _body.deadline * 604800:  # seconds in a week
+def project_statement(_id):
+    """
+    Selects a project with every collection rendered by project_info.
+    """
+    return (
+        select(Projects)
+        .filter_by(id=_id)
+        .options(
+            selectinload(Projects.users),
+            selectinload(Projects.project_roles),
+            selectinload(Projects.technologies),
+            selectinload(Projects.deallocated_users),
+        )
+    )
 
-                        i.__dict__["method"].append("close_to_finish")
 
-        if _body.unavailable and total_work_hours >= 8:
-            i.__dict__["method"].append("unavailable")
+def project_info(project: Projects):
+    return {
+        "project_id": str(project.id),
+        "project_name": project.project_name,
+        "project_period": project.project_period,
+        "start_date": str(project.start_date),
+        "deadline_date": str(project.deadline_date),
+        "project_status": project.project_status,
+        "description": project.description,
+        "users": [{"id": str(i.id), "username:": i.username} for i in project.users],
+        "project_roles": [
+            {"id": str(i.id), "role_name": i.custom_role_name}
+            for i in project.project_roles
+        ],
+        "technology_stack": [i.tech_name for i in project.technologies],
+        "deallocated_users": [
+            {"id": str(i.id), "username:": i.username}
+            for i in project.deallocated_users
+        ],
+        "project_manager": str(project.project_manager),
+    }
 
-        if not i.projects:
-            i.__dict__["method"].append("available")
 
-        available_employees.append(i.__dict__)
+@router.post("/match")
+def match_employees(
+    db: DbDependency, action_user: UserDependency, _body: MatchEmployeesModel
+):
+    """
+    Ranks the employees of the organization for a project by their skills in
+    the project's roles and technologies and by their availability.
+    """
+    project = (
+        db.query(Projects)
+        .options(
+            selectinload(Projects.project_roles),
+            selectinload(Projects.technologies),
+            selectinload(Projects.users),
+        )
+        .filter_by(id=_body.project_id)
+        .first()
+    )
+    if not project or project.organization_id != action_user.organization_id:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content="This project does not exist.",
+        )
+    if not 0 < _body.top_k <= 100:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content="top_k must be between 1 and 100.",
+        )
 
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content=[
-            {
-                "id": str(i["id"]),
-                "email": i["email"],
-                "username": i["username"],
-                "organization_id": str(i["organization_id"]),
-                "department_id": (
-                    str(i["department_id"]) if i["department_id"] else None
-                ),
-                "method": [k for k in i["method"]],
-                "work_hours": total_work_hours,
-                "projects": [str(l.id) for l in i["projects"]],
-                "primary_roles": [k for k in i["primary_roles"]],
-            }
-            for i in available_employees
-        ],
+    matrix = get_skill_matrix(db, action_user.organization_id)
+    ranking = rank_employees(
+        matrix,
+        [i.custom_role_name for i in project.project_roles]
+        + [i.tech_name for i in project.technologies],
+        _body.top_k,
+        exclude=[str(i.id) for i in project.users],
     )
+    return JSONResponse(status_code=status.HTTP_200_OK, content=ranking)
 
 
 @router.get("/{_id}")
-def get_project_info(db: DbDependency, user: UserDependency, _id: str):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    project = db.query(Projects).filter_by(id=_id).first()
+def get_project_info(db: DbDependency, action_user: UserDependency, _id: str):
+    project = db.scalars(project_statement(_id)).first()
+    if not project:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content="This project does not exist.",
+        )
     if project.organization_id != action_user.organization_id:
         return JSONResponse(
             status_code=status.HTTP_403_FORBIDDEN,
             content="You are not allowed to view projects from another organization",
         )
-    project_dict = {
+
+    return JSONResponse(status_code=200, content=project_info(project))
+
+
+def visible_projects_statement(action_user: Principal):
+    """
+    Projects of the user's organization that the user works on or manages, with
+    every collection rendered by the project listings loaded up front.
+    """
+    return (
+        select(Projects)
+        .filter(
+            Projects.organization_id == action_user.organization_id,
+            or_(
+                Projects.project_manager == action_user.id,
+                Projects.id.in_(
+                    select(user_projects.c.project_id).where(
+                        user_projects.c.user_id == action_user.id
+                    )
+                ),
+            ),
+        )
+        .options(
+            selectinload(Projects.users),
+            selectinload(Projects.project_roles),
+            selectinload(Projects.technologies),
+            selectinload(Projects.deallocated_users),
+            selectinload(Projects.allocation_proposals).joinedload(
+                AllocationProposal.user
+            ),
+        )
+    )
+
+
+def project_list_info(project: Projects):
+    return {
+        "proposed_users": [
+            {
+                "id": str(i.user.id),
+                "username": i.user.username,
+                "email": i.user.email,
+            }
+            for i in project.allocation_proposals
+        ],
         "project_id": str(project.id),
         "project_name": project.project_name,
         "project_period": project.project_period,
         "start_date": str(project.start_date),
-        "deadline_date": str(project.deadline_date),
+        "deadline_date": (
+            str(project.deadline_date) if project.deadline_date else None
+        ),
         "project_status": project.project_status,
         "description": project.description,
-        "users": [{"id": str(i.id), "username:": i.username} for i in project.users],
+        "users": [
+            {"id": str(i.id), "username": i.username, "email": i.email}
+            for i in project.users
+        ],
         "project_roles": [
             {"id": str(i.id), "role_name": i.custom_role_name}
             for i in project.project_roles
         ],
-        "technology_stack": [i.tech_name for i in project.technologies],
+        "technology_stack": [
+            {"technology_name": i.tech_name, "id": str(i.id)}
+            for i in project.technologies
+        ],
         "deallocated_users": [
-            {"id": str(i.id), "username:": i.username}
+            {"id": str(i.id), "username": i.username, "email": i.email}
             for i in project.deallocated_users
         ],
         "project_manager": str(project.project_manager),
     }
 
-    return JSONResponse(status_code=200, content=project_dict)
-
 
 @router.get("/all/")
-def get_all_projects_info(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    projects = (
-        db.query(Projects).filter_by(organization_id=action_user.organization_id).all()
+def get_all_projects_info(db: DbDependency, action_user: UserDependency):
+    projects = db.scalars(visible_projects_statement(action_user))
+    return JSONResponse(
+        status_code=200, content=[project_list_info(i) for i in projects]
     )
-    project_list = []
-    for i in projects:
-        if action_user in i.users or action_user.id == i.project_manager:
-            proposed_to_project = (
-                db.query(AllocationProposal).filter_by(project_id_allocation=i.id).all()
-            )
-            users = []
-            for prop in proposed_to_project:
-                user = db.query(User).filter_by(id=prop.user_id).first()
-                users.append({"id": str(user.id), "username": user.username,  "email": user.email})
-            project_list.append(
-                {
-                    "proposed_users": users,
-                    "project_id": str(i.id),
-                    "project_name": i.project_name,
-                    "project_period": i.project_period,
-                    "start_date": str(i.start_date),
-                    "deadline_date": str(i.deadline_date) if i.deadline_date else None,
-                    "project_status": i.project_status,
-                    "description": i.description,
-                    "users": [
-                        {"id": str(i.id), "username": i.username, "email": i.email}
-                        for i in i.users
-                    ],
-                    "project_roles": [
-                        {"id": str(i.id), "role_name": i.custom_role_name}
-                        for i in i.project_roles
-                    ],
-                    "technology_stack": [
-                        {"technology_name": i.tech_name, "id": str(i.id)}
-                        for i in i.technologies
-                    ],
-                    "deallocated_users": [
-                        {"id": str(j.id), "username": j.username, "email": j.email}
-                        for j in i.deallocated_users
-                    ],
-                    "project_manager": str(i.project_manager),
-                }
-            )
-
-    return JSONResponse(status_code=200, content=project_list)
 
 
 @router.get("/user-info/{_id}")
@@ -409,9 +524,8 @@ def get_project_user_info(db: DbDependency, user: UserDependency, _id: str):
 @router.get("/info/department/{_id}")
 def get_projects_related_to_department(
     db: DbDependency,
-    user: UserDependency,
+    action_user: UserDependency,
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = (
         db.query(Projects).filter_by(organization_id=action_user.organization_id).all()
     )
@@ -459,9 +573,8 @@ def get_projects_related_to_department(
 
 @router.post("/roles")
 def add_custom_role_to_project(
-    db: DbDependency, user: UserDependency, _body: AddCustomRoleToProjectModel
+    db: DbDependency, action_user: UserDependency, _body: AddCustomRoleToProjectModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(id=_body.project_id).first()
     role_to_add = db.query(Custom_Roles).filter_by(id=_body.role_id).first()
 
@@ -495,9 +608,8 @@ def add_custom_role_to_project(
 
 @router.delete("/roles")
 def delete_custom_role_from_project(
-    db: DbDependency, user: UserDependency, _body: AddCustomRoleToProjectModel
+    db: DbDependency, action_user: UserDependency, _body: AddCustomRoleToProjectModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(project_manager=action_user.id).first()
     role_to_delete = db.query(Custom_Roles).filter_by(id=_body.role_id).first()
 
@@ -527,7 +639,7 @@ def delete_custom_role_from_project(
 
 @router.get("/active/")
 def get_all_active_projects(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+    action_user = db.query(User).filter_by(id=user.id).first()
 
     projects = (
         db.query(Projects).filter_by(organization_id=action_user.organization_id).all()
@@ -568,7 +680,7 @@ def get_all_active_projects(db: DbDependency, user: UserDependency):
 
 @router.get("/inactive/")
 def get_all_inactive_projects(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+    action_user = db.query(User).filter_by(id=user.id).first()
 
     projects = (
         db.query(Projects).filter_by(organization_id=action_user.organization_id).all()
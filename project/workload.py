@@ -0,0 +1,158 @@
+"""
+Maintains user_workload, the per-user summary of work hours, project count
+and nearest project deadline. Everything that changes WorkHours, project
+membership or a project deadline calls refresh_workloads in its own
+transaction. The table can be rebuilt or checked against the source rows:
+    python -m project.workload rebuild
+    python -m project.workload check
+"""
+
+from typing import Iterable, List, Optional
+import sys
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.db import SESSIONLOCAL
+from database.models import Projects, User, UserWorkload, WorkHours, user_projects
+
+WORKLOAD_COLUMNS = ("user_id", "work_hours", "project_count", "nearest_deadline")
+
+
+def workload_statement(user_ids: Optional[List] = None):
+    """
+    Computes the workload of user_ids (every user when None) from WorkHours
+    and user_projects.
+    """
+    hours = select(
+        WorkHours.user_id.label("user_id"),
+        func.sum(WorkHours.work_hours).label("work_hours"),
+    ).group_by(WorkHours.user_id)
+    projects = (
+        select(
+            user_projects.c.user_id.label("user_id"),
+            func.count().label("project_count"),
+            func.min(Projects.deadline_date).label("nearest_deadline"),
+        )
+        .join(Projects, Projects.id == user_projects.c.project_id)
+        .group_by(user_projects.c.user_id)
+    )
+    if user_ids is not None:
+        hours = hours.filter(WorkHours.user_id.in_(user_ids))
+        projects = projects.filter(user_projects.c.user_id.in_(user_ids))
+    hours = hours.subquery()
+    projects = projects.subquery()
+
+    statement = (
+        select(
+            User.id.label("user_id"),
+            func.coalesce(hours.c.work_hours, 0).label("work_hours"),
+            func.coalesce(projects.c.project_count, 0).label("project_count"),
+            projects.c.nearest_deadline,
+        )
+        .outerjoin(hours, hours.c.user_id == User.id)
+        .outerjoin(projects, projects.c.user_id == User.id)
+    )
+    if user_ids is not None:
+        statement = statement.filter(User.id.in_(user_ids))
+    return statement
+
+
+def refresh_workloads(db: Session, user_ids: Optional[Iterable] = None):
+    """
+    Recomputes the workload rows of user_ids (every user when None) in one
+    upsert. Pending changes are flushed first; the caller commits.
+
+    The users are locked until the caller commits, so two transactions
+    refreshing the same user run one after the other and the second sums
+    the rows committed by the first instead of storing a stale total.
+    """
+    if user_ids is not None:
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return
+    db.flush()
+    if user_ids is not None:
+        db.execute(
+            select(User.id)
+            .where(User.id.in_(user_ids))
+            .order_by(User.id)
+            .with_for_update()
+        )
+
+    upsert = insert(UserWorkload).from_select(
+        WORKLOAD_COLUMNS, workload_statement(user_ids)
+    )
+    db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[UserWorkload.user_id],
+            set_={i: upsert.excluded[i] for i in WORKLOAD_COLUMNS[1:]},
+        )
+    )
+
+
+def project_user_ids(db: Session, project_id) -> List:
+    return db.scalars(
+        select(user_projects.c.user_id).where(user_projects.c.project_id == project_id)
+    ).all()
+
+
+def rebuild_workloads():
+    with SESSIONLOCAL() as db:
+        refresh_workloads(db)
+        db.commit()
+
+
+def check_workloads() -> List[dict]:
+    """
+    Returns the users whose user_workload row differs from their WorkHours
+    and projects. Users without a row count as having no work.
+    """
+    expected = workload_statement().subquery()
+    stored_work_hours = func.coalesce(UserWorkload.work_hours, 0)
+    stored_project_count = func.coalesce(UserWorkload.project_count, 0)
+    with SESSIONLOCAL() as db:
+        rows = db.execute(
+            select(
+                expected,
+                stored_work_hours.label("stored_work_hours"),
+                stored_project_count.label("stored_project_count"),
+                UserWorkload.nearest_deadline.label("stored_nearest_deadline"),
+            )
+            .outerjoin(UserWorkload, UserWorkload.user_id == expected.c.user_id)
+            .filter(
+                (stored_work_hours != expected.c.work_hours)
+                | (stored_project_count != expected.c.project_count)
+                | UserWorkload.nearest_deadline.is_distinct_from(
+                    expected.c.nearest_deadline
+                )
+            )
+        ).all()
+    return [
+        {
+            "user_id": str(i.user_id),
+            "expected": [i.work_hours, i.project_count, str(i.nearest_deadline)],
+            "stored": [
+                i.stored_work_hours,
+                i.stored_project_count,
+                str(i.stored_nearest_deadline),
+            ],
+        }
+        for i in rows
+    ]
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        rebuild_workloads()
+        print("user_workload rebuilt.")
+    elif sys.argv[1:] == ["check"]:
+        mismatches = check_workloads()
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} inconsistent user_workload rows.")
+        sys.exit(1 if mismatches else 0)
+    else:
+        print("usage: python -m project.workload rebuild|check")
+        sys.exit(2)
@@ -0,0 +1,130 @@
+"""
+Read endpoints of proposal.py served from the async database stack.
+Included instead of their sync counterparts when DATABASE_ASYNC is enabled.
+"""
+
+from typing import Annotated, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from auth import authentication
+from auth.base_models import Principal
+from database.db import AsyncDbDependency
+from database.models import AllocationProposal, DeallocationProposal, User
+from proposals.proposal import (
+    allocation_proposal_info,
+    check_department_manager,
+    deallocation_proposal_info,
+    department_proposals,
+)
+
+router = APIRouter(prefix="/proposal", tags={"Proposals"})
+
+UserDependency = Annotated[
+    Principal, Depends(authentication.get_current_principal_async)
+]
+
+
+async def check_department_user(db, action_user: Principal, _id: UUID):
+    """
+    Returns the error response if _id is not an user of the manager's department.
+    """
+    victim_user = await db.get(User, _id)
+
+    if not victim_user:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND, content="This user does not exist."
+        )
+    error = check_department_manager(action_user)
+    if error:
+        return error
+    if not victim_user.department_id == action_user.department_id:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content="This user is not from your department.",
+        )
+    return None
+
+
+@router.get("/allocation/{_id}")
+async def get_allocation_proposal_from_user_async(
+    db: AsyncDbDependency, action_user: UserDependency, _id: UUID
+):
+    error = await check_department_user(db, action_user, _id)
+    if error:
+        return error
+
+    proposals = await db.scalars(
+        select(AllocationProposal)
+        .filter_by(user_id=_id)
+        .options(selectinload(AllocationProposal.roles))
+    )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[allocation_proposal_info(i) for i in proposals],
+    )
+
+
+@router.get("/deallocation/{_id}")
+async def get_deallocation_proposal_from_user_async(
+    db: AsyncDbDependency, action_user: UserDependency, _id: UUID
+):
+    error = await check_department_user(db, action_user, _id)
+    if error:
+        return error
+
+    proposals = await db.scalars(select(DeallocationProposal).filter_by(user_id=_id))
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[deallocation_proposal_info(i) for i in proposals],
+    )
+
+
+@router.get("/alloc-department/{_id}")
+async def get_allocation_proposal_from_department_async(
+    db: AsyncDbDependency,
+    action_user: UserDependency,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    descending: bool = False,
+):
+    error = check_department_manager(action_user)
+    if error:
+        return error
+
+    proposals = await db.scalars(
+        department_proposals(
+            AllocationProposal, action_user.department_id, offset, limit, descending
+        )
+    )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[allocation_proposal_info(i) for i in proposals],
+    )
+
+
+@router.get("/dealloc-department/{_id}")
+async def get_deallocation_proposal_from_department_async(
+    db: AsyncDbDependency,
+    action_user: UserDependency,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    descending: bool = False,
+):
+    error = check_department_manager(action_user)
+    if error:
+        return error
+
+    proposals = await db.scalars(
+        department_proposals(
+            DeallocationProposal, action_user.department_id, offset, limit, descending
+        )
+    )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[deallocation_proposal_info(i) for i in proposals],
+    )
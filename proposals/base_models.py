@@ -16,3 +16,7 @@ class CreateDeallocationProposal(BaseModel):
     user_id: UUID
     comment: str
     project_id: UUID
+
+
+class ProposalBatchModel(BaseModel):
+    ids: list[UUID]
@@ -0,0 +1,180 @@
+"""
+Settles many allocation / deallocation proposals of a department at once.
+Each batch loads its proposals with one query, applies the accepted ones
+with one statement per table and commits once. Every proposal id gets an
+outcome:
+    accepted / rejected      settled by this batch
+    not_found                no such proposal, or already settled
+    not_in_department        the proposed user is not in the manager's department
+    already_assigned         allocation of an user already in the project
+    not_assigned             deallocation of an user not in the project
+"""
+
+from typing import Dict, List
+from uuid import UUID
+
+from sqlalchemy import and_, delete, exists, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from database.models import (
+    AllocationProposal,
+    DeallocationProposal,
+    User,
+    Users_Custom_Roles,
+    WorkHours,
+    allocation_roles,
+    dealloc_user_projects,
+    user_projects,
+)
+from project.workload import refresh_workloads
+
+
+def load_proposals(db: Session, model, project_id, ids: List[UUID]):
+    """
+    Locks the requested proposals and returns them with their user's
+    department and whether the user is in the proposal's project.
+    """
+    assigned = exists().where(
+        and_(
+            user_projects.c.user_id == model.user_id,
+            user_projects.c.project_id == project_id,
+        )
+    )
+    return db.execute(
+        select(model, User.department_id, assigned.label("assigned"))
+        .join(User, User.id == model.user_id)
+        .filter(model.id.in_(ids))
+        .with_for_update(of=model)
+    ).all()
+
+
+def outcomes(ids: List[UUID], settled: Dict[UUID, str]) -> List[dict]:
+    return [
+        {"proposal_id": str(i), "outcome": settled.get(i, "not_found")}
+        for i in dict.fromkeys(ids)
+    ]
+
+
+def accept_allocations(db: Session, department_id, ids: List[UUID]) -> List[dict]:
+    settled = {}
+    accepted = []
+    allocated = set()
+    for proposal, user_department, assigned in load_proposals(
+        db, AllocationProposal, AllocationProposal.project_id_allocation, ids
+    ):
+        membership = (proposal.user_id, proposal.project_id_allocation)
+        if user_department != department_id:
+            settled[proposal.id] = "not_in_department"
+        elif assigned or membership in allocated:
+            settled[proposal.id] = "already_assigned"
+        else:
+            settled[proposal.id] = "accepted"
+            accepted.append(proposal)
+            allocated.add(membership)
+
+    if accepted:
+        db.execute(
+            insert(user_projects),
+            [
+                {"user_id": i.user_id, "project_id": i.project_id_allocation}
+                for i in accepted
+            ],
+        )
+        db.execute(
+            insert(WorkHours),
+            [
+                {
+                    "user_id": i.user_id,
+                    "project_id": i.project_id_allocation,
+                    "work_hours": i.work_hours,
+                }
+                for i in accepted
+            ],
+        )
+        delete_allocations(db, [i.id for i in accepted])
+        refresh_workloads(db, [i.user_id for i in accepted])
+    db.commit()
+    return outcomes(ids, settled)
+
+
+def accept_deallocations(db: Session, department_id, ids: List[UUID]) -> List[dict]:
+    settled = {}
+    accepted = []
+    deallocated = set()
+    for proposal, user_department, assigned in load_proposals(
+        db, DeallocationProposal, DeallocationProposal.project_id_deallocation, ids
+    ):
+        membership = (proposal.user_id, proposal.project_id_deallocation)
+        if user_department != department_id:
+            settled[proposal.id] = "not_in_department"
+        elif not assigned or membership in deallocated:
+            settled[proposal.id] = "not_assigned"
+        else:
+            settled[proposal.id] = "accepted"
+            accepted.append(proposal)
+            deallocated.add(membership)
+
+    if accepted:
+        memberships = list(deallocated)
+        db.execute(
+            delete(user_projects).where(
+                tuple_(user_projects.c.user_id, user_projects.c.project_id).in_(
+                    memberships
+                )
+            )
+        )
+        db.execute(
+            insert(dealloc_user_projects),
+            [{"user_id": i[0], "project_id": i[1]} for i in memberships],
+        )
+        db.execute(
+            delete(WorkHours).where(
+                tuple_(WorkHours.user_id, WorkHours.project_id).in_(memberships)
+            )
+        )
+        db.execute(
+            delete(Users_Custom_Roles).where(
+                tuple_(Users_Custom_Roles.user_id, Users_Custom_Roles.project_id).in_(
+                    memberships
+                )
+            )
+        )
+        db.execute(
+            delete(DeallocationProposal).where(
+                DeallocationProposal.id.in_([i.id for i in accepted])
+            )
+        )
+        refresh_workloads(db, [i.user_id for i in accepted])
+    db.commit()
+    return outcomes(ids, settled)
+
+
+def reject_proposals(db: Session, model, department_id, ids: List[UUID]) -> List[dict]:
+    settled = {}
+    rejected = []
+    for proposal_id, user_department in db.execute(
+        select(model.id, User.department_id)
+        .join(User, User.id == model.user_id)
+        .filter(model.id.in_(ids))
+        .with_for_update(of=model)
+    ):
+        if user_department != department_id:
+            settled[proposal_id] = "not_in_department"
+        else:
+            settled[proposal_id] = "rejected"
+            rejected.append(proposal_id)
+
+    if rejected:
+        if model is AllocationProposal:
+            delete_allocations(db, rejected)
+        else:
+            db.execute(delete(model).where(model.id.in_(rejected)))
+    db.commit()
+    return outcomes(ids, settled)
+
+
+def delete_allocations(db: Session, ids: List[UUID]):
+    db.execute(
+        delete(allocation_roles).where(allocation_roles.c.allocation_id.in_(ids))
+    )
+    db.execute(delete(AllocationProposal).where(AllocationProposal.id.in_(ids)))
@@ -1,52 +1,111 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 
 from auth import authentication
+from auth.base_models import Principal
 from database.models import (
     AllocationProposal,
     Custom_Roles,
     DeallocationProposal,
-    Notifications,
     Projects,
     User,
     Users_Custom_Roles,
     WorkHours,
 )
-from database.db import SESSIONLOCAL
-from proposals.base_models import CreateAllocationProposal, CreateDeallocationProposal
+from database.db import DbDependency
+from notifications.outbox import enqueue_notification
+from project.workload import refresh_workloads
+from proposals import batch
+from proposals.base_models import (
+    CreateAllocationProposal,
+    CreateDeallocationProposal,
+    ProposalBatchModel,
+)
 
 router = APIRouter(prefix="/proposal", tags={"Proposals"})
 
 
-def get_db():
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
+
+
+def allocation_proposal_info(proposal: AllocationProposal):
+    return {
+        "proposal_id": str(proposal.id),
+        "project_id": str(proposal.project_id_allocation),
+        "user_id": str(proposal.user_id),
+        "comments": proposal.comments,
+        "work_hours": proposal.work_hours,
+        "proposed_roles": [str(i.id) for i in proposal.roles],
+    }
+
+
+def deallocation_proposal_info(proposal: DeallocationProposal):
+    return {
+        "proposal_id": str(proposal.id),
+        "project_id": str(proposal.project_id_deallocation),
+        "user_id": str(proposal.user_id),
+        "reason": proposal.reason,
+    }
+
+
+def check_department_manager(action_user: Principal):
     """
-    creates a db session
+    Returns the error response for users that cannot see department proposals.
     """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
+    if not action_user.department_id:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="You are not managing any departments yet.",
+        )
+    if not "Department Manager" in action_user.roles:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="Only Department Managers can see someone's proposals.",
+        )
+    return None
 
 
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+def department_proposals(
+    model, department_id, offset: int, limit: Optional[int], descending: bool
+):
+    """
+    Select of the proposals of every user in a department, one page of them
+    ordered by project name. Allocation roles are loaded with one more query.
+    """
+    if model is AllocationProposal:
+        project_id = AllocationProposal.project_id_allocation
+    else:
+        project_id = DeallocationProposal.project_id_deallocation
+    project_name = Projects.project_name
+
+    query = (
+        select(model)
+        .join(User, User.id == model.user_id)
+        .join(Projects, Projects.id == project_id)
+        .filter(User.department_id == department_id)
+        .order_by(project_name.desc() if descending else project_name, model.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    if model is AllocationProposal:
+        query = query.options(selectinload(AllocationProposal.roles))
+    return query
 
 
 @router.post("/allocation")
 def create_allocation_proposal(
-    db: DbDependency, user: UserDependency, _body: CreateAllocationProposal
+    db: DbDependency, action_user: UserDependency, _body: CreateAllocationProposal
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(id=_body.project_id).first()
     victim_user = db.query(User).filter_by(id=_body.user_id).first()
 
-    if not "Project Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Project Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Project Managers are able to propose users.",
@@ -113,12 +172,9 @@ def create_allocation_proposal(
             status_code=status.HTTP_404_NOT_FOUND,
             content="This user is not in any departments.",
         )
-    create_notification_model = Notifications(
-        type="ALLOCATION",
-        to_manager=victim_user.department.department_manager,
-        for_user=victim_user.id,
+    enqueue_notification(
+        db, "ALLOCATION", victim_user.department.department_manager, victim_user.id
     )
-    db.add(create_notification_model)
     db.add(create_proposal_model)
 
     db.commit()
@@ -130,13 +186,12 @@ def create_allocation_proposal(
 
 @router.post("/deallocation")
 def create_deallocation_proposal(
-    db: DbDependency, user: UserDependency, _body: CreateDeallocationProposal
+    db: DbDependency, action_user: UserDependency, _body: CreateDeallocationProposal
 ):
     # known issue: work_hours does not reset as intended
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(id=_body.project_id).first()
     victim_user = db.query(User).filter_by(id=_body.user_id).first()
-    if not "Project Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Project Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Project Managers are able to propose users.",
@@ -178,12 +233,9 @@ def create_deallocation_proposal(
         user_id=_body.user_id,
         reason=_body.comment,
     )
-    create_notification_model = Notifications(
-        type="DEALLOCATION",
-        to_manager=victim_user.department.department_manager,
-        for_user=victim_user.id,
+    enqueue_notification(
+        db, "DEALLOCATION", victim_user.department.department_manager, victim_user.id
     )
-    db.add(create_notification_model)
     db.add(create_proposal_model)
 
     db.commit()
@@ -196,9 +248,8 @@ def create_deallocation_proposal(
 
 @router.get("/allocation/{_id}")
 def get_allocation_proposal_from_user(
-    db: DbDependency, user: UserDependency, _id: UUID
+    db: DbDependency, action_user: UserDependency, _id: UUID
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_id).first()
 
     if not victim_user:
@@ -210,7 +261,7 @@ def get_allocation_proposal_from_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You are not managing any departments yet.",
         )
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Department Managers can see someone's proposals.",
@@ -224,25 +275,14 @@ def get_allocation_proposal_from_user(
     proposals = db.query(AllocationProposal).filter_by(user_id=_id).all()
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content=[
-            {
-                "proposal_id": str(i.id),
-                "project_id": str(i.project_id_allocation),
-                "user_id": str(i.user_id),
-                "comments": i.comments,
-                "work_hours": i.work_hours,
-                "proposed_roles": [str(j.id) for j in i.roles],
-            }
-            for i in proposals
-        ],
+        content=[allocation_proposal_info(i) for i in proposals],
     )
 
 
 @router.get("/deallocation/{_id}")
 def get_deallocation_proposal_from_user(
-    db: DbDependency, user: UserDependency, _id: UUID
+    db: DbDependency, action_user: UserDependency, _id: UUID
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_id).first()
 
     if not victim_user:
@@ -254,7 +294,7 @@ def get_deallocation_proposal_from_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You are not managing any departments yet.",
         )
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Department Managers can see someone's proposals.",
@@ -267,105 +307,69 @@ def get_deallocation_proposal_from_user(
     proposals = db.query(DeallocationProposal).filter_by(user_id=_id).all()
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content=[
-            {
-                "proposal_id": str(i.id),
-                "project_id": str(i.project_id_deallocation),
-                "user_id": str(i.user_id),
-                "reason": i.reason,
-            }
-            for i in proposals
-        ],
+        content=[deallocation_proposal_info(i) for i in proposals],
     )
 
 
 @router.get("/alloc-department/{_id}")
-def get_allocation_proposal_from_department(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    users = db.query(User).filter_by(department_id=action_user.department_id).all()
-    if not users:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content="Your department does not have users.",
-        )
-    if not action_user.department_id:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content="You are not managing any departments yet.",
-        )
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content="Only Department Managers can see someone's proposals.",
-        )
-
-    proposals = []
-    for i in users:
-        for j in db.query(AllocationProposal).filter_by(user_id=i.id).all():
-            proposals.append(j)
+def get_allocation_proposal_from_department(
+    db: DbDependency,
+    action_user: UserDependency,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    descending: bool = False,
+):
+    """
+    Proposals of the users in the manager's department, sorted by project.
+    """
+    error = check_department_manager(action_user)
+    if error:
+        return error
 
+    proposals = db.scalars(
+        department_proposals(
+            AllocationProposal, action_user.department_id, offset, limit, descending
+        )
+    ).all()
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content=[
-            {
-                "proposal_id": str(i.id),
-                "project_id": str(i.project_id_allocation),
-                "user_id": str(i.user_id),
-                "comments": i.comments,
-                "work_hours": i.work_hours,
-                "proposed_roles": [str(j.id) for j in i.roles],
-            }
-            for i in proposals
-        ],
+        content=[allocation_proposal_info(i) for i in proposals],
     )
 
 
 @router.get("/dealloc-department/{_id}")
-def get_deallocation_proposal_from_department(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    users = db.query(User).filter_by(department_id=action_user.department_id).all()
-    if not users:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content="Your department does not have users.",
-        )
-    if not action_user.department_id:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content="You are not managing any departments yet.",
-        )
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content="Only Department Managers can see someone's proposals.",
-        )
-
-    proposals = []
-    for i in users:
-        for j in db.query(DeallocationProposal).filter_by(user_id=i.id).all():
-            proposals.append(j)
+def get_deallocation_proposal_from_department(
+    db: DbDependency,
+    action_user: UserDependency,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    descending: bool = False,
+):
+    """
+    Proposals of the users in the manager's department, sorted by project.
+    """
+    error = check_department_manager(action_user)
+    if error:
+        return error
 
+    proposals = db.scalars(
+        department_proposals(
+            DeallocationProposal, action_user.department_id, offset, limit, descending
+        )
+    ).all()
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content=[
-            {
-                "proposal_id": str(i.id),
-                "project_id": str(i.project_id_deallocation),
-                "project_id": str(i.project_id_deallocation),
-                "user_id": str(i.user_id),
-                "reason": i.reason,
-            }
-            for i in proposals
-        ],
+        content=[deallocation_proposal_info(i) for i in proposals],
     )
 
 
 @router.post("/allocation/accept")
-def accept_allocation_proposal(db: DbDependency, user: UserDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def accept_allocation_proposal(
+    db: DbDependency, action_user: UserDependency, _id: UUID
+):
     proposal = db.query(AllocationProposal).filter_by(id=_id).first()
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Department Managers can see someone's proposals.",
@@ -411,6 +415,7 @@ def accept_allocation_proposal(db: DbDependency, user: UserDependency, _id: UUID
     )
     db.delete(proposal)
     db.add(work_hours)
+    refresh_workloads(db, [victim_user.id])
     db.commit()
 
 
@@ -427,12 +432,13 @@ def reject_allocation_proposal(db: DbDependency, user: UserDependency, _id: UUID
 
 
 @router.post("/deallocation/accept")
-def accept_deallocation_proposal(db: DbDependency, user: UserDependency, _id: UUID):
+def accept_deallocation_proposal(
+    db: DbDependency, action_user: UserDependency, _id: UUID
+):
     proposal = db.query(DeallocationProposal).filter_by(id=_id).first()
-    action_user = db.query(User).filter_by(id=user["id"]).first()
 
     print(proposal.__dict__)
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Department Managers can see someone's proposals.",
@@ -490,6 +496,7 @@ def accept_deallocation_proposal(db: DbDependency, user: UserDependency, _id: UU
             db.delete(i)
     db.delete(work_hours)
     db.delete(proposal)
+    refresh_workloads(db, [victim_user.id])
     db.commit()
 
 
@@ -497,3 +504,62 @@ def accept_deallocation_proposal(db: DbDependency, user: UserDependency, _id: UU
 def reject_deallocation_proposal(db: DbDependency, user: UserDependency, _id: UUID):
     db.query(DeallocationProposal).filter_by(id=_id).delete()
     db.commit()
+
+
+def batch_response(action_user: Principal, settle) -> JSONResponse:
+    error = check_department_manager(action_user)
+    if error:
+        return error
+    return JSONResponse(status_code=status.HTTP_200_OK, content=settle())
+
+
+@router.post("/allocation/accept/batch")
+def accept_allocation_proposals(
+    db: DbDependency, action_user: UserDependency, _body: ProposalBatchModel
+):
+    """
+    Accepts many allocation proposals in one transaction. Returns the outcome
+    of every proposal.
+    """
+    return batch_response(
+        action_user,
+        lambda: batch.accept_allocations(db, action_user.department_id, _body.ids),
+    )
+
+
+@router.post("/allocation/reject/batch")
+def reject_allocation_proposals(
+    db: DbDependency, action_user: UserDependency, _body: ProposalBatchModel
+):
+    return batch_response(
+        action_user,
+        lambda: batch.reject_proposals(
+            db, AllocationProposal, action_user.department_id, _body.ids
+        ),
+    )
+
+
+@router.post("/deallocation/accept/batch")
+def accept_deallocation_proposals(
+    db: DbDependency, action_user: UserDependency, _body: ProposalBatchModel
+):
+    """
+    Accepts many deallocation proposals in one transaction, removing the users
+    from their projects together with their work hours and project roles.
+    """
+    return batch_response(
+        action_user,
+        lambda: batch.accept_deallocations(db, action_user.department_id, _body.ids),
+    )
+
+
+@router.post("/deallocation/reject/batch")
+def reject_deallocation_proposals(
+    db: DbDependency, action_user: UserDependency, _body: ProposalBatchModel
+):
+    return batch_response(
+        action_user,
+        lambda: batch.reject_proposals(
+            db, DeallocationProposal, action_user.department_id, _body.ids
+        ),
+    )
@@ -2,40 +2,29 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
 
 from roles.base_models import ModifyRoleModel
 from auth import authentication
+from auth.base_models import Principal
 from database.models import User, Primary_Roles
-from database.db import SESSIONLOCAL
-
+from database.db import DbDependency
 
 router = APIRouter(prefix="/roles", tags={"Main Roles"})
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependecy = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependecy = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.post("/assign")
-def assign_role_to_user(db: DbDependency, user: UserDependecy, _body: ModifyRoleModel):
-    return assign_role(db, user, _body.user_id, _body.role_name, True)
+def assign_role_to_user(
+    db: DbDependency, action_user: UserDependecy, _body: ModifyRoleModel
+):
+    return assign_role(db, action_user, _body.user_id, _body.role_name, True)
 
 
 @router.put("/remove")
 def remove_role_from_user(
-    db: DbDependency, user: UserDependecy, _body: ModifyRoleModel
+    db: DbDependency, action_user: UserDependecy, _body: ModifyRoleModel
 ):
     if not _body.role_name in [
         "Employee",
@@ -54,7 +43,6 @@ def remove_role_from_user(
             content="You cannot remove the role of Employee from someone.",
         )
 
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=_body.user_id).first()
     role_to_delete = (
         db.query(Primary_Roles).filter_by(role_name=_body.role_name).first()
@@ -70,7 +58,7 @@ def remove_role_from_user(
             content="You are not allowed to modify the role of an user from another organization.",
         )
 
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only an Organization Admin can modify the role of an user.",
@@ -89,10 +77,10 @@ def remove_role_from_user(
             content=f"This user does not have the {_body.role_name} role.",
         )
     db.commit()
+    authentication.invalidate_principal(victim_user.id)
 
 
-def assign_role(db, user, user_id, _role_name, is_in_registration):
-
+def assign_role(db, action_user, user_id, _role_name, is_in_registration):
     if not _role_name in [
         "Employee",
         "Project Manager",
@@ -110,7 +98,6 @@ def assign_role(db, user, user_id, _role_name, is_in_registration):
             content="You cannot add the role of an employee to someone.",
         )
 
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     victim_user = db.query(User).filter_by(id=user_id).first()
     role_to_add = db.query(Primary_Roles).filter_by(role_name=_role_name).first()
 
@@ -125,9 +112,7 @@ def assign_role(db, user, user_id, _role_name, is_in_registration):
             content="You are not allowed to modify the role of an user from another organization.",
         )
 
-    if not is_in_registration and not "Organization Admin" in [
-        i.role_name for i in action_user.primary_roles
-    ]:
+    if not is_in_registration and not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only an Organization Admin can modify the role of an user.",
@@ -141,6 +126,7 @@ def assign_role(db, user, user_id, _role_name, is_in_registration):
 
     victim_user.primary_roles.append(role_to_add)
     db.commit()
+    authentication.invalidate_principal(victim_user.id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK, content="Role assigned succesfully"
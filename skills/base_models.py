@@ -20,3 +20,20 @@ class EditSkillModel(BaseModel):
 class EditSkillCategoryModel(BaseModel):
     category_name: str
     category_id: UUID
+
+
+class SkillCriterion(BaseModel):
+    skill_id: UUID
+    min_level: int = 1
+    min_experience: int = 1
+
+
+class SkillSearchModel(BaseModel):
+    skills: list[SkillCriterion]
+    match_all: bool = True
+    limit: int = 100
+    after: Optional[UUID] = None
+
+
+class SkillBatchModel(BaseModel):
+    ids: list[UUID]
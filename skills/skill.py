@@ -1,8 +1,8 @@
 from uuid import UUID
-from typing import Annotated
-from fastapi import APIRouter, status, Depends
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Query, status, Depends
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, delete, func, select, tuple_, update
 
 from database.models import (
     Department,
@@ -13,32 +13,33 @@ from database.models import (
     User,
     User_Skills,
 )
-from database.db import SESSIONLOCAL
+from database.db import DbDependency
 from auth import authentication
-from skills.base_models import CreateSkillModel, EditSkillCategoryModel, EditSkillModel
-
+from auth.base_models import Principal
+from departments.skill_matrix import (
+    invalidate_department_matrix,
+    skill_departments,
+)
+from project.matching import invalidate_skill_matrix
+from skills.base_models import (
+    CreateSkillModel,
+    EditSkillCategoryModel,
+    EditSkillModel,
+    SkillBatchModel,
+    SkillSearchModel,
+)
+from skills.skill_index import get_skill_index, unindex_user_skill
 
 router = APIRouter(prefix="/skill", tags={"Skills"})
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.post("/")
-def create_skill(db: DbDependency, user: UserDependency, _body: CreateSkillModel):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def create_skill(
+    db: DbDependency, action_user: UserDependency, _body: CreateSkillModel
+):
     check_name = db.query(Skill).filter_by(skill_name=_body.skill_name).first()
 
     if check_name:
@@ -47,7 +48,7 @@ def create_skill(db: DbDependency, user: UserDependency, _body: CreateSkillModel
             content="A skill with the same name already exists.",
         )
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a department manager can create skills.",
@@ -87,8 +88,7 @@ def create_skill(db: DbDependency, user: UserDependency, _body: CreateSkillModel
 
 
 @router.patch("/")
-def edit_skill(db: DbDependency, user: UserDependency, _body: EditSkillModel):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def edit_skill(db: DbDependency, action_user: UserDependency, _body: EditSkillModel):
     check_name = db.query(Skill).filter_by(skill_name=_body.skill_name).first()
 
     if check_name:
@@ -97,7 +97,7 @@ def edit_skill(db: DbDependency, user: UserDependency, _body: EditSkillModel):
             content="A skill with the same name already exists.",
         )
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a department manager can modify skills.",
@@ -121,13 +121,16 @@ def edit_skill(db: DbDependency, user: UserDependency, _body: EditSkillModel):
                 status_code=status.HTTP_404_NOT_FOUND,
                 content="One or more skills do not exist.",
             )
-        
+
     skill.skill_category = _body.skill_category
 
     skill.skill_name = _body.skill_name
     skill.skill_description = _body.description
 
+    departments = skill_departments(db, skill.id)
     db.commit()
+    invalidate_department_matrix(*departments)
+    invalidate_skill_matrix(action_user.organization_id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK, content="Skill edited successfully."
@@ -135,10 +138,8 @@ def edit_skill(db: DbDependency, user: UserDependency, _body: EditSkillModel):
 
 
 @router.delete("/")
-def delete_skill(db: DbDependency, user: UserDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+def delete_skill(db: DbDependency, action_user: UserDependency, _id: UUID):
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a department manager can modify skills.",
@@ -148,14 +149,16 @@ def delete_skill(db: DbDependency, user: UserDependency, _id: UUID):
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="You have to remove the role from all employees before deleting it.",
         )
+    departments = skill_departments(db, _id)
     db.query(Skill).filter_by(id=_id).delete()
     db.commit()
+    invalidate_department_matrix(*departments)
+    invalidate_skill_matrix(action_user.organization_id)
     return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content="Deleted.")
 
 
 @router.post("/category/{name}")
-def create_skill_category(db: DbDependency, user: UserDependency, name: str):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def create_skill_category(db: DbDependency, action_user: UserDependency, name: str):
     name_check = db.query(Skill_Category).filter_by(category_name=name).first()
 
     if name_check:
@@ -164,7 +167,7 @@ def create_skill_category(db: DbDependency, user: UserDependency, name: str):
             content="This Skill Category already exists.",
         )
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a department manager can modify skills.",
@@ -184,9 +187,8 @@ def create_skill_category(db: DbDependency, user: UserDependency, name: str):
 
 @router.patch("/category/")
 def edit_skill_cateogry(
-    db: DbDependency, user: UserDependency, _body: EditSkillCategoryModel
+    db: DbDependency, action_user: UserDependency, _body: EditSkillCategoryModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     name_check = (
         db.query(Skill_Category).filter_by(category_name=_body.category_name).first()
     )
@@ -203,7 +205,7 @@ def edit_skill_cateogry(
             content="This Skill Category already exists.",
         )
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a department manager can modify skill categories.",
@@ -219,8 +221,7 @@ def edit_skill_cateogry(
 
 
 @router.delete("/category/{_id}")
-def delete_skill_category(db: DbDependency, user: UserDependency, _id: str):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def delete_skill_category(db: DbDependency, action_user: UserDependency, _id: str):
     category = db.query(Skill_Category).filter_by(id=_id)
     can_delete = (
         db.query(Skill).filter_by(organization_id=action_user.organization_id).first()
@@ -237,7 +238,7 @@ def delete_skill_category(db: DbDependency, user: UserDependency, _id: str):
             content="This Skill Category doesn't exist.",
         )
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a department manager can modify skills.",
@@ -253,8 +254,7 @@ def delete_skill_category(db: DbDependency, user: UserDependency, _id: str):
 
 
 @router.get("/categories/")
-def get_skill_categories(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def get_skill_categories(db: DbDependency, action_user: UserDependency):
     categories = (
         db.query(Skill_Category)
         .filter_by(organization_id=action_user.organization_id)
@@ -273,10 +273,9 @@ def get_skill_categories(db: DbDependency, user: UserDependency):
 
 
 @router.get("/category/{_id}")
-def get_skill_category_by_id(db: DbDependency, user: UserDependency, _id: str):
+def get_skill_category_by_id(db: DbDependency, action_user: UserDependency, _id: str):
     category = db.query(Skill_Category).filter_by(id=_id).first()
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    # if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    # if not "Department Manager" in action_user.roles:
     #     return JSONResponse(
     #         status_code=status.HTTP_401_UNAUTHORIZED,
     #         content="You are not allowed to do this.",
@@ -287,8 +286,7 @@ def get_skill_category_by_id(db: DbDependency, user: UserDependency, _id: str):
 
 
 @router.get("/")
-def get_all_skills(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def get_all_skills(db: DbDependency, action_user: UserDependency):
     skills = (
         db.query(Skill).filter_by(organization_id=action_user.organization_id).all()
     )
@@ -311,10 +309,8 @@ def get_all_skills(db: DbDependency, user: UserDependency):
 
 
 @router.get("/department")
-def get_all_skills_from_department(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+def get_all_skills_from_department(db: DbDependency, action_user: UserDependency):
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a department manager can view this data.",
@@ -345,9 +341,117 @@ def get_all_skills_from_department(db: DbDependency, user: UserDependency):
     return return_list
 
 
+@router.get("/verify")
+def get_all_unverified_skills(
+    db: DbDependency,
+    action_user: UserDependency,
+    after: Optional[UUID] = None,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+):
+    """
+    Unverified skills of the users in the department, ordered by id. Pass the
+    id of the last skill received as after to get the next page.
+    """
+    if not action_user.department_id:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="You don't have the required permission to do this.",
+        )
+
+    query = (
+        select(User_Skills)
+        .join(User, User.id == User_Skills.user_id)
+        .filter(
+            User.department_id == action_user.department_id,
+            User_Skills.verified.isnot(True),
+        )
+        .order_by(User_Skills.id)
+        .limit(limit)
+    )
+    if after:
+        query = query.filter(User_Skills.id > after)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[
+            {
+                "id": str(i.id),
+                "skill_level": i.skill_level,
+                "training_title": i.training_title if i.training_title else None,
+                "project_link": str(i.project_link) if i.project_link else None,
+                "user_id": str(i.user_id),
+                "skill_id": str(i.skill_id),
+                "skill_experience": i.skill_experience,
+                "training_description": (
+                    i.training_description if i.training_description else None
+                ),
+                "verified": i.verified,
+            }
+            for i in db.scalars(query)
+        ],
+    )
+
+
+def department_skills(department_id, ids: List[UUID]):
+    """
+    Condition matching the user skills in ids whose user is in department_id.
+    """
+    return and_(
+        User_Skills.id.in_(ids),
+        User_Skills.user_id.in_(
+            select(User.id).filter(User.department_id == department_id)
+        ),
+    )
+
+
+def batch_outcomes(ids: List[UUID], done: List[UUID], outcome: str) -> List[dict]:
+    done = {str(i) for i in done}
+    return [
+        {"id": str(i), "outcome": outcome if str(i) in done else "not_found"}
+        for i in dict.fromkeys(ids)
+    ]
+
+
+def check_skill_reviewer(action_user: Principal):
+    if not action_user.department_id or not "Department Manager" in action_user.roles:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content="Only Department Managers are allowed to verify skills.",
+        )
+    return None
+
+
+@router.post("/verify/batch")
+def verify_skills(
+    db: DbDependency, action_user: UserDependency, _body: SkillBatchModel
+):
+    """
+    Verifies many skills of the department with one UPDATE. Skills that do
+    not exist or are not from the department are reported as not_found.
+    """
+    error = check_skill_reviewer(action_user)
+    if error:
+        return error
+
+    verified = db.scalars(
+        update(User_Skills)
+        .where(department_skills(action_user.department_id, _body.ids))
+        .values(verified=True)
+        .returning(User_Skills.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    invalidate_skill_matrix(action_user.organization_id)
+    invalidate_department_matrix(action_user.department_id)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=batch_outcomes(_body.ids, verified, "verified"),
+    )
+
+
 @router.post("/verify/{_id}")
-def verify_skill(db: DbDependency, user: UserDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def verify_skill(db: DbDependency, action_user: UserDependency, _id: UUID):
     user_skill = db.query(User_Skills).filter_by(id=_id).first()
     if not user_skill:
         return JSONResponse(
@@ -367,7 +471,7 @@ def verify_skill(db: DbDependency, user: UserDependency, _id: UUID):
             content="This user is not in your department.",
         )
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Department Managers are allowed to verify skills.",
@@ -375,6 +479,8 @@ def verify_skill(db: DbDependency, user: UserDependency, _id: UUID):
 
     user_skill.verified = not user_skill.verified
     db.commit()
+    invalidate_skill_matrix(action_user.organization_id)
+    invalidate_department_matrix(action_user.department_id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -382,55 +488,39 @@ def verify_skill(db: DbDependency, user: UserDependency, _id: UUID):
     )
 
 
-@router.get("/verify")
-def get_all_unverified_skills(db: DbDependency, user: UserDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-
-    if not action_user.department:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content="You don't have the required permission to do this.",
-        )
-
-    users = db.query(User).filter_by(department_id=action_user.department_id).all()
-
-    if not users:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content="You don't have any users in this department.",
-        )
-    roles = []
-    for i in users:
-        user_roles = db.query(User_Skills).filter_by(user_id=i.id, verified=False).all()
-        print(i.username)
-        print(user_roles)
-        for j in user_roles:
-            roles.append(j)
+@router.post("/verify/reject/batch")
+def reject_skill_verifications(
+    db: DbDependency, action_user: UserDependency, _body: SkillBatchModel
+):
+    """
+    Rejects many skills of the department with one DELETE, removing them from
+    their users.
+    """
+    error = check_skill_reviewer(action_user)
+    if error:
+        return error
+
+    rejected = db.execute(
+        delete(User_Skills)
+        .where(department_skills(action_user.department_id, _body.ids))
+        .returning(User_Skills.id, User_Skills.user_id, User_Skills.skill_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    for i in rejected:
+        authentication.invalidate_principal(i.user_id)
+        unindex_user_skill(action_user.organization_id, i.user_id, i.skill_id)
+    invalidate_skill_matrix(action_user.organization_id)
+    invalidate_department_matrix(action_user.department_id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content=[
-            {
-                "id": str(i.id),
-                "skill_level": i.skill_level,
-                "training_title": i.training_title if i.training_title else None,
-                "project_link": i.project_link if i.project_link else None,
-                "user_id": str(i.user_id),
-                "skill_id": str(i.skill_id),
-                "skill_experience": i.skill_experience,
-                "training_description": (
-                    i.training_description if i.training_description else None
-                ),
-                "verified": i.verified,
-            }
-            for i in roles
-        ],
+        content=batch_outcomes(_body.ids, [i.id for i in rejected], "rejected"),
     )
 
 
 @router.post("/verify/reject/{_id}")
-def reject_skill_verification(db: DbDependency, user: UserDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def reject_skill_verification(db: DbDependency, action_user: UserDependency, _id: UUID):
     user_skill = db.query(User_Skills).filter_by(id=_id).first()
     if not user_skill:
         return JSONResponse(
@@ -450,7 +540,7 @@ def reject_skill_verification(db: DbDependency, user: UserDependency, _id: UUID)
             content="This user is not in your department.",
         )
 
-    if not "Department Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Department Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only Department Managers are allowed to verify skills.",
@@ -458,8 +548,78 @@ def reject_skill_verification(db: DbDependency, user: UserDependency, _id: UUID)
 
     db.delete(user_skill)
     db.commit()
+    authentication.invalidate_principal(victim_user.id)
+    invalidate_skill_matrix(action_user.organization_id)
+    invalidate_department_matrix(action_user.department_id)
+    unindex_user_skill(action_user.organization_id, victim_user.id, user_skill.skill_id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content=f"Skill verification rejected, the skill has been removed from the user.",
     )
+
+
+@router.post("/search")
+def search_users_by_skills(
+    db: DbDependency, action_user: UserDependency, _body: SkillSearchModel
+):
+    """
+    Users of the organization having all (match_all) or any of the skills at
+    the given minimum level and experience, served from the skill index and
+    ordered by username. Pass next as after to get the following page.
+    """
+    if not _body.skills:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content="At least one skill is required.",
+        )
+    if not 0 < _body.limit <= 1000:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content="limit must be between 1 and 1000.",
+        )
+
+    index = get_skill_index(db, action_user.organization_id)
+    user_ids = index.search(
+        [(i.skill_id, i.min_level, i.min_experience) for i in _body.skills],
+        _body.match_all,
+    )
+    # The index may still list users deleted or moved since it was built.
+    matching = and_(
+        User.id.in_(user_ids), User.organization_id == action_user.organization_id
+    )
+    query = (
+        select(User.id, User.username, User.email, User.department_id)
+        .filter(matching)
+        .order_by(User.username, User.id)
+        .limit(_body.limit)
+    )
+    if _body.after:
+        query = query.filter(
+            tuple_(User.username, User.id)
+            > tuple_(
+                select(User.username).filter(User.id == _body.after).scalar_subquery(),
+                _body.after,
+            )
+        )
+    users = db.execute(query).all()
+    total = db.scalar(select(func.count()).select_from(User).filter(matching))
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "total": total,
+            "next": str(users[-1].id) if len(users) == _body.limit else None,
+            "users": [
+                {
+                    "id": str(i.id),
+                    "username": i.username,
+                    "email": i.email,
+                    "department_id": (
+                        str(i.department_id) if i.department_id else None
+                    ),
+                }
+                for i in users
+            ],
+        },
+    )
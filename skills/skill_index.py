@@ -0,0 +1,178 @@
+"""
+In-process inverted index answering "who has skill X at level >= L with
+experience >= E" without scanning users_skills. Every organization gets a
+SkillIndex mapping skill id -> (level, experience) bucket -> sorted array of
+user numbers. A search merges the matching buckets of each skill and then
+intersects (AND) or unites (OR) the sorted arrays across skills.
+
+The index is built on first use and cached for SKILL_INDEX_SECONDS. The
+profile endpoints update it in place when an user's skills change; other
+workers see the change once their copy expires.
+"""
+
+from typing import Dict, List, Tuple
+import os
+import threading
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.models import User, User_Skills
+from utils.cache import TTLCache
+
+SKILL_INDEX_SECONDS = int(os.environ.get("SKILL_INDEX_SECONDS", 300))
+
+index_cache = TTLCache(maxsize=64, ttl=SKILL_INDEX_SECONDS)
+
+
+class SkillIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Users are numbered so the posting lists are sorted int arrays.
+        self.user_ids: List[str] = []
+        self._user_numbers: Dict[str, int] = {}
+        self._buckets: Dict[str, Dict[Tuple[int, int], np.ndarray]] = {}
+        self._entries: Dict[Tuple[str, str], Tuple[int, int]] = {}
+
+    def _user_number(self, user_id: str) -> int:
+        number = self._user_numbers.get(user_id)
+        if number is None:
+            number = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self._user_numbers[user_id] = number
+        return number
+
+    def _remove(self, user_id: str, skill_id: str):
+        bucket_key = self._entries.pop((user_id, skill_id), None)
+        if bucket_key is None:
+            return
+        buckets = self._buckets[skill_id]
+        bucket = buckets[bucket_key]
+        number = self._user_numbers[user_id]
+        bucket = np.delete(bucket, np.searchsorted(bucket, number))
+        if bucket.size:
+            buckets[bucket_key] = bucket
+        else:
+            del buckets[bucket_key]
+
+    def load(self, rows):
+        """
+        Bulk-loads (user_id, skill_id, level, experience) rows into an empty
+        index.
+        """
+        postings = {}
+        with self._lock:
+            for user_id, skill_id, level, experience in rows:
+                user_id, skill_id = str(user_id), str(skill_id)
+                bucket_key = (level or 0, experience or 0)
+                postings.setdefault(skill_id, {}).setdefault(bucket_key, []).append(
+                    self._user_number(user_id)
+                )
+                self._entries[(user_id, skill_id)] = bucket_key
+            self._buckets = {
+                skill_id: {
+                    bucket_key: np.sort(np.array(numbers, dtype=np.int64))
+                    for bucket_key, numbers in buckets.items()
+                }
+                for skill_id, buckets in postings.items()
+            }
+
+    def set(self, user_id, skill_id, level: int, experience: int):
+        """
+        Adds or moves the skill of an user.
+        """
+        user_id, skill_id = str(user_id), str(skill_id)
+        bucket_key = (level or 0, experience or 0)
+        with self._lock:
+            self._remove(user_id, skill_id)
+            number = self._user_number(user_id)
+            buckets = self._buckets.setdefault(skill_id, {})
+            bucket = buckets.get(bucket_key, np.empty(0, dtype=np.int64))
+            buckets[bucket_key] = np.insert(
+                bucket, np.searchsorted(bucket, number), number
+            )
+            self._entries[(user_id, skill_id)] = bucket_key
+
+    def remove(self, user_id, skill_id):
+        with self._lock:
+            self._remove(str(user_id), str(skill_id))
+
+    def users_with(self, skill_id, min_level: int, min_experience: int) -> np.ndarray:
+        """
+        Sorted user numbers having skill_id at min_level and min_experience or
+        above. A user is in one bucket per skill, so the buckets are disjoint.
+        """
+        with self._lock:
+            buckets = [
+                bucket
+                for (level, experience), bucket in self._buckets.get(
+                    str(skill_id), {}
+                ).items()
+                if level >= min_level and experience >= min_experience
+            ]
+        if not buckets:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(buckets))
+
+    def search(self, criteria: List[Tuple], match_all: bool) -> List[str]:
+        """
+        Ids of the users matching all (AND) or any (OR) of the
+        (skill_id, min_level, min_experience) criteria.
+        """
+        # Smallest posting lists first, so AND intersections shrink early.
+        postings = sorted(
+            (self.users_with(*i) for i in criteria), key=lambda posting: posting.size
+        )
+        if not postings:
+            return []
+        result = postings[0]
+        for posting in postings[1:]:
+            if match_all:
+                if not result.size:
+                    break
+                result = np.intersect1d(result, posting, assume_unique=True)
+            else:
+                result = np.union1d(result, posting)
+        return [self.user_ids[i] for i in result]
+
+
+def build_skill_index(db: Session, organization_id) -> SkillIndex:
+    index = SkillIndex()
+    index.load(
+        db.execute(
+            select(
+                User_Skills.user_id,
+                User_Skills.skill_id,
+                User_Skills.skill_level,
+                User_Skills.skill_experience,
+            )
+            .join(User, User.id == User_Skills.user_id)
+            .filter(User.organization_id == organization_id)
+        )
+    )
+    return index
+
+
+def get_skill_index(db: Session, organization_id) -> SkillIndex:
+    index = index_cache.get(str(organization_id))
+    if index is None:
+        index = build_skill_index(db, organization_id)
+        index_cache.set(str(organization_id), index)
+    return index
+
+
+def index_user_skill(organization_id, user_id, skill_id, level, experience):
+    """
+    Keeps the cached index of the organization, if any, in sync with a
+    committed assign or edit.
+    """
+    index = index_cache.get(str(organization_id))
+    if index is not None:
+        index.set(user_id, skill_id, level, experience)
+
+
+def unindex_user_skill(organization_id, user_id, skill_id):
+    index = index_cache.get(str(organization_id))
+    if index is not None:
+        index.remove(user_id, skill_id)
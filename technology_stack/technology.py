@@ -4,39 +4,26 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
 
-from database.db import SESSIONLOCAL
-from database.models import TechnologyStack, User, Projects
+from database.db import DbDependency
+from database.models import TechnologyStack, Projects
 from technology_stack.base_models import AssignTStackModel, CreateTStackModel
 from auth import authentication
+from auth.base_models import Principal
 
 router = APIRouter(tags={"Technology Stack"}, prefix="/technology")
 
 
-def get_db():
-    """
-    creates a db session
-    """
-    try:
-        db = SESSIONLOCAL()
-        yield db
-    finally:
-        db.close()
-
-
-DbDependency = Annotated[Session, Depends(get_db)]
-UserDependency = Annotated[dict, Depends(authentication.get_current_user)]
+UserDependency = Annotated[Principal, Depends(authentication.get_current_principal)]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 def create_technology_stack(
-    user: UserDependency, db: DbDependency, _body: CreateTStackModel
+    action_user: UserDependency, db: DbDependency, _body: CreateTStackModel
 ):
     """
     Create a custom role.
     """
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     check_duplicate = (
         db.query(TechnologyStack)
         .filter_by(
@@ -45,7 +32,7 @@ def create_technology_stack(
         .first()
     )
 
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only an Organization Admin is able to create technology stacks.",
@@ -68,9 +55,8 @@ def create_technology_stack(
 
 @router.post("/assign")
 def assign_technology_stack_to_project(
-    user: UserDependency, db: DbDependency, _body: AssignTStackModel
+    action_user: UserDependency, db: DbDependency, _body: AssignTStackModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(id=_body.project_id).first()
     tech_stack = db.query(TechnologyStack).filter_by(id=_body.tech_id).first()
 
@@ -83,7 +69,7 @@ def assign_technology_stack_to_project(
             content="The fields specified are not from the same organization.",
         )
 
-    if not "Project Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Project Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content="Only a Project Manager can assign technology stacks to a project.",
@@ -102,9 +88,8 @@ def assign_technology_stack_to_project(
 
 @router.delete("/project")
 def delete_technology_stack_from_project(
-    user: UserDependency, db: DbDependency, _body: AssignTStackModel
+    action_user: UserDependency, db: DbDependency, _body: AssignTStackModel
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(id=_body.project_id).first()
     tech_stack = db.query(TechnologyStack).filter_by(id=_body.tech_id).first()
 
@@ -117,7 +102,7 @@ def delete_technology_stack_from_project(
             content="The fields specified are not from the same organization.",
         )
 
-    if not "Project Manager" in [i.role_name for i in action_user.primary_roles]:
+    if not "Project Manager" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only a Project Manager can delete technology stacks from a project.",
@@ -135,9 +120,8 @@ def delete_technology_stack_from_project(
 
 @router.get("/user")
 def get_all_technology_stacks_from_project(
-    user: UserDependency, db: DbDependency, _id: UUID
+    action_user: UserDependency, db: DbDependency, _id: UUID
 ):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
     project = db.query(Projects).filter_by(id=_id).first()
 
     return JSONResponse(
@@ -147,8 +131,7 @@ def get_all_technology_stacks_from_project(
 
 
 @router.get("/")
-def get_all_technology_stacks(user: UserDependency, db: DbDependency):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
+def get_all_technology_stacks(action_user: UserDependency, db: DbDependency):
     technologies = (
         db.query(TechnologyStack)
         .filter_by(organization_id=str(action_user.organization_id))
@@ -168,9 +151,8 @@ def get_all_technology_stacks(user: UserDependency, db: DbDependency):
 
 
 @router.delete("/")
-def delete_technology_stack(user: UserDependency, db: DbDependency, _id: UUID):
-    action_user = db.query(User).filter_by(id=user["id"]).first()
-    if not "Organization Admin" in [i.role_name for i in action_user.primary_roles]:
+def delete_technology_stack(action_user: UserDependency, db: DbDependency, _id: UUID):
+    if not "Organization Admin" in action_user.roles:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content="Only an Organization admin can delete team roles.",
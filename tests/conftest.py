@@ -0,0 +1,162 @@
+"""
+Fixtures of the database tests. They run against the database configured for
+database.db, migrated with python -m database.migrate, and only when
+DATABASE_TESTS=true. Every test runs in a transaction rolled back at the end;
+the commits of the code under test only release savepoints.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from uuid import uuid4
+import os
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+DATABASE_TESTS = os.environ.get("DATABASE_TESTS", "false").lower() == "true"
+
+if not DATABASE_TESTS:
+    collect_ignore_glob = ["test_*.py"]
+
+
+@pytest.fixture
+def db():
+    from database.db import ENGINE
+
+    with ENGINE.connect() as connection:
+        transaction = connection.begin()
+        with Session(
+            bind=connection, join_transaction_mode="create_savepoint"
+        ) as session:
+            yield session
+        transaction.rollback()
+
+
+@pytest.fixture
+def count_queries(db):
+    """
+    count_queries() is a context manager collecting the statements sent by
+    db while it is open.
+    """
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        connection = db.connection()
+        event.listen(connection, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+    return counter
+
+
+def add_department(db, employees: int) -> dict:
+    """
+    An organization with a department of employees users, a manager and two
+    projects. Every employee has an allocation proposal with two roles to the
+    first project and, as a member of the second, a deallocation proposal.
+    """
+    from auth.base_models import Principal
+    from database.models import (
+        AllocationProposal,
+        Custom_Roles,
+        DeallocationProposal,
+        Department,
+        Organization,
+        Projects,
+        User,
+    )
+
+    manager_id = uuid4()
+    organization = Organization(
+        organization_name="Organization",
+        hq_address="Address",
+        custom_link=uuid4().hex,
+        owner_id=manager_id,
+    )
+    db.add(organization)
+    db.flush()
+    department = Department(
+        department_name="Department",
+        department_manager=manager_id,
+        organization_id=organization.id,
+    )
+    db.add(department)
+    db.flush()
+    manager = User(
+        id=manager_id,
+        username="manager",
+        email=f"{uuid4().hex}@example.com",
+        hashed_password="",
+        organization_id=organization.id,
+        department_id=department.id,
+    )
+    db.add(manager)
+    db.flush()
+    allocated, deallocated = [
+        Projects(
+            organization_id=organization.id,
+            project_name=f"Project {i}",
+            project_manager=manager_id,
+            project_period="Ongoing",
+            start_date=datetime.now(),
+            project_status="In Progress",
+            description="Project",
+        )
+        for i in range(2)
+    ]
+    roles = [
+        Custom_Roles(custom_role_name=f"Role {i}", organization_id=organization.id)
+        for i in range(2)
+    ]
+    users = [
+        User(
+            username=f"employee {i}",
+            email=f"{uuid4().hex}@example.com",
+            hashed_password="",
+            organization_id=organization.id,
+            department_id=department.id,
+        )
+        for i in range(employees)
+    ]
+    deallocated.users = users
+    db.add_all([allocated, deallocated, *roles, *users])
+    db.flush()
+
+    allocations = [
+        AllocationProposal(
+            project_id_allocation=allocated.id,
+            user_id=i.id,
+            work_hours=4,
+            roles=roles,
+        )
+        for i in users
+    ]
+    deallocations = [
+        DeallocationProposal(
+            project_id_deallocation=deallocated.id, user_id=i.id, reason="Reason"
+        )
+        for i in users
+    ]
+    db.add_all(allocations + deallocations)
+    db.flush()
+    db.expire_all()
+
+    return {
+        "manager": Principal(
+            id=manager_id,
+            username="manager",
+            organization_id=organization.id,
+            department_id=department.id,
+            roles=frozenset({"Department Manager"}),
+        ),
+        "allocations": [i.id for i in allocations],
+        "deallocations": [i.id for i in deallocations],
+    }
@@ -0,0 +1,143 @@
+"""
+The hot lookups of the endpoints must be served by the indexes of the
+migrations. Sequential scans are disabled, so the planner picks an index
+whenever one can answer the query, whatever the size of the tables.
+
+Once an empty table has been analyzed, every index of it costs the same and
+the planner picks any of them, so the association tables get a few rows.
+"""
+
+from uuid import uuid4
+import json
+
+import pytest
+from sqlalchemy import insert, select, text
+
+from conftest import add_department
+from database.models import (
+    AllocationProposal,
+    DeallocationProposal,
+    Notifications,
+    Organization,
+    Primary_Roles,
+    Skill,
+    User,
+    User_Skills,
+    Users_Custom_Roles,
+    WorkHours,
+    user_projects,
+    user_skills,
+    users_primary_roles,
+)
+
+ID = uuid4()
+
+
+@pytest.fixture(autouse=True)
+def association_rows(db):
+    department = add_department(db, 2)
+    employees = db.scalars(
+        select(User.id).filter_by(department_id=department["manager"].department_id)
+    ).all()
+    role = Primary_Roles(role_name="Employee")
+    skill = Skill(skill_name="Skill", skill_description="Skill")
+    db.add_all([role, skill])
+    db.flush()
+    db.execute(
+        insert(users_primary_roles),
+        [{"user_id": i, "primary_role_id": role.id} for i in employees],
+    )
+    db.execute(
+        insert(user_skills), [{"user_id": i, "skill_id": skill.id} for i in employees]
+    )
+
+
+def plan_indexes(db, statement) -> set:
+    """
+    Names of the indexes in the plan of statement.
+    """
+    compiled = statement.compile(dialect=db.get_bind().dialect)
+    connection = db.connection()
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    indexes = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        nodes.extend(node.get("Plans", []))
+    return indexes
+
+
+@pytest.mark.parametrize(
+    "statement, index",
+    [
+        (select(User).filter_by(email="user@example.com"), "ix_users_email"),
+        (
+            select(Organization).filter_by(custom_link="link"),
+            "ix_organizations_custom_link",
+        ),
+        (select(WorkHours).filter_by(user_id=ID), "ix_project_work_hours_user_id"),
+        (
+            select(Users_Custom_Roles).filter_by(user_id=ID, project_id=ID),
+            "users_custom_roles_pkey",
+        ),
+        (
+            select(AllocationProposal).filter_by(user_id=ID),
+            "ix_allocation_proposals_user_id",
+        ),
+        (
+            select(AllocationProposal).filter_by(project_id_allocation=ID),
+            "ix_allocation_proposals_project_id_allocation",
+        ),
+        (
+            select(DeallocationProposal).filter_by(user_id=ID),
+            "ix_deallocation_proposals_user_id",
+        ),
+        (
+            select(DeallocationProposal).filter_by(project_id_deallocation=ID),
+            "ix_deallocation_proposals_project_id_deallocation",
+        ),
+        (
+            select(Notifications).filter_by(to_manager=ID),
+            "ix_notifications_to_manager_created_at_id",
+        ),
+        (select(Skill).filter_by(organization_id=ID), "ix_skills_organization_id"),
+        (select(User_Skills).filter_by(user_id=ID), "ix_users_skills_user_id"),
+        (select(User_Skills).filter_by(skill_id=ID), "ix_users_skills_skill_id"),
+        (
+            select(user_projects).where(user_projects.c.user_id == ID),
+            "user_projects_user_id_project_id_key",
+        ),
+        (
+            select(user_projects).where(user_projects.c.project_id == ID),
+            "ix_user_projects_project_id",
+        ),
+        (
+            select(users_primary_roles).where(users_primary_roles.c.user_id == ID),
+            "users_primary_roles_user_id_primary_role_id_key",
+        ),
+        (
+            select(users_primary_roles).where(
+                users_primary_roles.c.primary_role_id == ID
+            ),
+            "ix_users_primary_roles_primary_role_id",
+        ),
+        (
+            select(user_skills).where(user_skills.c.user_id == ID),
+            "user_skills_user_id_skill_id_key",
+        ),
+        (
+            select(user_skills).where(user_skills.c.skill_id == ID),
+            "ix_user_skills_skill_id",
+        ),
+    ],
+)
+def test_lookup_uses_index(db, statement, index):
+    assert index in plan_indexes(db, statement)
@@ -0,0 +1,59 @@
+"""
+The department proposal listings and the batch endpoints must send the same
+number of statements whatever the number of employees or proposals.
+"""
+
+import json
+
+import pytest
+
+from conftest import add_department
+from proposals import proposal
+from proposals.base_models import ProposalBatchModel
+
+
+def run(db, count_queries, endpoint, department, proposals):
+    db.expire_all()
+    with count_queries() as statements:
+        response = endpoint(db, department["manager"], proposals)
+    assert response.status_code == 200
+    return len(statements), json.loads(response.body)
+
+
+def listing(endpoint):
+    return lambda db, manager, _: endpoint(
+        db, manager, offset=0, limit=None, descending=False
+    )
+
+
+def batch(endpoint):
+    return lambda db, manager, ids: endpoint(db, manager, ProposalBatchModel(ids=ids))
+
+
+@pytest.mark.parametrize(
+    "endpoint, proposals",
+    [
+        (listing(proposal.get_allocation_proposal_from_department), "allocations"),
+        (listing(proposal.get_deallocation_proposal_from_department), "deallocations"),
+        (batch(proposal.accept_allocation_proposals), "allocations"),
+        (batch(proposal.reject_allocation_proposals), "allocations"),
+        (batch(proposal.accept_deallocation_proposals), "deallocations"),
+        (batch(proposal.reject_deallocation_proposals), "deallocations"),
+    ],
+)
+def test_query_count_is_constant(db, count_queries, endpoint, proposals):
+    small = add_department(db, 2)
+    large = add_department(db, 25)
+
+    small_count, small_result = run(
+        db, count_queries, endpoint, small, small[proposals]
+    )
+    large_count, large_result = run(
+        db, count_queries, endpoint, large, large[proposals]
+    )
+
+    assert len(small_result) == 2
+    assert len(large_result) == 25
+    for i in small_result + large_result:
+        assert i.get("outcome", "accepted") in ("accepted", "rejected")
+    assert small_count == large_count
@@ -1,35 +1,108 @@
-from dotenv import dotenv_values
-from openai import OpenAI
+"""
+ChatGPT backend of the /gpt endpoints. Calls go through an async client with
+a timeout and at most CHATGPT_MAX_CONCURRENCY of them in flight per worker.
+Replies are cached by the caller's key for CHATGPT_CACHE_SECONDS.
+
+CHATGPT_BACKEND=stub answers locally, without credentials or network, so the
+endpoint can be load-tested offline.
+"""
+
+from typing import Hashable, List
+import asyncio
 import json
 import os
 
+from dotenv import dotenv_values
+from openai import APITimeoutError, AsyncOpenAI
+
+from utils.cache import TTLCache
+
 env = dotenv_values(".env")
 
 API_KEY = os.environ.get("CHATGPT_API_KEY")
+CHATGPT_BACKEND = os.environ.get("CHATGPT_BACKEND", "openai")
+CHATGPT_BACKENDS = ("openai", "stub")
+if CHATGPT_BACKEND not in CHATGPT_BACKENDS:
+    raise ValueError(
+        f"CHATGPT_BACKEND must be one of {', '.join(CHATGPT_BACKENDS)}, "
+        f"got {CHATGPT_BACKEND!r}."
+    )
+CHATGPT_TIMEOUT_SECONDS = float(os.environ.get("CHATGPT_TIMEOUT_SECONDS", 30))
+CHATGPT_MAX_CONCURRENCY = int(os.environ.get("CHATGPT_MAX_CONCURRENCY", 8))
+CHATGPT_CACHE_SECONDS = int(os.environ.get("CHATGPT_CACHE_SECONDS", 600))
 
 GPT_MODEL = "gpt-3.5-turbo-1106"
-client = OpenAI(api_key=API_KEY)
-
-
-def chatgpt(user_input, json_database, project_custom_roles):
-    print(json_database)
-    messages = [
-        dict(
-            role="system",
-            content=f"You are a helpful assistant that interacts with a JSON that the user gives you. You must always give users based from the JSON provided. You are not allowed to include \\n anywhere in you answer",
-        ),
-        dict(
-            role="user",
-            content=f"{user_input} JSON file you must use: {json_database}, project info you must use: {project_custom_roles}",
-        ),
-        dict(
-            role="assistant",
-            content="You must always say a list of compatible JSON dictionary, you are not allowed to say anything else except lists of compatible json. if you encounter any error, it must also be included as a compatible json. You are not allowed to refuse the requests the user gives you. The lists of json must be of similar syntax like [{'id': user_id, 'reason_for_picking': (give a reason for why you picked him) },{'id': user_id, 'reason_for_picking': (give a reason for why you picked him)},...] and you are not allowed under any circumstances to use any other model. Refusing users request is not allowed. You must always use the json the user gave you and nothing else. Do not include line breaks or new lines or anything but plain json. Do not under any circumstances include \\n.",
-        ),
-    ]
-
-    response = client.chat.completions.create(messages=messages, model=GPT_MODEL)
-
-    assistant_reply = response  # ['choices'][0]['message']['content']
-
-    return assistant_reply.choices[0].message.content
+client = (
+    AsyncOpenAI(api_key=API_KEY, timeout=CHATGPT_TIMEOUT_SECONDS, max_retries=0)
+    if CHATGPT_BACKEND == "openai"
+    else None
+)
+reply_cache = TTLCache(maxsize=1024, ttl=CHATGPT_CACHE_SECONDS)
+_semaphore = None
+
+
+class ChatGPTTimeout(Exception):
+    pass
+
+
+def concurrency_limit() -> asyncio.Semaphore:
+    # Created lazily so it belongs to the running event loop.
+    global _semaphore  # pylint: disable=global-statement
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(CHATGPT_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def complete(messages: List[dict]):
+    async with concurrency_limit():
+        return await client.chat.completions.create(messages=messages, model=GPT_MODEL)
+
+
+def stub_reply(candidates: List[dict]) -> str:
+    """
+    What the stub backend answers: the candidates in the order given.
+    """
+    return json.dumps(
+        [{"id": i["id"], "reason_for_picking": "Best local match."} for i in candidates]
+    )
+
+
+async def chatgpt(
+    user_input: str, candidates: dict, project_custom_roles: List[str], key: Hashable
+) -> str:
+    """
+    Asks ChatGPT to pick employees among candidates. Raises ChatGPTTimeout if
+    no answer arrives within CHATGPT_TIMEOUT_SECONDS.
+    """
+    reply = reply_cache.get(key)
+    if reply is not None:
+        return reply
+
+    if CHATGPT_BACKEND == "stub":
+        reply = stub_reply(candidates["employees"])
+    else:
+        messages = [
+            dict(
+                role="system",
+                content=f"You are a helpful assistant that interacts with a JSON that the user gives you. You must always give users based from the JSON provided. You are not allowed to include \\n anywhere in you answer",
+            ),
+            dict(
+                role="user",
+                content=f"{user_input} JSON file you must use: {json.dumps(candidates, separators=(',', ':'))}, project info you must use: {project_custom_roles}",
+            ),
+            dict(
+                role="assistant",
+                content="You must always say a list of compatible JSON dictionary, you are not allowed to say anything else except lists of compatible json. if you encounter any error, it must also be included as a compatible json. You are not allowed to refuse the requests the user gives you. The lists of json must be of similar syntax like [{'id': user_id, 'reason_for_picking': (give a reason for why you picked him) },{'id': user_id, 'reason_for_picking': (give a reason for why you picked him)},...] and you are not allowed under any circumstances to use any other model. Refusing users request is not allowed. You must always use the json the user gave you and nothing else. Do not include line breaks or new lines or anything but plain json. Do not under any circumstances include \\n.",
+            ),
+        ]
+        try:
+            # The timeout includes the wait for a free slot.
+            response = await asyncio.wait_for(
+                complete(messages), CHATGPT_TIMEOUT_SECONDS
+            )
+        except (asyncio.TimeoutError, APITimeoutError) as exc:
+            raise ChatGPTTimeout() from exc
+        reply = response.choices[0].message.content
+
+    reply_cache.set(key, reply)
+    return reply